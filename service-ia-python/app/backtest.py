@@ -0,0 +1,184 @@
+# Fichier: service-ia-python/app/backtest.py
+
+import os
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from .config import MODELS_CONFIG, BACKTEST_MAX_WORKERS
+from .global_models import get_global_model_id, get_member_config, get_static_features
+
+QUANTILE_LEVELS = ["0.1", "0.5", "0.9"]
+# Séparateur entre l'item d'origine et la date de coupure dans les item_id des fenêtres
+WINDOW_ID_SEPARATOR = "@"
+
+
+def get_cutoffs(timestamps: pd.DatetimeIndex, prediction_length: int, n_windows: int, step: int, min_history: int) -> list:
+    """
+    Dates de coupure (dernière semaine connue) des fenêtres, de la plus récente à la plus
+    ancienne : la première laisse exactement `prediction_length` semaines à prévoir.
+    Les fenêtres avec moins de `min_history` semaines d'historique sont écartées.
+    """
+    cutoffs = []
+    for i in range(n_windows):
+        end_position = len(timestamps) - prediction_length - i * step
+        if end_position < min_history:
+            break
+        cutoffs.append(timestamps[end_position - 1])
+    return cutoffs
+
+def build_backtest_batch(prepared: pd.DataFrame, config, cutoffs, prediction_length: int, known_covariates) -> tuple:
+    """
+    Toutes les fenêtres dans un seul DataFrame multi-items : chaque fenêtre devient un item
+    `<item_id>@<coupure>` avec son propre historique tronqué. Retourne (historiques, covariables
+    futures ou None, vérités terrain de forme (fenêtres, horizon)).
+    """
+    item_id = config["category_id_in_file"]
+    prepared = prepared.sort_values('timestamp').reset_index(drop=True)
+    timestamps = prepared['timestamp'].to_numpy()
+    target = prepared[config["original_target_col"]].to_numpy(dtype=np.float64)
+
+    histories, futures, y_true = [], [], []
+    for cutoff in cutoffs:
+        end = int(np.searchsorted(timestamps, np.datetime64(cutoff), side="right"))
+        window_id = f"{item_id}{WINDOW_ID_SEPARATOR}{pd.Timestamp(cutoff).date()}"
+        histories.append(prepared.iloc[:end].assign(item_id=window_id))
+        if known_covariates:
+            futures.append(prepared.iloc[end:end + prediction_length][['timestamp'] + list(known_covariates)].assign(item_id=window_id))
+        y_true.append(target[end:end + prediction_length])
+    future_df = pd.concat(futures, ignore_index=True) if futures else None
+    return pd.concat(histories, ignore_index=True), future_df, np.vstack(y_true)
+
+def compute_backtest_metrics(y_true: np.ndarray, y_pred: dict, horizons) -> dict:
+    """
+    Métriques vectorisées sur des tableaux (fenêtres, horizon) : MAE et RMSE de la médiane,
+    perte quantile pondérée (wQL) par quantile et moyenne, pour chaque horizon cumulé h
+    (les h premières semaines de chaque fenêtre).
+    """
+    report = {}
+    for horizon in horizons:
+        truth = y_true[:, :horizon]
+        scale = np.abs(truth).sum()
+        errors = truth - y_pred["0.5"][:, :horizon]
+        wql = {}
+        for q in QUANTILE_LEVELS:
+            diff = truth - y_pred[q][:, :horizon]
+            pinball = np.maximum(float(q) * diff, (float(q) - 1) * diff)
+            wql[q] = float(2 * pinball.sum() / scale) if scale > 0 else None
+        valid_wql = [value for value in wql.values() if value is not None]
+        report[str(horizon)] = {
+            "mae": float(np.abs(errors).mean()),
+            "rmse": float(np.sqrt((errors ** 2).mean())),
+            "wql": wql,
+            "mean_wql": float(np.mean(valid_wql)) if valid_wql else None,
+        }
+    return report
+
+def _predict_chunk(predictor, history_df, future_df, window_ids, static_features=None):
+    from .predict import get_autogluon
+    TimeSeriesDataFrame = get_autogluon().TimeSeriesDataFrame
+    history = TimeSeriesDataFrame.from_data_frame(history_df[history_df['item_id'].isin(window_ids)], id_column="item_id", timestamp_column="timestamp")
+    if static_features is not None:
+        history.static_features = static_features.loc[window_ids]
+    known = None
+    if future_df is not None:
+        known = TimeSeriesDataFrame.from_data_frame(future_df[future_df['item_id'].isin(window_ids)], id_column="item_id", timestamp_column="timestamp")
+    return predictor.predict(history, known_covariates=known, use_cache=False)
+
+def run_backtest(unique_id: str, n_windows: int = 8, step: int = 4, horizons=(1, 4, 12), n_jobs: int = None) -> dict:
+    """
+    Backtest à origines glissantes d'un modèle : le prédicteur et les données sont chargés une
+    fois, les fenêtres sont prédites par lots multi-items répartis sur `n_jobs` threads, puis
+    les métriques sont calculées en NumPy sur l'ensemble des fenêtres.
+    Une catégorie servie par un modèle global est évaluée avec le modèle global.
+    """
+    # Imports différés : chargent AutoGluon (via predict) uniquement pour un backtest
+    from .predict import load_predictor
+    from .features import get_prepared_data
+
+    if unique_id not in MODELS_CONFIG:
+        raise ValueError(f"ID de modèle '{unique_id}' non trouvé.")
+    global_id = get_global_model_id(unique_id)
+    config = get_member_config(global_id, unique_id) if global_id else MODELS_CONFIG[unique_id]
+    predictor, model_version = load_predictor(global_id or unique_id)
+    prediction_length = predictor.prediction_length
+    horizons = sorted({h for h in horizons if 1 <= h <= prediction_length}) or [prediction_length]
+
+    prepared = get_prepared_data(f"{global_id}.{unique_id}" if global_id else unique_id, config)
+    cutoffs = get_cutoffs(pd.DatetimeIndex(prepared['timestamp']), prediction_length, n_windows, step,
+                          min_history=2 * prediction_length)
+    if not cutoffs:
+        raise ValueError(f"Historique trop court pour un backtest de '{unique_id}'.")
+
+    known_covariates = list(predictor.known_covariates_names or [])
+    history_df, future_df, y_true = build_backtest_batch(prepared, config, cutoffs, prediction_length, known_covariates)
+    window_ids = list(dict.fromkeys(history_df['item_id']))
+    static_features = None
+    if global_id:
+        # Chaque fenêtre reprend les covariables statiques de sa catégorie
+        static_features = get_static_features(global_id).loc[[config["category_id_in_file"]] * len(window_ids)]
+        static_features.index = pd.Index(window_ids, name="item_id")
+
+    n_jobs = max(1, min(n_jobs or BACKTEST_MAX_WORKERS or os.cpu_count() or 1, len(window_ids)))
+    print(f"--- Backtest de '{unique_id}' : {len(window_ids)} fenêtres, {n_jobs} lot(s) en parallèle ---")
+    chunks = [list(chunk) for chunk in np.array_split(np.array(window_ids, dtype=object), n_jobs) if len(chunk)]
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        predictions = pd.concat(executor.map(lambda ids: _predict_chunk(predictor, history_df, future_df, ids, static_features), chunks))
+
+    # Tableaux (fenêtres, horizon) dans l'ordre des coupures, retransformés à l'échelle d'origine
+    y_pred = {}
+    for q in QUANTILE_LEVELS:
+        values = np.vstack([predictions.loc[window_id][q].to_numpy(dtype=np.float64) for window_id in window_ids])
+        if config.get("transformation") == "log":
+            values = np.expm1(values)
+        y_pred[q] = np.clip(values, 0, None)
+
+    return {
+        "unique_id": unique_id,
+        "model_version": model_version,
+        "model_type": config.get("hyperparameters", {}).get("model", "default"),
+        "global_model": global_id,
+        "n_windows": len(cutoffs),
+        "step": step,
+        "first_cutoff": str(pd.Timestamp(cutoffs[-1]).date()),
+        "last_cutoff": str(pd.Timestamp(cutoffs[0]).date()),
+        "horizons": compute_backtest_metrics(y_true, y_pred, horizons),
+    }
+
+def print_backtest_report(reports: list):
+    print("\n--- Rapport de backtest ---")
+    print(f"{'Modèle':<25} {'Fenêtres':>8} {'Horizon':>8} {'MAE':>10} {'RMSE':>10} {'wQL moy.':>10}")
+    for report in reports:
+        if "error" in report:
+            print(f"{report['unique_id']:<25} échec : {report['error']}")
+            continue
+        for horizon, metrics in report["horizons"].items():
+            mean_wql = f"{metrics['mean_wql']:.4f}" if metrics["mean_wql"] is not None else "-"
+            print(f"{report['unique_id']:<25} {report['n_windows']:>8} {horizon:>8} {metrics['mae']:>10.3f} {metrics['rmse']:>10.3f} {mean_wql:>10}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest à origines glissantes des modèles configurés.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--category", help="ID unique du modèle à évaluer")
+    target.add_argument("--all", action="store_true", help="Évalue tous les modèles de MODELS_CONFIG")
+    parser.add_argument("--windows", type=int, default=8, help="Nombre de fenêtres (dates de coupure)")
+    parser.add_argument("--step", type=int, default=4, help="Écart entre deux coupures, en semaines")
+    parser.add_argument("--horizons", default="1,4,12", help="Horizons évalués, en semaines (séparés par des virgules)")
+    parser.add_argument("--jobs", type=int, default=None, help="Nombre de lots prédits en parallèle")
+    parser.add_argument("--output", default=None, help="Fichier JSON où écrire les rapports")
+    args = parser.parse_args()
+
+    horizons = [int(h) for h in args.horizons.split(",") if h.strip()]
+    reports = []
+    for unique_id in ([args.category] if args.category else list(MODELS_CONFIG)):
+        try:
+            reports.append(run_backtest(unique_id, args.windows, args.step, horizons, args.jobs))
+        except Exception as e:
+            print(f"🛑 Échec du backtest de {unique_id}: {e}")
+            reports.append({"unique_id": unique_id, "error": str(e)})
+    print_backtest_report(reports)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2, ensure_ascii=False)
+        print(f"✅ Rapports écrits dans {args.output}.")
@@ -0,0 +1,68 @@
+# Fichier: service-ia-python/app/batch_forecast.py
+
+import time
+import argparse
+import traceback
+from .config import MODELS_CONFIG, GLOBAL_MODELS_CONFIG
+from .global_models import get_global_model_id, get_global_members
+from .hierarchy import get_hierarchy_total
+
+
+def run_batch_forecast(unique_ids=None) -> list:
+    """
+    Recalcule et enregistre les prévisions futures de chaque modèle (tous ceux de MODELS_CONFIG
+    par défaut). À lancer après chaque ETL ou réentraînement pour que /predict serve depuis le store.
+    Un ID de modèle global est remplacé par ses catégories, et chaque modèle global n'est prédit
+    qu'une fois pour toutes ses catégories.
+    Retourne un rapport par modèle (statut, durée, erreur éventuelle).
+    """
+    # Import différé : charge AutoGluon uniquement quand le job tourne réellement
+    from .predict import compute_and_store_forecast, compute_and_store_global_forecast
+
+    requested = list(unique_ids or MODELS_CONFIG)
+    unknown = [uid for uid in requested if uid not in MODELS_CONFIG and uid not in GLOBAL_MODELS_CONFIG]
+    if unknown:
+        raise ValueError(f"ID(s) de modèle inconnu(s) : {unknown}")
+    unique_ids = list(dict.fromkeys(
+        member for uid in requested
+        for member in (get_global_members(uid) if uid in GLOBAL_MODELS_CONFIG else [uid])
+    ))
+
+    print(f"--- Calcul batch des prévisions pour {len(unique_ids)} modèles ---")
+    report = []
+    global_errors = {}  # modèle global déjà prédit dans ce job -> erreur éventuelle
+    for i, unique_id in enumerate(unique_ids, start=1):
+        start = time.perf_counter()
+        # Les prévisions réconciliées (hiérarchie) sont calculées et enregistrées par compute_and_store_forecast
+        global_id = get_global_model_id(unique_id) if get_hierarchy_total(unique_id) is None else None
+        try:
+            if global_id is None:
+                compute_and_store_forecast(unique_id)
+            elif global_id not in global_errors:
+                global_errors[global_id] = None
+                compute_and_store_global_forecast(global_id)
+            elif global_errors[global_id] is not None:
+                raise RuntimeError(global_errors[global_id])
+            job = {"unique_id": unique_id, "status": "success", "error": None}
+        except Exception as e:
+            print(f"🛑 Échec du calcul des prévisions de {unique_id}: {e}\n{traceback.format_exc()}")
+            job = {"unique_id": unique_id, "status": "failed", "error": str(e)}
+            if global_id is not None:
+                global_errors[global_id] = str(e)
+        job["duration_s"] = round(time.perf_counter() - start, 1)
+        print(f"[{i}/{len(unique_ids)}] {unique_id} : {job['status']} ({job['duration_s']} s)")
+        report.append(job)
+
+    succeeded = sum(job["status"] == "success" for job in report)
+    print(f"\n{succeeded}/{len(report)} prévisions enregistrées.")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Précalcule les prévisions futures servies par /predict.")
+    parser.add_argument("--ids", help="Liste d'IDs séparés par des virgules (par défaut : tous les modèles configurés).")
+    args = parser.parse_args()
+
+    ids = [uid.strip() for uid in args.ids.split(",") if uid.strip()] if args.ids else None
+    report = run_batch_forecast(ids)
+    if any(job["status"] != "success" for job in report):
+        raise SystemExit(1)
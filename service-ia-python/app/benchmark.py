@@ -0,0 +1,241 @@
+# Fichier: service-ia-python/app/benchmark.py
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+SERVICE_ROOT = Path(__file__).parent.parent
+SALES_CSV = SERVICE_ROOT / "data" / "ventes_paris_ligne1_par_categorie.csv"
+DEFAULT_RESULTS_PATH = SERVICE_ROOT / "benchmark_results.jsonl"
+# Modèle de référence : seul artefact versionné dans le dépôt (downloaded_model/temp_ligne1_category1_01)
+BENCHMARK_MODEL_ID = "ligne1_category1_01"
+DEFAULT_HISTORY_WEEKS = [104, 260, 520]
+
+
+# ==============================================================================
+# --- ENVIRONNEMENT HORS LIGNE ---
+# ==============================================================================
+
+def configure_offline_environment(workdir: Path, database_url: str = None) -> str:
+    """
+    Oriente le service vers des ressources locales avant tout import de app.config :
+    base SQLite (ou Postgres jetable fourni), registre de modèles local, stores temporaires.
+    Retourne l'URL de la base utilisée.
+    """
+    database_url = database_url or f"sqlite:///{workdir / 'benchmark.db'}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["MODEL_REGISTRY_BACKEND"] = "local"
+    os.environ["LOCAL_REGISTRY_ROOT"] = str(SERVICE_ROOT / "downloaded_model")
+    os.environ["ARTIFACT_STORE_ROOT"] = str(workdir / "store")
+    os.environ["FEATURE_STORE_ENABLED"] = "false"
+    os.environ["MODEL_REFRESHER_ENABLED"] = "false"
+    os.environ["HISTORY_INDEX_ENABLED"] = "false"
+    return database_url
+
+def get_git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=SERVICE_ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+# ==============================================================================
+# --- DONNÉES SYNTHÉTIQUES ---
+# ==============================================================================
+
+def build_sales_fixture(item_id: str, history_weeks: int) -> pd.DataFrame:
+    """
+    Ventes journalières de `item_id` sur `history_weeks` semaines : la série réelle du CSV est
+    répétée vers le passé autant que nécessaire, la dernière date restant celle du CSV.
+    """
+    df_csv = pd.read_csv(SALES_CSV, parse_dates=['timestamp'])
+    real = df_csv.loc[df_csv['item_id'] == item_id].sort_values('timestamp')['qty_sold'].to_numpy()
+    end_date = df_csv['timestamp'].max()
+    dates = pd.date_range(end=end_date, periods=history_weeks * 7, freq="D")
+    qty = np.resize(real[::-1], len(dates))[::-1]
+    return pd.DataFrame({'item_id': item_id, 'timestamp': dates, 'qty_sold': qty.astype(int)})
+
+def build_staging_fixture(df_sales: pd.DataFrame) -> pd.DataFrame:
+    """Lignes de 'sales_staging' (format brut de l'ETL) correspondant aux ventes données."""
+    from .config import ETL_STAGING_WATERMARK_COLUMN
+    return pd.DataFrame({
+        ETL_STAGING_WATERMARK_COLUMN: range(1, len(df_sales) + 1),
+        'city': 'PARIS',
+        'product_line': '01',
+        'sale_date': df_sales['timestamp'].dt.strftime('%Y%m%d'),
+        'category1': df_sales['item_id'].str.replace('category1_', '', regex=False),
+        'qty_sold': df_sales['qty_sold'],
+    })
+
+def load_fixture_tables(df_sales: pd.DataFrame, df_staging: pd.DataFrame = None):
+    """(Re)crée les tables 'sales' et, si fourni, 'sales_staging' dans la base de benchmark."""
+    from .database import get_engine, get_statement
+    engine = get_engine()
+    timestamp_type = "TIMESTAMPTZ" if engine.dialect.name == "postgresql" else "TIMESTAMP"
+    with engine.begin() as conn:
+        conn.execute(get_statement("DROP TABLE IF EXISTS sales;"))
+        conn.execute(get_statement(f"""
+            CREATE TABLE sales (
+                item_id TEXT NOT NULL,
+                "timestamp" {timestamp_type} NOT NULL,
+                qty_sold INTEGER NOT NULL,
+                PRIMARY KEY (item_id, "timestamp")
+            );
+        """))
+        df_sales.to_sql("sales", conn, if_exists="append", index=False)
+        if df_staging is not None:
+            df_staging.to_sql("sales_staging", conn, if_exists="replace", index=False)
+            # L'ETL ne traite que les lignes au-delà de son watermark : chaque mesure repart de zéro
+            conn.execute(get_statement("DROP TABLE IF EXISTS etl_watermarks;"))
+
+
+# ==============================================================================
+# --- MESURES ---
+# ==============================================================================
+
+def time_stage(fn, repeat: int, setup=None) -> dict:
+    """Exécute `fn` `repeat` fois (après `setup`, non chronométré) et résume les durées en ms."""
+    durations, result = [], None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    durations = np.array(durations)
+    return {
+        "median_ms": round(float(np.median(durations)), 3),
+        "min_ms": round(float(durations.min()), 3),
+        "p95_ms": round(float(np.percentile(durations, 95)), 3),
+        "repeat": repeat,
+    }, result
+
+def run_benchmarks(history_weeks, repeat: int, database_url: str = None) -> list:
+    """Chronomètre chaque étape du pipeline pour chaque taille d'historique synthétique."""
+    workdir = Path(tempfile.mkdtemp(prefix="benchmark_"))
+    database_url = configure_offline_environment(workdir, database_url)
+    backend = "postgresql" if database_url.startswith("postgresql") else "sqlite"
+
+    # Imports après la configuration de l'environnement (lu par app.config à l'import)
+    from autogluon.timeseries import TimeSeriesDataFrame
+    from .config import MODELS_CONFIG
+    from .data_access import get_daily_data, aggregate_weekly, complete_weekly_index, get_weekly_data_sql
+    from .features import prepare_weekly_frame
+    from .forecast_store import forecast_to_records
+    from .responses import serialize_records, pa
+    from .predict import model_registry, download_and_load_predictor
+
+    config = MODELS_CONFIG[BENCHMARK_MODEL_ID]
+    item_id = config["category_id_in_file"]
+    results = []
+
+    def record(stage: str, weeks, stats: dict):
+        results.append({"stage": stage, "history_weeks": weeks, "backend": backend, **stats})
+        print(f"{stage:<24} {str(weeks):>6} sem.  médiane {stats['median_ms']:>10.2f} ms  (min {stats['min_ms']:.2f}, p95 {stats['p95_ms']:.2f})")
+
+    print(f"--- Benchmark hors ligne ({backend}, {repeat} répétitions, répertoire {workdir}) ---")
+    version = model_registry.latest_version(BENCHMARK_MODEL_ID)
+    stats, (predictor, _, _) = time_stage(lambda: download_and_load_predictor(BENCHMARK_MODEL_ID, version), 1)
+    record("model_load", None, stats)
+
+    for weeks in history_weeks:
+        df_sales = build_sales_fixture(item_id, weeks)
+        load_fixture_tables(df_sales, build_staging_fixture(df_sales) if backend == "postgresql" else None)
+
+        stats, df_daily = time_stage(lambda: get_daily_data(config), repeat)
+        record("sql_fetch_daily", weeks, stats)
+        if backend == "postgresql":
+            stats, _ = time_stage(lambda: get_weekly_data_sql(config), repeat)
+            record("sql_fetch_weekly", weeks, stats)
+
+        stats, df_weekly = time_stage(lambda: complete_weekly_index(aggregate_weekly(df_daily, config), config), repeat)
+        record("weekly_aggregation", weeks, stats)
+
+        stats, df_prepared = time_stage(lambda: prepare_weekly_frame(df_weekly, config), repeat)
+        record("feature_engineering", weeks, stats)
+
+        data = TimeSeriesDataFrame.from_data_frame(df_prepared, id_column="item_id", timestamp_column="timestamp")
+        stats, predictions = time_stage(lambda: predictor.predict(data, use_cache=False), repeat)
+        record("predict", weeks, stats)
+
+        stats, records = time_stage(lambda: forecast_to_records(predictions), repeat)
+        record("serialize_records", weeks, stats)
+        stats, _ = time_stage(lambda: serialize_records(records, "columns"), repeat)
+        record("serialize_columns", weeks, stats)
+        if pa is not None:
+            stats, _ = time_stage(lambda: serialize_records(records, "arrow"), repeat)
+            record("serialize_arrow", weeks, stats)
+
+        if backend == "postgresql":
+            # etl.py est à la racine du service, à côté du paquet app
+            sys.path.insert(0, str(SERVICE_ROOT))
+            from etl import run_etl_for_product_line
+            stats, _ = time_stage(lambda: run_etl_for_product_line("01", "sales"), repeat,
+                                  setup=lambda: load_fixture_tables(df_sales, build_staging_fixture(df_sales)))
+            record("etl_product_line", weeks, stats)
+        else:
+            print("etl_product_line : ignoré (requiert Postgres, voir --database_url)")
+    return results
+
+
+# ==============================================================================
+# --- HISTORIQUE DES RÉSULTATS ET RÉGRESSIONS ---
+# ==============================================================================
+
+def save_results(results: list, path: Path) -> str:
+    """Ajoute les mesures au fichier JSONL, étiquetées par commit et date d'exécution."""
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    commit = get_git_commit()
+    with open(path, "a", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps({"run_id": run_id, "commit": commit, **result}) + "\n")
+    print(f"✅ {len(results)} mesures enregistrées dans {path} (commit {commit}).")
+    return run_id
+
+def find_regressions(path: Path, run_id: str, threshold: float) -> list:
+    """
+    Compare la médiane de chaque étape du run `run_id` à celle du run précédent le plus récent
+    d'un autre commit (même taille d'historique, même base) ; retourne les étapes plus lentes
+    de plus de `threshold` (ex: 0.2 = +20 %).
+    """
+    df = pd.read_json(path, lines=True)
+    df["history_weeks"] = df["history_weeks"].map(lambda weeks: "-" if pd.isna(weeks) else str(int(weeks)))
+    current = df[df["run_id"] == run_id]
+    previous_runs = df[(df["run_id"] < run_id) & (df["commit"] != current["commit"].iloc[0])]
+    if previous_runs.empty:
+        print("Aucun run de référence pour la comparaison.")
+        return []
+    baseline_run = previous_runs["run_id"].max()
+    baseline = df[df["run_id"] == baseline_run]
+    merged = current.merge(baseline, on=["stage", "history_weeks", "backend"], suffixes=("", "_baseline"))
+    merged["ratio"] = merged["median_ms"] / merged["median_ms_baseline"]
+    regressions = merged[merged["ratio"] > 1 + threshold]
+    print(f"\n--- Comparaison avec le run {baseline_run} (commit {baseline['commit'].iloc[0]}) ---")
+    for row in merged.itertuples():
+        flag = "❌" if row.ratio > 1 + threshold else "✅"
+        print(f"{flag} {row.stage:<24} {row.history_weeks:>6} sem.  {row.median_ms_baseline:>10.2f} -> {row.median_ms:>10.2f} ms  (x{row.ratio:.2f})")
+    return regressions[["stage", "history_weeks", "ratio"]].to_dict(orient="records")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne des pipelines de prédiction, d'historique et d'ETL.")
+    parser.add_argument("--weeks", default=",".join(map(str, DEFAULT_HISTORY_WEEKS)), help="Tailles d'historique synthétique, en semaines (séparées par des virgules).")
+    parser.add_argument("--repeat", type=int, default=5, help="Nombre de répétitions par étape.")
+    parser.add_argument("--database_url", default=None, help="Base Postgres JETABLE (les tables y sont recréées). Par défaut : SQLite temporaire.")
+    parser.add_argument("--results", default=str(DEFAULT_RESULTS_PATH), help="Fichier JSONL d'historique des mesures.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Ralentissement toléré avant de signaler une régression (0.2 = +20 %%).")
+    parser.add_argument("--fail_on_regression", action="store_true", help="Code de sortie 1 si une régression est détectée.")
+    args = parser.parse_args()
+
+    results = run_benchmarks([int(w) for w in args.weeks.split(",") if w.strip()], args.repeat, args.database_url)
+    run_id = save_results(results, Path(args.results))
+    regressions = find_regressions(Path(args.results), run_id, args.threshold)
+    if regressions and args.fail_on_regression:
+        raise SystemExit(1)
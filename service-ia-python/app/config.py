@@ -1,10 +1,126 @@
 # Fichier: service-ia-python/app/config.py (Version finale pour Supabase)
+import os
 from pathlib import Path
+from dotenv import load_dotenv
+
+# Les paramètres ci-dessous lisent l'environnement : on charge le .env dès l'import.
+load_dotenv()
 
 SERVICE_ROOT = Path(__file__).parent.parent
 MODELS_ROOT = SERVICE_ROOT / "AutogluonModels"
 # La référence à DATA_ROOT n'est plus nécessaire
 
+# ==============================================================================
+# --- PARAMÈTRES DU SERVICE (surchargeables par variables d'environnement) ---
+# ==============================================================================
+# Mémoire maximale occupée par les prédicteurs gardés en cache (en Mo).
+# L'estimation se base sur la taille des artefacts sur disque.
+PREDICTOR_CACHE_MAX_MB = int(os.environ.get("PREDICTOR_CACHE_MAX_MB", "2048"))
+
+# Registre des modèles : "comet" (Comet ML) ou "local" (dossiers temp_{unique_id} déjà présents sur disque).
+MODEL_REGISTRY_BACKEND = os.environ.get("MODEL_REGISTRY_BACKEND", "comet")
+LOCAL_REGISTRY_ROOT = Path(os.environ.get("LOCAL_REGISTRY_ROOT", SERVICE_ROOT / "downloaded_model"))
+# Store persistant des versions téléchargées (réutilisé après redémarrage du conteneur)
+ARTIFACT_STORE_ROOT = Path(os.environ.get("ARTIFACT_STORE_ROOT", MODELS_ROOT / "store"))
+
+# Surveillance du registre en arrière-plan : les nouvelles versions sont préchargées hors requête.
+MODEL_REFRESHER_ENABLED = os.environ.get("MODEL_REFRESHER_ENABLED", "true").lower() == "true"
+MODEL_REFRESH_INTERVAL_SECONDS = float(os.environ.get("MODEL_REFRESH_INTERVAL_SECONDS", "300"))
+
+# Pool de connexions PostgreSQL partagé par tout le processus (voir app/database.py)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_RECYCLE_SECONDS = int(os.environ.get("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_TIMEOUT_SECONDS = int(os.environ.get("DB_POOL_TIMEOUT_SECONDS", "30"))
+
+# Agrégation hebdomadaire (W-MON) : "sql" (GROUP BY dans Postgres), "pandas" (resample historique)
+# ou "rollup" (lecture de la table hebdomadaire maintenue par l'ETL)
+WEEKLY_AGGREGATION_MODE = os.environ.get("WEEKLY_AGGREGATION_MODE", "sql").lower()
+# Table journalière -> table de cumul hebdomadaire alimentée par etl.py
+WEEKLY_ROLLUP_TABLES = {
+    "sales": "sales_weekly",
+    "sales_product_line_2": "sales_product_line_2_weekly",
+}
+
+# Taille des blocs lus dans 'sales_staging' par l'ETL en mode streaming
+ETL_CHUNK_SIZE = int(os.environ.get("ETL_CHUNK_SIZE", "50000"))
+# Colonne de 'sales_staging' servant de watermark au mode incrémental de l'ETL : seules les lignes
+# au-delà du dernier watermark sont relues. Elle doit être strictement croissante dans l'ordre de
+# validation des lignes (un seul chargeur qui numérote ses lots, ou valeur attribuée à la validation) :
+# un id de séquence pris par des chargeurs concurrents peut être validé après un id plus grand déjà
+# traité, et la ligne serait alors ignorée définitivement.
+ETL_STAGING_WATERMARK_COLUMN = os.environ.get("ETL_STAGING_WATERMARK_COLUMN", "id")
+# Ligne produit -> table de ventes journalières alimentée par l'ETL
+PRODUCT_LINE_TABLES = {
+    "01": "sales",
+    "02": "sales_product_line_2",
+}
+
+# Orchestrateur d'entraînement (python -m app.train --all) : nombre maximal d'entraînements
+# simultanés, 0 = autant que de cœurs (les cœurs sont ensuite répartis entre les entraînements)
+TRAINING_MAX_PARALLEL_JOBS = int(os.environ.get("TRAINING_MAX_PARALLEL_JOBS", "0"))
+
+# Feature store local : données hebdomadaires préparées, partagées entre entraînement et prédiction
+FEATURE_STORE_ENABLED = os.environ.get("FEATURE_STORE_ENABLED", "true").lower() == "true"
+FEATURE_STORE_ROOT = Path(os.environ.get("FEATURE_STORE_ROOT", SERVICE_ROOT / "feature_store"))
+
+# Série hebdomadaire des covariables (météo, IPC, moral des ménages) partagée par les modèles :
+# délai minimal entre deux vérifications du watermark des tables de covariables
+COVARIATE_CACHE_CHECK_SECONDS = float(os.environ.get("COVARIATE_CACHE_CHECK_SECONDS", "300"))
+
+# Prévisions futures précalculées par `python -m app.batch_forecast`, servies par /predict
+FORECAST_STORE_TABLE = os.environ.get("FORECAST_STORE_TABLE", "forecasts")
+# Délai minimal entre deux lectures du watermark des données d'un modèle pour valider ses prévisions
+# stockées : un ETL est pris en compte par /predict au plus tard après ce délai
+FORECAST_WATERMARK_CHECK_SECONDS = float(os.environ.get("FORECAST_WATERMARK_CHECK_SECONDS", "60"))
+# /predict ne fait plus d'inférence sur le chemin nominal : la limite peut être bien plus haute
+PREDICT_RATE_LIMIT = os.environ.get("PREDICT_RATE_LIMIT", "600/minute")
+
+# Pool dédié aux calculs de l'API (inférence, lectures en base), hors du threadpool de Starlette.
+# Au-delà de INFERENCE_MAX_PENDING calculs distincts en cours, l'API répond 503 + Retry-After.
+INFERENCE_MAX_WORKERS = int(os.environ.get("INFERENCE_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+INFERENCE_MAX_PENDING = int(os.environ.get("INFERENCE_MAX_PENDING", "32"))
+INFERENCE_RETRY_AFTER_SECONDS = int(os.environ.get("INFERENCE_RETRY_AFTER_SECONDS", "5"))
+
+# Index en mémoire des ventes hebdomadaires servant /historical, rafraîchi depuis le watermark
+# des tables de ventes au plus toutes les HISTORY_INDEX_CHECK_SECONDS secondes
+HISTORY_INDEX_ENABLED = os.environ.get("HISTORY_INDEX_ENABLED", "true").lower() == "true"
+HISTORY_INDEX_CHECK_SECONDS = float(os.environ.get("HISTORY_INDEX_CHECK_SECONDS", "300"))
+# Nombre maximal d'années de comparaison (N-1 ... N-k) par requête /historical
+HISTORY_MAX_YEARS_BACK = int(os.environ.get("HISTORY_MAX_YEARS_BACK", "5"))
+
+# Backtest à origines glissantes : nombre de lots de fenêtres prédits en parallèle (0 = nombre de cœurs)
+BACKTEST_MAX_WORKERS = int(os.environ.get("BACKTEST_MAX_WORKERS", "0"))
+
+# Réentraînement incrémental (python -m app.train --incremental) : la version en service est
+# ré-entraînée quelques époques sur la série prolongée, sauf si sa perte de validation a dérivé de
+# plus de INCREMENTAL_DRIFT_THRESHOLD (relatif) par rapport au dernier entraînement complet.
+INCREMENTAL_FINE_TUNE_EPOCHS = int(os.environ.get("INCREMENTAL_FINE_TUNE_EPOCHS", "5"))
+INCREMENTAL_DRIFT_THRESHOLD = float(os.environ.get("INCREMENTAL_DRIFT_THRESHOLD", "0.25"))
+
+# Recherche d'hyperparamètres (python -m app.tuning, espaces dans TUNING_SEARCH_SPACES) : budget de
+# cœurs (0 = tous), nombre d'essais simultanés (0 = un par cœur) et durée totale maximale, en secondes
+TUNING_MAX_CPUS = int(os.environ.get("TUNING_MAX_CPUS", "0"))
+TUNING_MAX_PARALLEL_TRIALS = int(os.environ.get("TUNING_MAX_PARALLEL_TRIALS", "0"))
+TUNING_TIME_BUDGET_SECONDS = float(os.environ.get("TUNING_TIME_BUDGET_SECONDS", "3600"))
+TUNING_RESULTS_ROOT = Path(os.environ.get("TUNING_RESULTS_ROOT", SERVICE_ROOT / "tuning_results"))
+
+# Modèles globaux (voir GLOBAL_MODELS_CONFIG) : toutes les catégories d'une même source_table sont
+# entraînées et servies par un seul prédicteur multi-séries au lieu d'un prédicteur par catégorie
+GLOBAL_MODELS_ENABLED = os.environ.get("GLOBAL_MODELS_ENABLED", "false").lower() == "true"
+
+# Prévisions hiérarchiques (voir HIERARCHY_CONFIG) : les totaux de ligne sont dérivés des prévisions
+# des catégories. "bottom_up" : somme des catégories, sans modèle du total ; "mint" : réconciliation
+# MinT (covariance diagonale estimée par l'écart entre quantiles) avec la prévision du modèle du total.
+HIERARCHICAL_FORECASTS_ENABLED = os.environ.get("HIERARCHICAL_FORECASTS_ENABLED", "false").lower() == "true"
+HIERARCHY_RECONCILIATION = os.environ.get("HIERARCHY_RECONCILIATION", "bottom_up").lower()
+
+# Cache des prévisions, invalidé par la version du modèle et le watermark des données.
+# Le TTL n'est qu'un filet de sécurité.
+FORECAST_CACHE_MAX_ENTRIES = int(os.environ.get("FORECAST_CACHE_MAX_ENTRIES", "256"))
+FORECAST_CACHE_TTL_SECONDS = float(os.environ.get("FORECAST_CACHE_TTL_SECONDS", "21600"))
+
 # ==============================================================================
 # --- REGISTRE DES MODÈLES ---
 # ==============================================================================
@@ -103,4 +219,84 @@ MODELS_CONFIG = {
             'early_stopping_patience': 10
         }
     }
-}
\ No newline at end of file
+}
+
+# ==============================================================================
+# --- MODÈLES GLOBAUX (MULTI-SÉRIES) PAR LIGNE PRODUIT ---
+# ==============================================================================
+# Utilisés si GLOBAL_MODELS_ENABLED : un modèle regroupe toutes les entrées de MODELS_CONFIG de sa
+# `source_table` (sauf celles de "exclude"). Les clés "transformation", "known_covariates" et
+# "feature_engineering" remplacent celles des catégories (colonnes communes à toutes les séries) ;
+# "data_filter_start" et "training_start_date" restent propres à chaque catégorie.
+GLOBAL_MODELS_CONFIG = {
+    "ligne1_global": {
+        "source_table": "sales",
+        "transformation": "log",
+        "known_covariates": ["temperature_mean", "rain", "ipc", "moral_menages"],
+        "time_limit": 1200,
+        "hyperparameters": {
+            'model': 'TemporalFusionTransformer',
+            'context_length': 36,
+            'hidden_dim': 64,
+            'num_heads': 4,
+            'dropout_rate': 0.2,
+            'max_epochs': 120,
+            'early_stopping_patience': 15
+        }
+    },
+    "ligne2_global": {
+        "source_table": "sales_product_line_2",
+        "transformation": "log",
+        "known_covariates": [],
+        "hyperparameters": {
+            "model": "DeepAR",
+            'context_length': 24,
+            'num_layers': 2,
+            'hidden_size': 40,
+            'dropout_rate': 0.1,
+            'max_epochs': 60,
+            'early_stopping_patience': 10
+        }
+    }
+}
+
+# ==============================================================================
+# --- HIÉRARCHIE DES PRÉVISIONS (TOTAL DE LIGNE -> CATÉGORIES) ---
+# ==============================================================================
+# Utilisée si HIERARCHICAL_FORECASTS_ENABLED : total -> liste COMPLÈTE des catégories de sa table.
+# Chaque entrée est vérifiée sur l'historique au démarrage (voir hierarchy.get_verified_hierarchy) ;
+# un total qui n'est pas la somme de ses catégories garde son propre modèle.
+# Aucune entrée : les séries `_CA` des tables actuelles sont des catégories à part entière et non
+# la somme des autres catégories (écart hebdomadaire sur l'historique : de -151 à 0 pour la ligne 1,
+# de -201 à +48 pour la ligne 2).
+HIERARCHY_CONFIG = {}
+
+# ==============================================================================
+# --- ESPACES DE RECHERCHE DES HYPERPARAMÈTRES (PAR TYPE DE MODÈLE) ---
+# ==============================================================================
+# ("int", min, max), ("float", min, max), ("log", min, max) ou ("choice", [valeurs]).
+# Les hyperparamètres absents de l'espace (max_epochs, early_stopping_patience...) sont repris
+# de la config du modèle.
+TUNING_SEARCH_SPACES = {
+    "TemporalFusionTransformer": {
+        "context_length": ("int", 12, 52),
+        "hidden_dim": ("choice", [32, 64, 128]),
+        "num_heads": ("choice", [2, 4, 8]),
+        "dropout_rate": ("float", 0.05, 0.4),
+        "lr": ("log", 1e-4, 1e-2),
+    },
+    "PatchTST": {
+        "context_length": ("int", 24, 64),
+        "patch_len": ("choice", [4, 8, 16]),
+        "stride": ("choice", [2, 4, 8]),
+        "d_model": ("choice", [32, 64, 128]),
+        "nhead": ("choice", [4, 8]),
+        "num_encoder_layers": ("int", 1, 4),
+    },
+    "DeepAR": {
+        "context_length": ("int", 12, 52),
+        "num_layers": ("int", 1, 4),
+        "hidden_size": ("choice", [20, 40, 80]),
+        "dropout_rate": ("float", 0.05, 0.4),
+    },
+}
@@ -0,0 +1,131 @@
+# Fichier: service-ia-python/app/covariates.py
+
+import time
+import threading
+import pandas as pd
+from .config import COVARIATE_CACHE_CHECK_SECONDS
+from .database import read_sql
+
+# Semaines W-MON, comme les ventes (voir data_access.WEEKLY_FREQ)
+WEEKLY_FREQ = "W-MON"
+# Même étiquette de semaine que data_access.SQL_WEEK_LABEL, appliquée à un jour du calendrier
+SQL_DAY_WEEK_LABEL = "DATE_TRUNC('week', d.day - INTERVAL '1 day') + INTERVAL '7 days'"
+
+# Covariable -> (expression SQL de la valeur journalière, table source)
+COVARIATE_COLUMNS = {
+    "temperature_mean": ("w.temperature_mean", "weather"),
+    "rain": ("w.precipitation", "weather"),
+    "ipc": ("i.ipc_clothing_shoes", "ipc"),
+    "moral_menages": ("hc.synthetic_indicator", "household_confidence"),
+}
+
+# Calendrier journalier couvrant toutes les tables de covariables : la météo est journalière,
+# l'IPC et le moral des ménages sont mensuels et valent pour chaque jour du mois.
+WEEKLY_COVARIATES_QUERY = f"""
+WITH bounds AS (
+    SELECT
+        LEAST(
+            (SELECT MIN(date) FROM weather WHERE city = 'PARIS'),
+            (SELECT MIN(time_period) FROM ipc),
+            (SELECT MIN(time_period) FROM household_confidence)
+        ) AS start_day,
+        GREATEST(
+            (SELECT MAX(date) FROM weather WHERE city = 'PARIS'),
+            (SELECT MAX(time_period) FROM ipc) + INTERVAL '1 month' - INTERVAL '1 day',
+            (SELECT MAX(time_period) FROM household_confidence) + INTERVAL '1 month' - INTERVAL '1 day'
+        ) AS end_day
+)
+SELECT {SQL_DAY_WEEK_LABEL} AS "timestamp",
+       {", ".join(f"AVG({expression}) AS {name}" for name, (expression, _) in COVARIATE_COLUMNS.items())}
+FROM bounds, generate_series(bounds.start_day, bounds.end_day, INTERVAL '1 day') AS d(day)
+LEFT JOIN weather w ON w.date = d.day::DATE AND w.city = 'PARIS'
+LEFT JOIN ipc i ON i.time_period = DATE_TRUNC('month', d.day)::DATE
+LEFT JOIN household_confidence hc ON hc.time_period = DATE_TRUNC('month', d.day)::DATE
+GROUP BY 1
+ORDER BY 1;
+"""
+
+COVARIATES_WATERMARK_QUERY = """
+SELECT
+    (SELECT MAX(w.date) FROM weather w WHERE w.city = 'PARIS') AS weather_max_date,
+    (SELECT COUNT(*) FROM weather w WHERE w.city = 'PARIS') AS weather_rows,
+    (SELECT MAX(i.time_period) FROM ipc i) AS ipc_max_period,
+    (SELECT MAX(hc.time_period) FROM household_confidence hc) AS hc_max_period;
+"""
+
+
+def get_covariates_watermark() -> tuple:
+    """État des tables de covariables : change dès qu'une nouvelle période y est chargée."""
+    row = read_sql(COVARIATES_WATERMARK_QUERY).iloc[0]
+    return tuple(str(value) for value in row.tolist())
+
+def build_weekly_covariates() -> pd.DataFrame:
+    """
+    Série hebdomadaire (W-MON) de toutes les covariables : moyenne des jours de la semaine,
+    semaines manquantes réinsérées puis interpolées comme dans la préparation des modèles.
+    """
+    print("--- Construction de la série hebdomadaire des covariables ---")
+    df = read_sql(WEEKLY_COVARIATES_QUERY, parse_dates=['timestamp'])
+    if df.empty:
+        return pd.DataFrame(columns=['timestamp'] + list(COVARIATE_COLUMNS))
+    df = df.set_index('timestamp').asfreq(WEEKLY_FREQ)
+    for col in COVARIATE_COLUMNS:
+        df[col] = df[col].astype(float).interpolate(method='linear').ffill().bfill()
+    print(f"✅ {len(df)} semaines de covariables calculées.")
+    return df.reset_index()
+
+class CovariateCache:
+    """
+    Série hebdomadaire des covariables, calculée une fois par état des données et partagée
+    par tous les modèles du processus. Le watermark des tables n'est revérifié qu'au plus
+    toutes les `check_seconds` secondes.
+    """
+
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._weekly = None
+        self._watermark = None
+        self._checked_at = 0.0
+        self.builds = 0
+
+    def get_weekly(self) -> pd.DataFrame:
+        with self._lock:
+            now = time.monotonic()
+            if self._weekly is not None and now - self._checked_at < self.check_seconds:
+                return self._weekly
+            watermark = get_covariates_watermark()
+            if self._weekly is None or watermark != self._watermark:
+                self._weekly = build_weekly_covariates()
+                self._watermark = watermark
+                self.builds += 1
+            self._checked_at = now
+            return self._weekly
+
+    def invalidate(self):
+        with self._lock:
+            self._weekly, self._watermark, self._checked_at = None, None, 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "builds": self.builds,
+                "weeks": len(self._weekly) if self._weekly is not None else 0,
+                "watermark": list(self._watermark) if self._watermark is not None else None,
+            }
+
+covariate_cache = CovariateCache(COVARIATE_CACHE_CHECK_SECONDS)
+
+def join_weekly_covariates(df_weekly: pd.DataFrame, known_covariates) -> pd.DataFrame:
+    """Ajoute aux ventes hebdomadaires les covariables demandées, jointes sur la semaine."""
+    known_covariates = list(known_covariates)
+    if not known_covariates:
+        return df_weekly
+    unknown = [cov for cov in known_covariates if cov not in COVARIATE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Covariable(s) inconnue(s) : {unknown}. Valeurs possibles : {list(COVARIATE_COLUMNS)}")
+    covariates = covariate_cache.get_weekly()[['timestamp'] + known_covariates]
+    return df_weekly.merge(covariates, on='timestamp', how='left')
+
+def get_covariate_cache_stats():
+    return covariate_cache.stats()
@@ -0,0 +1,322 @@
+# Fichier: service-ia-python/app/data_access.py
+
+import argparse
+import pandas as pd
+from .config import MODELS_CONFIG, WEEKLY_AGGREGATION_MODE, WEEKLY_ROLLUP_TABLES
+from .database import read_sql, get_statement, check_table_name
+from .covariates import join_weekly_covariates
+from .metrics import timed_stage
+
+# Semaines au sens pandas 'W-MON' : intervalle ]mardi précédent ; lundi], étiqueté par le lundi de fin.
+WEEKLY_FREQ = "W-MON"
+# Équivalent SQL de l'étiquette 'W-MON' : le lundi qui clôt la semaine contenant le jour.
+# Les horodatages sont ramenés en UTC, comme le fait pandas avant le resample ; sur une colonne
+# TIMESTAMP, DATE_TRUNC s'applique dans le fuseau de la session, fixé à UTC par get_engine.
+SQL_WEEK_LABEL = "DATE_TRUNC('week', (s.\"timestamp\" AT TIME ZONE 'UTC') - INTERVAL '1 day') + INTERVAL '7 days'"
+
+def to_naive_utc(timestamps: pd.Series) -> pd.Series:
+    """Horodatages en UTC sans fuseau : une colonne TIMESTAMPTZ ou TIMESTAMP donne les mêmes semaines."""
+    timestamps = pd.to_datetime(timestamps)
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_convert("UTC").dt.tz_localize(None)
+    return timestamps
+
+def build_daily_query(config) -> str:
+    """Requête des ventes journalières d'un item (les covariables sont jointes ensuite par semaine)."""
+    source_table = check_table_name(config.get("source_table", "sales"))
+    return f"""
+    SELECT s.item_id, s."timestamp", s.qty_sold
+    FROM {source_table} s
+    WHERE s.item_id = :item_id
+    ORDER BY s."timestamp";
+    """
+
+def build_weekly_query(config) -> str:
+    """Même requête que `build_daily_query`, mais agrégée par semaine W-MON directement dans Postgres."""
+    source_table = check_table_name(config.get("source_table", "sales"))
+    return f"""
+    SELECT {SQL_WEEK_LABEL} AS "timestamp", CAST(SUM(s.qty_sold) AS DOUBLE PRECISION) AS qty_sold
+    FROM {source_table} s
+    WHERE s.item_id = :item_id
+    GROUP BY 1
+    ORDER BY 1;
+    """
+
+def build_weekly_query_for_items(source_table: str, since: bool = False) -> str:
+    """
+    Agrégation W-MON de plusieurs items d'une même table en une seule requête.
+    Avec `since`, seules les ventes à partir du paramètre :since sont lues (mises à jour incrémentales).
+    """
+    source_table = check_table_name(source_table)
+    since_filter = "AND s.\"timestamp\" >= CAST(:since AS date)" if since else ""
+    return f"""
+    SELECT s.item_id, {SQL_WEEK_LABEL} AS "timestamp", CAST(SUM(s.qty_sold) AS DOUBLE PRECISION) AS qty_sold
+    FROM {source_table} s
+    WHERE s.item_id = ANY(:item_ids)
+    {since_filter}
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+    """
+
+def get_weekly_data_for_configs(configs: dict) -> dict:
+    """
+    Récupère en une requête par `source_table` les données hebdomadaires de plusieurs modèles.
+    `configs` est un dict unique_id -> config ; retourne un dict unique_id -> DataFrame, identique
+    à `get_weekly_data(config, mode="sql")` pour chaque modèle.
+    """
+    by_table = {}
+    for unique_id, config in configs.items():
+        by_table.setdefault(config.get("source_table", "sales"), []).append(unique_id)
+
+    results = {}
+    for source_table, unique_ids in by_table.items():
+        item_ids = sorted({configs[uid]["category_id_in_file"] for uid in unique_ids})
+        print(f"--- Récupération groupée de {len(item_ids)} items depuis '{source_table}' ---")
+        df_all = read_sql(build_weekly_query_for_items(source_table), params={"item_ids": item_ids}, parse_dates=['timestamp'])
+        for uid in unique_ids:
+            config = configs[uid]
+            df_item = df_all.loc[df_all['item_id'] == config["category_id_in_file"], ['timestamp', 'qty_sold']].reset_index(drop=True)
+            results[uid] = add_covariates(complete_weekly_index(df_item, config), config)
+    return results
+
+def get_data_watermark(config) -> tuple:
+    """
+    Requête légère identifiant l'état des données d'un item : dernière date et nombre de lignes
+    de ventes, plus la dernière date des tables de covariables utilisées par le modèle.
+    """
+    item_id_to_fetch = config["category_id_in_file"]
+    known_covariates = config.get("known_covariates", [])
+    source_table = check_table_name(config.get("source_table", "sales"))
+
+    columns = ["MAX(s.\"timestamp\") AS max_timestamp", "COUNT(*) AS row_count"]
+    if "temperature_mean" in known_covariates or "rain" in known_covariates:
+        columns.append("(SELECT MAX(w.date) FROM weather w WHERE w.city = 'PARIS') AS weather_max_date")
+    if "ipc" in known_covariates:
+        columns.append("(SELECT MAX(i.time_period) FROM ipc i) AS ipc_max_period")
+    if "moral_menages" in known_covariates:
+        columns.append("(SELECT MAX(hc.time_period) FROM household_confidence hc) AS hc_max_period")
+
+    query = f"""
+    SELECT {", ".join(columns)}
+    FROM {source_table} s
+    WHERE s.item_id = :item_id;
+    """
+    row = read_sql(query, params={"item_id": item_id_to_fetch}).iloc[0]
+    return tuple(str(value) for value in row.tolist())
+
+def get_daily_data(config) -> pd.DataFrame:
+    print(f"--- 1. Récupération des données pour {config['category_id_in_file']} ---")
+    df = read_sql(build_daily_query(config), params={"item_id": config["category_id_in_file"]}, parse_dates=['timestamp'])
+    print(f"✅ {len(df)} lignes de données brutes récupérées.")
+    return df
+
+def aggregate_weekly(df_daily, config) -> pd.DataFrame:
+    """Agrégation pandas historique : somme des ventes par semaine."""
+    donnees_hebdo = df_daily.set_index('timestamp').resample(WEEKLY_FREQ).agg({'qty_sold': 'sum'}).reset_index()
+    donnees_hebdo['timestamp'] = to_naive_utc(donnees_hebdo['timestamp'])
+    donnees_hebdo['item_id'] = config["category_id_in_file"]
+    return donnees_hebdo
+
+def add_covariates(df_weekly, config) -> pd.DataFrame:
+    """Joint par semaine la série partagée des covariables du modèle (voir covariates.py)."""
+    if df_weekly.empty:
+        return df_weekly
+    return join_weekly_covariates(df_weekly, config.get("known_covariates", []))
+
+def complete_weekly_index(df_weekly, config) -> pd.DataFrame:
+    """
+    Réinsère les semaines sans vente (absentes d'un GROUP BY), comme le fait `resample` :
+    ventes à 0.
+    """
+    if df_weekly.empty:
+        return df_weekly
+    # Sur une colonne TIMESTAMP, SQL_WEEK_LABEL renvoie un TIMESTAMPTZ (en UTC, voir database.py)
+    df_weekly = df_weekly.assign(timestamp=to_naive_utc(df_weekly['timestamp']))
+    df_weekly = df_weekly.set_index('timestamp').asfreq(WEEKLY_FREQ)
+    df_weekly['qty_sold'] = df_weekly['qty_sold'].fillna(0)
+    df_weekly = df_weekly.reset_index()
+    df_weekly['item_id'] = config["category_id_in_file"]
+    return df_weekly
+
+def get_weekly_data_sql(config) -> pd.DataFrame:
+    print(f"--- 1. Récupération des données hebdomadaires (agrégées en SQL) pour {config['category_id_in_file']} ---")
+    df_weekly = read_sql(build_weekly_query(config), params={"item_id": config["category_id_in_file"]}, parse_dates=['timestamp'])
+    print(f"✅ {len(df_weekly)} semaines récupérées.")
+    return complete_weekly_index(df_weekly, config)
+
+def get_weekly_data_rollup(config) -> pd.DataFrame:
+    """Lecture directe de la table de cumul hebdomadaire maintenue par l'ETL."""
+    rollup_table = get_rollup_table(config.get("source_table", "sales"))
+    print(f"--- 1. Lecture des ventes hebdomadaires depuis '{rollup_table}' pour {config['category_id_in_file']} ---")
+    query = f"""
+    SELECT "timestamp", qty_sold
+    FROM {rollup_table}
+    WHERE item_id = :item_id
+    ORDER BY "timestamp";
+    """
+    df_weekly = read_sql(query, params={"item_id": config["category_id_in_file"]}, parse_dates=['timestamp'])
+    print(f"✅ {len(df_weekly)} semaines récupérées.")
+    return complete_weekly_index(df_weekly, config)
+
+def get_weekly_data(config, mode: str = None) -> pd.DataFrame:
+    """
+    Ventes hebdomadaires (W-MON) d'un item avec ses covariables hebdomadaires.
+    mode='sql' agrège dans Postgres, mode='pandas' rapatrie les lignes journalières,
+    mode='rollup' lit la table hebdomadaire maintenue par l'ETL.
+    """
+    mode = mode or WEEKLY_AGGREGATION_MODE
+    if mode not in ("sql", "pandas", "rollup"):
+        raise ValueError(f"Mode d'agrégation '{mode}' inconnu. Valeurs possibles : ['sql', 'pandas', 'rollup']")
+    with timed_stage("sql"):
+        if mode == "sql":
+            df_weekly = get_weekly_data_sql(config)
+        elif mode == "rollup":
+            df_weekly = get_weekly_data_rollup(config)
+        else:
+            df_daily = get_daily_data(config)
+    if mode == "pandas":
+        with timed_stage("resample"):
+            df_weekly = aggregate_weekly(df_daily, config)
+    with timed_stage("covariates"):
+        return add_covariates(df_weekly, config)
+
+def get_weekly_sales_between(config, start_date, end_date, mode: str = None) -> pd.DataFrame:
+    """Ventes hebdomadaires d'un item entre deux dates (bornes incluses)."""
+    mode = mode or WEEKLY_AGGREGATION_MODE
+    source_table = check_table_name(config.get("source_table", "sales"))
+    params = {"item_id": config["category_id_in_file"], "start_date": start_date, "end_date": end_date}
+
+    if mode == "pandas":
+        query = f"""
+            SELECT "timestamp", qty_sold
+            FROM {source_table}
+            WHERE item_id = :item_id
+            AND "timestamp" BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date)
+            ORDER BY "timestamp";
+        """
+        df_daily = read_sql(query, params=params, parse_dates=['timestamp'])
+        if df_daily.empty:
+            return df_daily
+        df_weekly = df_daily.set_index('timestamp').resample(WEEKLY_FREQ).agg({'qty_sold': 'sum'}).reset_index()
+        df_weekly['timestamp'] = to_naive_utc(df_weekly['timestamp'])
+        return df_weekly
+
+    if mode == "rollup":
+        # Les semaines du cumul sont complètes : on retient toutes celles qui recoupent la période
+        query = f"""
+            SELECT "timestamp", qty_sold
+            FROM {get_rollup_table(source_table)}
+            WHERE item_id = :item_id
+            AND "timestamp" BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date) + INTERVAL '6 days'
+            ORDER BY "timestamp";
+        """
+        df_weekly = read_sql(query, params=params, parse_dates=['timestamp'])
+        return complete_weekly_index(df_weekly, config)[['timestamp', 'qty_sold']]
+
+    if mode != "sql":
+        raise ValueError(f"Mode d'agrégation '{mode}' inconnu. Valeurs possibles : ['sql', 'pandas', 'rollup']")
+    query = f"""
+        SELECT {SQL_WEEK_LABEL} AS "timestamp", CAST(SUM(s.qty_sold) AS DOUBLE PRECISION) AS qty_sold
+        FROM {source_table} s
+        WHERE s.item_id = :item_id
+        AND s."timestamp" BETWEEN CAST(:start_date AS date) AND CAST(:end_date AS date)
+        GROUP BY 1
+        ORDER BY 1;
+    """
+    df_weekly = read_sql(query, params=params, parse_dates=['timestamp'])
+    return complete_weekly_index(df_weekly, config)[['timestamp', 'qty_sold']]
+
+
+# ==============================================================================
+# --- TABLE DE CUMUL HEBDOMADAIRE (alimentée par etl.py) ---
+# ==============================================================================
+
+def get_rollup_table(source_table: str) -> str:
+    if source_table not in WEEKLY_ROLLUP_TABLES:
+        raise ValueError(f"Aucune table de cumul hebdomadaire configurée pour '{source_table}'.")
+    return check_table_name(WEEKLY_ROLLUP_TABLES[source_table])
+
+def ensure_weekly_rollup_table(conn, source_table: str):
+    rollup_table = get_rollup_table(source_table)
+    conn.execute(get_statement(f"""
+        CREATE TABLE IF NOT EXISTS {rollup_table} (
+            item_id TEXT NOT NULL,
+            "timestamp" TIMESTAMP NOT NULL,
+            qty_sold DOUBLE PRECISION NOT NULL,
+            days_count INTEGER NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (item_id, "timestamp")
+        );
+    """))
+
+def get_touched_weeks(timestamps) -> tuple:
+    """Première et dernière semaine W-MON (lundi de fin) couvertes par une série de dates."""
+    week_labels = pd.to_datetime(timestamps).dt.to_period(WEEKLY_FREQ).dt.end_time.dt.normalize()
+    return week_labels.min(), week_labels.max()
+
+def refresh_weekly_rollup(conn, source_table: str, item_ids, first_week, last_week):
+    """
+    Recalcule dans le cumul les semaines [first_week ; last_week] des items donnés, à partir
+    de la table journalière. Le recalcul (et non l'ajout d'un delta) rend l'opération idempotente.
+    """
+    source_table = check_table_name(source_table)
+    rollup_table = get_rollup_table(source_table)
+    ensure_weekly_rollup_table(conn, source_table)
+    conn.execute(get_statement(f"""
+        INSERT INTO {rollup_table} (item_id, "timestamp", qty_sold, days_count)
+        SELECT s.item_id, {SQL_WEEK_LABEL} AS week, CAST(SUM(s.qty_sold) AS DOUBLE PRECISION), COUNT(*)
+        FROM {source_table} s
+        WHERE s.item_id = ANY(:item_ids)
+        AND s."timestamp" >= CAST(:range_start AS date) AND s."timestamp" < CAST(:range_end AS date)
+        GROUP BY 1, 2
+        ON CONFLICT (item_id, "timestamp")
+        DO UPDATE SET qty_sold = EXCLUDED.qty_sold, days_count = EXCLUDED.days_count, updated_at = NOW();
+    """), {
+        "item_ids": list(item_ids),
+        # Une semaine W-MON va du mardi précédent au lundi inclus
+        "range_start": (first_week - pd.Timedelta(days=6)).date(),
+        "range_end": (last_week + pd.Timedelta(days=1)).date(),
+    })
+
+def rebuild_weekly_rollup(conn, source_table: str):
+    """Reconstruit entièrement le cumul hebdomadaire d'une table (initialisation ou réparation)."""
+    source_table = check_table_name(source_table)
+    rollup_table = get_rollup_table(source_table)
+    ensure_weekly_rollup_table(conn, source_table)
+    conn.execute(get_statement(f"TRUNCATE TABLE {rollup_table};"))
+    conn.execute(get_statement(f"""
+        INSERT INTO {rollup_table} (item_id, "timestamp", qty_sold, days_count)
+        SELECT s.item_id, {SQL_WEEK_LABEL} AS week, CAST(SUM(s.qty_sold) AS DOUBLE PRECISION), COUNT(*)
+        FROM {source_table} s
+        GROUP BY 1, 2;
+    """))
+
+
+# ==============================================================================
+# --- CONTRÔLE DE PARITÉ SQL / PANDAS ---
+# ==============================================================================
+
+def check_weekly_parity(unique_id: str) -> bool:
+    """Vérifie que l'agrégation SQL donne exactement les mêmes semaines que le resample pandas."""
+    config = MODELS_CONFIG[unique_id]
+    columns = ['item_id', 'timestamp', 'qty_sold'] + list(config.get("known_covariates", []))
+    df_pandas = get_weekly_data(config, mode="pandas")[columns]
+    df_sql = get_weekly_data(config, mode="sql")[columns]
+    try:
+        pd.testing.assert_frame_equal(df_pandas, df_sql, check_dtype=False, check_freq=False, rtol=1e-9)
+    except AssertionError as e:
+        print(f"❌ {unique_id} : écart entre SQL et pandas\n{e}")
+        return False
+    print(f"✅ {unique_id} : {len(df_sql)} semaines identiques entre SQL et pandas.")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Contrôle de parité de l'agrégation hebdomadaire SQL vs pandas.")
+    parser.add_argument("--category", help="ID unique à vérifier (par défaut : tous les modèles configurés).")
+    args = parser.parse_args()
+
+    ids = [args.category] if args.category else list(MODELS_CONFIG)
+    results = [check_weekly_parity(unique_id) for unique_id in ids]
+    if not all(results):
+        raise SystemExit(1)
+    print("\n✅ Parité vérifiée pour tous les modèles.")
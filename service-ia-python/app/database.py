@@ -0,0 +1,99 @@
+# Fichier: service-ia-python/app/database.py
+
+import os
+import threading
+from functools import lru_cache
+import pandas as pd
+from sqlalchemy import create_engine, text
+from .config import (
+    MODELS_CONFIG, WEEKLY_ROLLUP_TABLES, FORECAST_STORE_TABLE, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE_SECONDS, DB_POOL_TIMEOUT_SECONDS
+)
+
+# Les noms de tables ne peuvent pas être passés en paramètres liés : on les valide contre
+# la liste des tables connues avant de les insérer dans une requête.
+KNOWN_TABLES = {
+    "sales", "sales_product_line_2", "sales_staging", "sales_temp",
+    "weather", "ipc", "household_confidence", "etl_watermarks", FORECAST_STORE_TABLE,
+} | {config.get("source_table", "sales") for config in MODELS_CONFIG.values()} | set(WEEKLY_ROLLUP_TABLES.values())
+
+_engine = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+
+
+def get_connection_url() -> str:
+    # DATABASE_URL (optionnelle) prime sur les variables DB_* : base locale de benchmark, par exemple
+    if os.environ.get("DATABASE_URL"):
+        return os.environ["DATABASE_URL"]
+    db_password, db_host, db_user, db_name, db_port = (os.environ.get(k) for k in ["DB_PASSWORD", "DB_HOST", "DB_USER", "DB_NAME", "DB_PORT"])
+    return f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+
+def get_engine():
+    """
+    Retourne l'engine SQLAlchemy partagé par tout le processus (un seul pool de connexions).
+    L'engine est recréé après un fork, les connexions d'un pool ne devant pas être partagées
+    entre processus.
+    """
+    global _engine, _engine_pid
+    if _engine is not None and _engine_pid == os.getpid():
+        return _engine
+    with _engine_lock:
+        if _engine is None or _engine_pid != os.getpid():
+            if _engine is not None:
+                _engine.dispose(close=False)
+            url = get_connection_url()
+            # Sessions Postgres en UTC : les étiquettes de semaine SQL (data_access.SQL_WEEK_LABEL)
+            # ne dépendent pas du fuseau par défaut du serveur
+            connect_args = {"options": "-c TimeZone=UTC"} if url.startswith("postgresql") else {}
+            _engine = create_engine(
+                url,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_pre_ping=DB_POOL_PRE_PING,
+                pool_recycle=DB_POOL_RECYCLE_SECONDS,
+                pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+                connect_args=connect_args,
+            )
+            _engine_pid = os.getpid()
+    return _engine
+
+def dispose_engine():
+    """Ferme toutes les connexions du pool (arrêt du service ou fin d'un script)."""
+    global _engine, _engine_pid
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine, _engine_pid = None, None
+
+def check_table_name(table_name: str) -> str:
+    if table_name not in KNOWN_TABLES:
+        raise ValueError(f"Table '{table_name}' inconnue ou non autorisée.")
+    return table_name
+
+@lru_cache(maxsize=256)
+def get_statement(sql: str):
+    """
+    Construit (une seule fois par texte SQL) la requête paramétrée.
+    Réutiliser le même objet permet à SQLAlchemy de resservir la compilation mise en cache.
+    """
+    return text(sql)
+
+def read_sql(sql: str, params: dict = None, parse_dates=None) -> pd.DataFrame:
+    """Exécute une requête SELECT paramétrée sur le pool partagé et retourne un DataFrame."""
+    with get_engine().connect() as conn:
+        return pd.read_sql(get_statement(sql), conn, params=params or {}, parse_dates=parse_dates)
+
+def execute(sql: str, params=None):
+    """Exécute une requête d'écriture paramétrée dans une transaction."""
+    with get_engine().begin() as conn:
+        return conn.execute(get_statement(sql), params or {})
+
+def get_pool_status() -> dict:
+    """État du pool de connexions (connexions ouvertes, empruntées, en débordement)."""
+    pool = get_engine().pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
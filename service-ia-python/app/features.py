@@ -0,0 +1,171 @@
+# Fichier: service-ia-python/app/features.py
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from .config import FEATURE_STORE_ENABLED, FEATURE_STORE_ROOT
+from .data_access import get_weekly_data, get_data_watermark
+from .metrics import timed_stage
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # Le store est désactivé si pyarrow n'est pas installé
+    pa = None
+    feather = None
+
+# À incrémenter à chaque changement de la préparation ci-dessous : invalide tout le store.
+PIPELINE_VERSION = 2
+
+# Clés de la config qui influencent les données préparées
+FEATURE_CONFIG_KEYS = [
+    "source_table", "category_id_in_file", "original_target_col",
+    "transformation", "known_covariates", "feature_engineering",
+]
+
+
+# ==============================================================================
+# --- PRÉPARATION DES DONNÉES (commune à l'entraînement et à la prédiction) ---
+# ==============================================================================
+
+def get_target_column(config) -> str:
+    """Nom de la colonne cible vue par le modèle (transformée en log si configuré)."""
+    if config.get("transformation") == "log":
+        return f"{config['original_target_col']}_log"
+    return config["original_target_col"]
+
+def apply_feature_engineering(df, config):
+    """Applique le feature engineering si spécifié dans la config."""
+    if "feature_engineering" not in config:
+        return df
+    print("--- Application du Feature Engineering (lags, rolling mean) ---")
+    fe_config = config["feature_engineering"]
+    target = config["original_target_col"]
+    for lag in fe_config.get("lags", []):
+        df[f'lag_{lag}'] = df[target].shift(lag)
+    for window in fe_config.get("rolling_means", []):
+        df[f'rolling_mean_{window}'] = df[target].shift(1).rolling(window=window).mean()
+    return df
+
+def prepare_weekly_frame(donnees_hebdo: pd.DataFrame, config) -> pd.DataFrame:
+    """
+    Nettoyage des données hebdomadaires : interpolation des covariables, feature engineering,
+    suppression des lignes incomplètes et transformation log de la cible.
+    """
+    print("--- 2. Nettoyage des données hebdomadaires ---")
+    with timed_stage("feature_engineering"):
+        return _prepare_weekly_frame(donnees_hebdo, config)
+
+def _prepare_weekly_frame(donnees_hebdo: pd.DataFrame, config) -> pd.DataFrame:
+    donnees_hebdo = donnees_hebdo.copy()
+    for col in config.get("known_covariates", []):
+        donnees_hebdo[col] = donnees_hebdo[col].interpolate(method='linear').ffill().bfill()
+
+    donnees_hebdo = apply_feature_engineering(donnees_hebdo, config)
+    donnees_hebdo.dropna(inplace=True)
+    if donnees_hebdo.empty: raise ValueError("Données vides après nettoyage (dropna).")
+
+    if config.get("transformation") == "log":
+        donnees_hebdo[get_target_column(config)] = np.log1p(donnees_hebdo[config["original_target_col"]])
+    return donnees_hebdo.reset_index(drop=True)
+
+
+# ==============================================================================
+# --- FEATURE STORE LOCAL (Arrow IPC, lectures en memory-map) ---
+# ==============================================================================
+
+def get_config_hash(config) -> str:
+    relevant = {key: config.get(key) for key in FEATURE_CONFIG_KEYS}
+    relevant["pipeline_version"] = PIPELINE_VERSION
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+class FeatureStore:
+    """
+    Données hebdomadaires préparées, stockées par unique_id dans :
+        <root>/<unique_id>/<hash de config>_<hash de watermark>.arrow
+
+    Une entrée n'est valable que pour une config et un état des données précis : tout changement
+    de l'une ou de l'autre produit une nouvelle clé, et les anciennes entrées du modèle sont supprimées.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, unique_id: str, config, watermark: tuple) -> Path:
+        watermark_hash = hashlib.sha256(repr(watermark).encode("utf-8")).hexdigest()[:16]
+        return self.root / unique_id / f"{get_config_hash(config)}_{watermark_hash}.arrow"
+
+    def read(self, unique_id: str, config, watermark: tuple):
+        path = self._entry_path(unique_id, config, watermark)
+        if not path.exists():
+            with self._lock:
+                self.misses += 1
+            return None
+        # Fichier Arrow non compressé : la lecture en memory-map évite de recopier les colonnes
+        df = feather.read_table(str(path), memory_map=True).to_pandas()
+        with self._lock:
+            self.hits += 1
+        return df
+
+    def write(self, unique_id: str, config, watermark: tuple, df: pd.DataFrame):
+        path = self._entry_path(unique_id, config, watermark)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".arrow", dir=path.parent)
+        os.close(fd)
+        try:
+            feather.write_feather(df.reset_index(drop=True), tmp_path, compression="uncompressed")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        # Les entrées des watermarks précédents ne seront plus jamais lues
+        for old_path in path.parent.glob("*.arrow"):
+            if old_path != path:
+                old_path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "root": str(self.root),
+            }
+
+feature_store = FeatureStore(FEATURE_STORE_ROOT) if (FEATURE_STORE_ENABLED and feather is not None) else None
+
+def get_prepared_data(unique_id: str, config, watermark: tuple = None) -> pd.DataFrame:
+    """
+    Point d'entrée commun à train.py et predict.py : données hebdomadaires préparées du modèle,
+    lues depuis le feature store si elles y sont pour l'état actuel des données, sinon
+    recalculées puis enregistrées.
+    """
+    if feature_store is None:
+        return prepare_weekly_frame(get_weekly_data(config), config)
+
+    if watermark is None:
+        watermark = get_data_watermark(config)
+    with timed_stage("feature_store_read"):
+        prepared = feature_store.read(unique_id, config, watermark)
+    if prepared is not None:
+        print(f"✅ Données préparées de '{unique_id}' lues depuis le feature store.")
+        return prepared
+
+    prepared = prepare_weekly_frame(get_weekly_data(config), config)
+    try:
+        feature_store.write(unique_id, config, watermark, prepared)
+    except Exception as e:
+        print(f"⚠️ Écriture dans le feature store impossible pour '{unique_id}': {e}")
+    return prepared
+
+def get_feature_store_stats():
+    return feature_store.stats() if feature_store is not None else None
@@ -0,0 +1,66 @@
+# Fichier: service-ia-python/app/forecast_cache.py
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class ForecastCache:
+    """
+    Cache LRU des prévisions déjà calculées, avec une durée de vie maximale par entrée.
+
+    La clé contient la version du modèle et le « watermark » des données : dès que de nouvelles
+    ventes arrivent ou qu'une nouvelle version est servie, la clé change et l'ancienne entrée
+    n'est plus jamais lue (elle finit évincée par la LRU ou par le TTL).
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Retourne une copie de la valeur en cache, ou None si absente ou expirée."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1].copy()
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value.copy())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, unique_id: str = None):
+        """Vide le cache, entièrement ou pour un seul unique_id (premier élément de la clé)."""
+        with self._lock:
+            for key in [k for k in self._entries if unique_id is None or k[0] == unique_id]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
@@ -0,0 +1,166 @@
+# Fichier: service-ia-python/app/forecast_store.py
+
+import json
+import time
+import threading
+import pandas as pd
+from .database import read_sql, execute, check_table_name
+
+
+def forecast_to_records(predictions_df: pd.DataFrame) -> list:
+    """Prévisions AutoGluon -> liste de dicts JSON (format de réponse de /predict)."""
+    records_df = predictions_df.reset_index()
+    records_df['timestamp'] = pd.to_datetime(records_df['timestamp']).dt.strftime('%Y-%m-%dT%H:%M:%S')
+    return records_df.to_dict(orient="records")
+
+
+class ForecastStore:
+    """
+    Prévisions futures précalculées, une ligne par modèle dans une table Postgres :
+    (unique_id, version du modèle, watermark des données, date de calcul, prévisions en JSONB).
+
+    L'API lit une ligne par clé primaire : la latence ne dépend plus de l'inférence.
+    Le job `python -m app.batch_forecast` la remplit après chaque ETL ou réentraînement.
+    """
+
+    def __init__(self, table: str):
+        self.table = check_table_name(table)
+        self._ready = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def ensure_table(self):
+        if self._ready:
+            return
+        execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                unique_id TEXT PRIMARY KEY,
+                model_version TEXT NOT NULL,
+                data_watermark TEXT NOT NULL,
+                computed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                forecast JSONB NOT NULL
+            );
+        """)
+        self._ready = True
+
+    def read(self, unique_id: str):
+        """Dernière prévision stockée du modèle (dict), ou None."""
+        df = read_sql(f"""
+            SELECT model_version, data_watermark, computed_at, forecast
+            FROM {self.table}
+            WHERE unique_id = :unique_id;
+        """, params={"unique_id": unique_id})
+        if df.empty:
+            return None
+        row = df.iloc[0]
+        forecast = row["forecast"]
+        return {
+            "model_version": row["model_version"],
+            "data_watermark": tuple(json.loads(row["data_watermark"])),
+            "computed_at": row["computed_at"],
+            "records": json.loads(forecast) if isinstance(forecast, str) else forecast,
+        }
+
+    def write(self, unique_id: str, model_version: str, data_watermark: tuple, records: list):
+        self.ensure_table()
+        execute(f"""
+            INSERT INTO {self.table} (unique_id, model_version, data_watermark, computed_at, forecast)
+            VALUES (:unique_id, :model_version, :data_watermark, NOW(), CAST(:forecast AS JSONB))
+            ON CONFLICT (unique_id) DO UPDATE SET
+                model_version = EXCLUDED.model_version,
+                data_watermark = EXCLUDED.data_watermark,
+                computed_at = EXCLUDED.computed_at,
+                forecast = EXCLUDED.forecast;
+        """, {
+            "unique_id": unique_id,
+            "model_version": model_version,
+            "data_watermark": json.dumps(list(data_watermark)),
+            "forecast": json.dumps(records),
+        })
+
+    def get_fresh(self, unique_id: str, current_version: str = None, current_watermark: tuple = None):
+        """
+        Prévisions stockées si elles ont été calculées avec la version servie du modèle et sur les
+        données actuelles (`current_version` / `current_watermark`, None si inconnu : on fait
+        confiance au job batch), sinon None.
+        """
+        try:
+            stored = self.read(unique_id)
+        except Exception as e:
+            # Table absente ou base injoignable : l'appelant repasse en calcul direct
+            print(f"⚠️ Lecture du store de prévisions impossible pour '{unique_id}': {e}")
+            stored = None
+        with self._lock:
+            if stored is None:
+                self.misses += 1
+                return None
+            if current_version is not None and stored["model_version"] != current_version:
+                self.stale += 1
+                return None
+            # Les données ont changé depuis le calcul (ETL) : la prévision est recalculée
+            if current_watermark is not None and stored["data_watermark"] != tuple(current_watermark):
+                self.stale += 1
+                return None
+            self.hits += 1
+        return stored
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "table": self.table,
+            }
+
+
+class WatermarkCache:
+    """
+    Watermark des données de chaque modèle, tel qu'enregistré avec ses prévisions : le valider ne
+    coûte pas de requête par appel, il n'est relu qu'au plus toutes les `check_seconds` secondes
+    (comme la série des covariables, voir covariates.CovariateCache).
+    """
+
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._entries = {}  # unique_id -> (watermark, date de lecture)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, unique_id: str, compute_fn) -> tuple:
+        """Watermark en cache s'il a été lu il y a moins de `check_seconds`, sinon `compute_fn()`."""
+        with self._lock:
+            entry = self._entries.get(unique_id)
+            if entry is not None and time.monotonic() - entry[1] < self.check_seconds:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        watermark = tuple(compute_fn())
+        self.put(unique_id, watermark)
+        return watermark
+
+    def put(self, unique_id: str, watermark: tuple):
+        """Enregistre un watermark qui vient d'être lu (calcul des prévisions, par exemple)."""
+        with self._lock:
+            self._entries[unique_id] = (tuple(watermark), time.monotonic())
+
+    def invalidate(self, unique_id: str = None):
+        with self._lock:
+            if unique_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(unique_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "check_seconds": self.check_seconds,
+            }
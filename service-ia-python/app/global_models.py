@@ -0,0 +1,88 @@
+# Fichier: service-ia-python/app/global_models.py
+
+import pandas as pd
+from .config import MODELS_CONFIG, GLOBAL_MODELS_CONFIG, GLOBAL_MODELS_ENABLED
+from .hierarchy import is_derived_total
+
+# Clés du modèle global qui remplacent celles des catégories : les séries d'un même
+# TimeSeriesDataFrame doivent avoir la même cible et les mêmes colonnes
+GLOBAL_SHARED_KEYS = ["transformation", "known_covariates", "feature_engineering", "hyperparameters"]
+
+
+def get_global_members(global_id: str) -> list:
+    """unique_ids de MODELS_CONFIG regroupés dans le modèle global (même source_table)."""
+    global_config = GLOBAL_MODELS_CONFIG[global_id]
+    excluded = set(global_config.get("exclude", []))
+    return [
+        uid for uid, config in MODELS_CONFIG.items()
+        if config.get("source_table", "sales") == global_config["source_table"] and uid not in excluded
+    ]
+
+def get_global_model_id(unique_id: str):
+    """Modèle global servant cette catégorie, ou None (mode désactivé ou catégorie hors modèle global)."""
+    if not GLOBAL_MODELS_ENABLED:
+        return None
+    for global_id in GLOBAL_MODELS_CONFIG:
+        if unique_id in get_global_members(global_id):
+            return global_id
+    return None
+
+def get_serving_model_id(unique_id: str) -> str:
+    """ID du modèle à charger depuis le registre pour servir `unique_id`."""
+    return get_global_model_id(unique_id) or unique_id
+
+def get_serving_model_ids() -> list:
+    """
+    Modèles réellement entraînés et servis : les modèles globaux, puis les catégories hors modèle
+    global (sauf les totaux dérivés de leurs catégories en prévision hiérarchique).
+    """
+    model_ids = []
+    for unique_id in MODELS_CONFIG:
+        if is_derived_total(unique_id):
+            continue
+        model_id = get_serving_model_id(unique_id)
+        if model_id not in model_ids:
+            model_ids.append(model_id)
+    return model_ids
+
+def get_member_config(global_id: str, unique_id: str) -> dict:
+    """Config de la catégorie telle que préparée pour le modèle global."""
+    global_config = GLOBAL_MODELS_CONFIG[global_id]
+    config = {key: value for key, value in MODELS_CONFIG[unique_id].items() if key not in GLOBAL_SHARED_KEYS}
+    config.update({key: global_config[key] for key in GLOBAL_SHARED_KEYS if key in global_config})
+    return config
+
+def get_static_features(global_id: str) -> pd.DataFrame:
+    """
+    Covariables statiques par série (index item_id) : la catégorie elle-même. Les séries `_CA`
+    sont des catégories à part entière (et non la somme des autres) : aucun niveau n'est ajouté.
+    """
+    item_ids = [MODELS_CONFIG[uid]["category_id_in_file"] for uid in get_global_members(global_id)]
+    return pd.DataFrame({"category": item_ids}, index=pd.Index(item_ids, name="item_id")).astype("category")
+
+def get_global_prepared_data(global_id: str, watermarks: dict = None) -> tuple:
+    """
+    Données préparées de toutes les catégories du modèle global, concaténées en un seul
+    DataFrame multi-items. Retourne (données, dict unique_id -> watermark).
+    Chaque catégorie passe par le feature store sous la clé `<global_id>.<unique_id>`.
+    """
+    # Import différé : features importe data_access, qui n'est pas nécessaire pour router les IDs
+    from .features import get_prepared_data
+    from .data_access import get_data_watermark
+
+    frames, member_watermarks = [], {}
+    for unique_id in get_global_members(global_id):
+        config = get_member_config(global_id, unique_id)
+        watermark = (watermarks or {}).get(unique_id) or get_data_watermark(config)
+        frames.append(get_prepared_data(f"{global_id}.{unique_id}", config, watermark=watermark))
+        member_watermarks[unique_id] = watermark
+    return pd.concat(frames, ignore_index=True), member_watermarks
+
+def filter_training_window(df: pd.DataFrame, config) -> pd.DataFrame:
+    """Applique à une catégorie ses filtres d'entraînement (training_start_date, data_filter_start)."""
+    df = df.sort_values('timestamp')
+    if config.get("training_start_date"):
+        df = df[df['timestamp'] >= config["training_start_date"]]
+    if config.get("data_filter_start") is not None:
+        df = df.iloc[config["data_filter_start"]:]
+    return df
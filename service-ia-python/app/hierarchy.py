@@ -0,0 +1,190 @@
+# Fichier: service-ia-python/app/hierarchy.py
+
+import threading
+import numpy as np
+import pandas as pd
+from .config import MODELS_CONFIG, HIERARCHY_CONFIG, HIERARCHICAL_FORECASTS_ENABLED, HIERARCHY_RECONCILIATION
+
+RECONCILIATION_METHODS = ["bottom_up", "mint"]
+# Quantile de la loi normale à 90 % : (q0.9 - q0.1) / (2 * Z_90) estime l'écart-type d'une prévision
+Z_90 = 1.2815515655446004
+# Écart hebdomadaire toléré entre un total et la somme de ses catégories (arrondis des ventes)
+HIERARCHY_TOLERANCE = 0.5
+
+_verified_hierarchy = None
+_verify_lock = threading.Lock()
+
+
+def check_reconciliation_method(method: str) -> str:
+    if method not in RECONCILIATION_METHODS:
+        raise ValueError(f"Méthode de réconciliation '{method}' inconnue. Valeurs possibles : {RECONCILIATION_METHODS}")
+    return method
+
+def check_hierarchy_coherence(weekly: pd.DataFrame, total_item: str, child_items: list,
+                              tolerance: float = HIERARCHY_TOLERANCE) -> list:
+    """
+    Vérifie sur l'historique hebdomadaire (colonnes item_id, timestamp, qty_sold, tous les items
+    de la table) que `total_item` est exactement la somme de `child_items` : la liste doit couvrir
+    toutes les autres catégories de la table et l'écart ne doit dépasser `tolerance` sur aucune semaine.
+    Retourne la liste des problèmes (vide si la hiérarchie est cohérente).
+    """
+    items = set(weekly['item_id'].unique())
+    problems = []
+    if total_item not in items:
+        problems.append(f"total '{total_item}' absent de l'historique")
+    missing = sorted(set(child_items) - items)
+    if missing:
+        problems.append(f"catégories absentes de l'historique : {missing}")
+    unlisted = sorted(items - set(child_items) - {total_item})
+    if unlisted:
+        problems.append(f"catégories de la table absentes de la hiérarchie : {unlisted}")
+    if problems:
+        return problems
+
+    pivot = weekly.pivot_table(index='timestamp', columns='item_id', values='qty_sold', aggfunc='sum').fillna(0.0)
+    gap = pivot[total_item] - pivot[list(child_items)].sum(axis=1)
+    if (gap.abs() > tolerance).any():
+        problems.append(
+            f"le total diffère de la somme des catégories sur {int((gap.abs() > tolerance).sum())}/{len(gap)} "
+            f"semaines (écart moyen {gap.mean():+.1f}, min {gap.min():+.1f}, max {gap.max():+.1f})"
+        )
+    return problems
+
+def _verify_total(total_id: str, children: list) -> list:
+    from .database import read_sql, check_table_name
+    from .data_access import build_weekly_query_for_items
+
+    source_table = MODELS_CONFIG[total_id].get("source_table", "sales")
+    foreign = [child for child in children if MODELS_CONFIG[child].get("source_table", "sales") != source_table]
+    if foreign:
+        return [f"catégories hors de la table '{source_table}' : {foreign}"]
+    item_ids = read_sql(f"SELECT DISTINCT item_id FROM {check_table_name(source_table)};")['item_id'].tolist()
+    weekly = read_sql(build_weekly_query_for_items(source_table), {"item_ids": item_ids})
+    return check_hierarchy_coherence(
+        weekly,
+        MODELS_CONFIG[total_id]["category_id_in_file"],
+        [MODELS_CONFIG[child]["category_id_in_file"] for child in children],
+    )
+
+def get_verified_hierarchy() -> dict:
+    """
+    Partie de HIERARCHY_CONFIG réellement utilisée : seuls les totaux dont l'historique confirme
+    qu'ils sont la somme de leurs catégories. Vérifié une fois par processus ; un total incohérent
+    (ou invérifiable) reste servi par son propre modèle.
+    """
+    global _verified_hierarchy
+    if not HIERARCHICAL_FORECASTS_ENABLED:
+        return {}
+    with _verify_lock:
+        if _verified_hierarchy is None:
+            verified = {}
+            for total_id, children in HIERARCHY_CONFIG.items():
+                try:
+                    problems = _verify_total(total_id, children)
+                except Exception as e:
+                    problems = [f"vérification impossible ({e})"]
+                if problems:
+                    print(f"🛑 Prévision hiérarchique refusée pour '{total_id}' : {'; '.join(problems)}")
+                else:
+                    verified[total_id] = list(children)
+                    print(f"✅ Hiérarchie vérifiée sur l'historique : '{total_id}' = somme de {children}")
+            _verified_hierarchy = verified
+        return _verified_hierarchy
+
+def get_hierarchy_total(unique_id: str):
+    """
+    Total de la hiérarchie dont dépend la prévision de `unique_id`, ou None. En "bottom_up", seul
+    le total est dérivé ; en "mint", les catégories sont aussi ajustées pour sommer au total.
+    """
+    hierarchy = get_verified_hierarchy()
+    if unique_id in hierarchy:
+        return unique_id
+    if HIERARCHY_RECONCILIATION == "mint":
+        for total_id, children in hierarchy.items():
+            if unique_id in children:
+                return total_id
+    return None
+
+def is_derived_total(unique_id: str) -> bool:
+    """Vrai pour un total calculé uniquement à partir de ses catégories (aucun modèle à entraîner ni charger)."""
+    return HIERARCHY_RECONCILIATION == "bottom_up" and unique_id in get_verified_hierarchy()
+
+def get_base_ids(total_id: str) -> list:
+    """Modèles dont les prévisions de base alimentent la réconciliation du total."""
+    children = list(get_verified_hierarchy()[total_id])
+    return children + [total_id] if HIERARCHY_RECONCILIATION == "mint" else children
+
+def get_hierarchy_members(total_id: str) -> list:
+    """unique_ids dont la prévision servie sort de la réconciliation du total."""
+    if HIERARCHY_RECONCILIATION == "mint":
+        return [total_id] + list(get_verified_hierarchy()[total_id])
+    return [total_id]
+
+def format_hierarchy_version(versions: dict) -> str:
+    """Version composite d'une prévision réconciliée : change dès qu'un modèle de base change."""
+    return ";".join(f"{unique_id}={versions[unique_id]}" for unique_id in sorted(versions))
+
+def _to_array(predictions: pd.DataFrame, columns) -> tuple:
+    df = predictions.reset_index()
+    return df['timestamp'].to_numpy(), df[columns].to_numpy(dtype=np.float64)
+
+def _spread_variance(values: np.ndarray, columns) -> np.ndarray:
+    """Variance de chaque prévision (séries, horizon), déduite de l'intervalle 10 %-90 %."""
+    if "0.1" not in columns or "0.9" not in columns:
+        return np.ones(values.shape[:2])
+    sigma = (values[..., columns.index("0.9")] - values[..., columns.index("0.1")]) / (2 * Z_90)
+    return np.maximum(sigma, 1e-6) ** 2
+
+def reconcile_forecasts(total_id: str, base_predictions: dict, method: str = None) -> dict:
+    """
+    Réconcilie les prévisions (déjà à l'échelle d'origine) d'un total et de ses catégories,
+    colonne par colonne (mean et chaque quantile), sur des tableaux (séries, horizon, colonnes).
+
+    - "bottom_up" : le total est la somme des catégories.
+    - "mint" : MinT à covariance diagonale ; l'écart entre le total prédit et la somme des
+      catégories est réparti au prorata de la variance de chaque prévision.
+
+    Les quantiles sont sommés tels quels (hypothèse de séries comonotones : intervalles prudents).
+    Retourne un dict unique_id -> prévisions, pour le total et (en "mint") ses catégories.
+    """
+    method = check_reconciliation_method(method or HIERARCHY_RECONCILIATION)
+    children = list(get_verified_hierarchy()[total_id])
+    reference = base_predictions[children[0]]
+    columns = [str(col) for col in reference.columns]
+
+    timestamps, first = _to_array(reference, columns)
+    stacked = [first]
+    for child in children[1:]:
+        child_timestamps, values = _to_array(base_predictions[child], columns)
+        if not np.array_equal(child_timestamps, timestamps):
+            raise ValueError(f"Les prévisions de '{child}' ne couvrent pas les mêmes semaines que '{children[0]}'.")
+        stacked.append(values)
+    bottom = np.stack(stacked)  # (catégories, horizon, colonnes)
+
+    if method == "mint":
+        total_timestamps, total = _to_array(base_predictions[total_id], columns)
+        if not np.array_equal(total_timestamps, timestamps):
+            raise ValueError(f"Les prévisions de '{total_id}' ne couvrent pas les mêmes semaines que ses catégories.")
+        child_var = _spread_variance(bottom, columns)                  # (catégories, horizon)
+        total_var = _spread_variance(total[np.newaxis], columns)[0]    # (horizon,)
+        gap = total - bottom.sum(axis=0)                               # (horizon, colonnes)
+        share = child_var / (total_var + child_var.sum(axis=0))
+        bottom = bottom + share[..., np.newaxis] * gap[np.newaxis]
+
+    bottom = np.clip(bottom, 0, None)
+    quantile_positions = [i for i, col in enumerate(columns) if col != "mean"]
+    # L'ajustement dépend de la colonne : on rétablit l'ordre des quantiles
+    bottom[..., quantile_positions] = np.sort(bottom[..., quantile_positions], axis=-1)
+    # Le total est la somme des catégories réconciliées : cohérence exacte
+    total_values = bottom.sum(axis=0)
+
+    def _frame(item_id, values):
+        index = pd.MultiIndex.from_arrays([np.full(len(timestamps), item_id, dtype=object), timestamps],
+                                          names=["item_id", "timestamp"])
+        return pd.DataFrame(values, index=index, columns=reference.columns)
+
+    results = {total_id: _frame(MODELS_CONFIG[total_id]["category_id_in_file"], total_values)}
+    if method == "mint":
+        for position, child in enumerate(children):
+            results[child] = _frame(MODELS_CONFIG[child]["category_id_in_file"], bottom[position])
+    return results
@@ -1,19 +1,29 @@
 # Fichier: service-ia-python/app/historical.py (Corrigé)
 
 import pandas as pd
-from sqlalchemy import create_engine
-import os
 from datetime import date
 from dotenv import load_dotenv
 # 1. IMPORTER LA CONFIGURATION DES MODÈLES
-from .config import MODELS_CONFIG
+from .config import MODELS_CONFIG, HISTORY_INDEX_ENABLED, HISTORY_INDEX_CHECK_SECONDS
+from .database import check_table_name
+from .data_access import get_weekly_sales_between
+from .history_index import WeeklyHistoryIndex
+from .metrics import pipeline_context, timed_stage
 
-def get_historical_data(unique_id: str, start_date: date, end_date: date):
+# Index en mémoire des ventes hebdomadaires : /historical ne touche plus la base
+history_index = WeeklyHistoryIndex(HISTORY_INDEX_CHECK_SECONDS) if HISTORY_INDEX_ENABLED else None
+
+def get_historical_data(unique_id: str, start_date: date, end_date: date, years_back=(1,)):
     """
-    Récupère les données de ventes hebdomadaires N-1 depuis la table appropriée.
+    Récupère les données de ventes hebdomadaires N-k (N-1 par défaut) depuis la table appropriée,
+    ramenées sur la période demandée. Avec plusieurs valeurs de `years_back`, les années sont
+    concaténées et distinguées par la colonne `years_back`.
     """
-    print(f"Demande de données historiques N-1 reçue pour : {unique_id}")
+    print(f"Demande de données historiques N-{list(years_back)} reçue pour : {unique_id}")
+    with pipeline_context("historical", unique_id):
+        return _get_historical_data(unique_id, start_date, end_date, years_back)
 
+def _get_historical_data(unique_id: str, start_date: date, end_date: date, years_back):
     # --- S'assurer que l'ID existe dans la config ---
     if unique_id not in MODELS_CONFIG:
         raise ValueError(f"L'ID de modèle '{unique_id}' n'a pas été trouvé dans la configuration.")
@@ -22,34 +32,36 @@ def get_historical_data(unique_id: str, start_date: date, end_date: date):
     
     # 2. UTILISER LE BON ID ET LA BONNE TABLE DEPUIS LA CONFIG
     item_id_to_fetch = config["category_id_in_file"]
-    table_name = config.get("source_table", "sales") # Utilise la table de la config, ou "sales" par défaut
+    table_name = check_table_name(config.get("source_table", "sales")) # Utilise la table de la config, ou "sales" par défaut
     
     print(f"ID de base de données : {item_id_to_fetch}")
     print(f"Utilisation de la table : {table_name}")
 
-    # --- Connexion à la base de données ---
-    db_password, db_host, db_user, db_name, db_port = (os.environ.get(k) for k in ["DB_PASSWORD", "DB_HOST", "DB_USER", "DB_NAME", "DB_PORT"])
-    connection_str = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-    engine = create_engine(connection_str)
-
-    # --- Requête SQL avec les bonnes informations ---
-    query = f"""
-        SELECT "timestamp", qty_sold
-        FROM {table_name}
-        WHERE item_id = '{item_id_to_fetch}'
-        AND "timestamp" BETWEEN ('{start_date}'::date - INTERVAL '1 year') AND ('{end_date}'::date - INTERVAL '1 year')
-        ORDER BY "timestamp";
-    """
-    
-    df_daily = pd.read_sql(query, engine, parse_dates=['timestamp'])
+    frames = []
+    for years in years_back:
+        # --- Semaines N-k, lues dans l'index en mémoire (ou en base s'il est désactivé) ---
+        previous_start = (pd.Timestamp(start_date) - pd.DateOffset(years=years)).date()
+        previous_end = (pd.Timestamp(end_date) - pd.DateOffset(years=years)).date()
+        if history_index is not None:
+            with timed_stage("history_index"):
+                df_weekly = history_index.get_weekly_sales_between(config, previous_start, previous_end)
+        else:
+            with timed_stage("sql"):
+                df_weekly = get_weekly_sales_between(config, previous_start, previous_end)
+        if df_weekly.empty:
+            continue
+        df_weekly['timestamp'] = df_weekly['timestamp'] + pd.DateOffset(years=years)
+        if len(years_back) > 1:
+            df_weekly['years_back'] = years
+        frames.append(df_weekly)
 
-    if df_daily.empty:
+    if not frames:
         return None
 
-    df_weekly = df_daily.set_index('timestamp').resample('W-MON').agg({'qty_sold': 'sum'}).reset_index()
-    df_weekly['timestamp'] = df_weekly['timestamp'] + pd.DateOffset(years=1)
+    return pd.concat(frames, ignore_index=True)
 
-    return df_weekly
+def get_history_index_stats():
+    return history_index.stats() if history_index is not None else None
 
 # --- BLOC DE TEST MIS À JOUR ---
 if __name__ == "__main__":
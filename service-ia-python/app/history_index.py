@@ -0,0 +1,163 @@
+# Fichier: service-ia-python/app/history_index.py
+
+import time
+import threading
+import numpy as np
+import pandas as pd
+from .config import MODELS_CONFIG
+from .database import read_sql, check_table_name
+from .data_access import WEEKLY_FREQ, build_weekly_query_for_items
+
+
+class WeeklyHistoryIndex:
+    """
+    Ventes hebdomadaires (W-MON) de tous les items de MODELS_CONFIG, gardées en mémoire dans
+    deux tableaux numpy par item (lundis de fin de semaine, quantités). `/historical` y lit
+    n'importe quelle période par recherche dichotomique, sans requête en base.
+
+    L'index est chargé au démarrage puis tenu à jour depuis le watermark de chaque table
+    (dernière date, nombre de lignes, somme des quantités), vérifié au plus toutes les
+    `check_seconds` secondes : si des ventes plus récentes sont arrivées, seules les dernières
+    semaines sont relues, puis la somme des quantités indexées est comparée à celle de la table.
+    Toute autre modification (correction d'historique, quantités ajoutées par l'ETL à des jours
+    déjà chargés) recharge la table entière.
+    """
+
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._series = {}      # (source_table, item_id) -> (semaines datetime64, quantités float64)
+        self._watermarks = {}  # source_table -> (dernier horodatage, nombre de lignes, somme des quantités)
+        self._checked_at = 0.0
+        self.full_loads = 0
+        self.incremental_loads = 0
+
+    @staticmethod
+    def _items_by_table() -> dict:
+        items = {}
+        for config in MODELS_CONFIG.values():
+            items.setdefault(config.get("source_table", "sales"), set()).add(config["category_id_in_file"])
+        return {table: sorted(item_ids) for table, item_ids in items.items()}
+
+    @staticmethod
+    def _get_table_watermark(source_table: str, item_ids) -> tuple:
+        source_table = check_table_name(source_table)
+        row = read_sql(f"""
+            SELECT MAX(s."timestamp") AS max_timestamp, COUNT(*) AS row_count,
+                   CAST(COALESCE(SUM(s.qty_sold), 0) AS DOUBLE PRECISION) AS total_qty
+            FROM {source_table} s
+            WHERE s.item_id = ANY(:item_ids);
+        """, params={"item_ids": list(item_ids)}).iloc[0]
+        max_timestamp = pd.Timestamp(row["max_timestamp"]) if pd.notna(row["max_timestamp"]) else None
+        return max_timestamp, int(row["row_count"]), float(row["total_qty"])
+
+    @staticmethod
+    def _to_arrays(df_item: pd.DataFrame) -> tuple:
+        """Semaines complètes (semaines sans vente à 0), comme `complete_weekly_index`."""
+        weekly = df_item.set_index('timestamp')['qty_sold'].asfreq(WEEKLY_FREQ).fillna(0)
+        return weekly.index.values.astype("datetime64[ns]"), weekly.values.astype(np.float64)
+
+    def _fetch(self, source_table: str, item_ids, since=None) -> dict:
+        params = {"item_ids": list(item_ids)}
+        if since is not None:
+            params["since"] = since.date()
+        df = read_sql(build_weekly_query_for_items(source_table, since=since is not None), params=params, parse_dates=['timestamp'])
+        return {item_id: df_item[['timestamp', 'qty_sold']] for item_id, df_item in df.groupby('item_id')}
+
+    def _load_table(self, source_table: str, item_ids, watermark: tuple):
+        series = {(source_table, item_id): self._to_arrays(df_item) for item_id, df_item in self._fetch(source_table, item_ids).items()}
+        with self._lock:
+            for key in [k for k in self._series if k[0] == source_table]:
+                del self._series[key]
+            self._series.update(series)
+            self._watermarks[source_table] = watermark
+            self.full_loads += 1
+
+    def _extend_table(self, source_table: str, item_ids, watermark: tuple):
+        """Relit uniquement les semaines à partir de la dernière semaine indexée (potentiellement partielle)."""
+        with self._lock:
+            current = {item_id: self._series.get((source_table, item_id)) for item_id in item_ids}
+        last_weeks = [pd.Timestamp(weeks[-1]) for weeks, _ in (v for v in current.values() if v is not None) if len(weeks)]
+        if not last_weeks:
+            return self._load_table(source_table, item_ids, watermark)
+        first_week = min(last_weeks)
+        # Une semaine W-MON commence le mardi : marge d'un jour pour les décalages de fuseau
+        fetched = self._fetch(source_table, item_ids, since=first_week - pd.Timedelta(days=7))
+
+        updated = {}
+        for item_id, df_new in fetched.items():
+            df_new = df_new[df_new['timestamp'] >= first_week]
+            previous = current.get(item_id)
+            if previous is not None:
+                weeks, qty = previous
+                keep = weeks < np.datetime64(first_week)
+                df_old = pd.DataFrame({'timestamp': weeks[keep], 'qty_sold': qty[keep]})
+                df_new = pd.concat([df_old, df_new], ignore_index=True)
+            updated[(source_table, item_id)] = self._to_arrays(df_new)
+        with self._lock:
+            self._series.update(updated)
+            self._watermarks[source_table] = watermark
+            self.incremental_loads += 1
+
+    def _indexed_total(self, source_table: str) -> float:
+        with self._lock:
+            return float(sum(qty.sum() for (table, _), (_, qty) in self._series.items() if table == source_table))
+
+    def refresh(self, force: bool = False):
+        """Compare le watermark de chaque table à celui de l'index et recharge ce qui a changé."""
+        for source_table, item_ids in self._items_by_table().items():
+            watermark = self._get_table_watermark(source_table, item_ids)
+            previous = self._watermarks.get(source_table)
+            if not force and watermark == previous:
+                continue
+            if force or previous is None or previous[0] is None or watermark[0] is None \
+                    or watermark[0] <= previous[0] or watermark[1] < previous[1]:
+                print(f"--- Index historique : chargement complet de '{source_table}' ---")
+                self._load_table(source_table, item_ids, watermark)
+            else:
+                print(f"--- Index historique : mise à jour incrémentale de '{source_table}' ---")
+                self._extend_table(source_table, item_ids, watermark)
+                # Les semaines relues ne couvrent pas les corrections plus anciennes : contrôle du contenu
+                if not np.isclose(self._indexed_total(source_table), watermark[2], rtol=1e-9, atol=1e-6):
+                    print(f"--- Index historique : historique modifié dans '{source_table}', chargement complet ---")
+                    self._load_table(source_table, item_ids, watermark)
+        self._checked_at = time.monotonic()
+
+    def ensure_fresh(self):
+        if time.monotonic() - self._checked_at < self.check_seconds:
+            return
+        with self._refresh_lock:
+            if time.monotonic() - self._checked_at < self.check_seconds:
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                if not self._watermarks:
+                    raise
+                # Base injoignable : on continue de servir l'index tel quel jusqu'à la prochaine vérification
+                print(f"⚠️ Rafraîchissement de l'index historique impossible ({e}), données en mémoire conservées.")
+                self._checked_at = time.monotonic()
+
+    def get_weekly_sales_between(self, config, start_date, end_date) -> pd.DataFrame:
+        """Semaines dont le lundi de fin tombe dans [start_date ; end_date + 6 jours] (semaines complètes)."""
+        self.ensure_fresh()
+        key = (config.get("source_table", "sales"), config["category_id_in_file"])
+        with self._lock:
+            series = self._series.get(key)
+        if series is None:
+            return pd.DataFrame({'timestamp': pd.Series(dtype="datetime64[ns]"), 'qty_sold': pd.Series(dtype=float)})
+        weeks, qty = series
+        lo = np.searchsorted(weeks, np.datetime64(pd.Timestamp(start_date)), side="left")
+        hi = np.searchsorted(weeks, np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=6)), side="right")
+        return pd.DataFrame({'timestamp': weeks[lo:hi], 'qty_sold': qty[lo:hi]})
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "items": len(self._series),
+                "weeks": int(sum(len(weeks) for weeks, _ in self._series.values())),
+                "full_loads": self.full_loads,
+                "incremental_loads": self.incremental_loads,
+                "watermarks": {table: [str(value) for value in wm] for table, wm in self._watermarks.items()},
+            }
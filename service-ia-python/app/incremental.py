@@ -0,0 +1,226 @@
+# Fichier: service-ia-python/app/incremental.py
+
+import os
+import json
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from .config import (
+    MODELS_CONFIG, GLOBAL_MODELS_CONFIG, ARTIFACT_STORE_ROOT,
+    INCREMENTAL_FINE_TUNE_EPOCHS, INCREMENTAL_DRIFT_THRESHOLD
+)
+from .model_store import ModelArtifactStore, create_model_registry, get_model_name
+from .features import PIPELINE_VERSION
+
+# Version d'AutoGluon pour laquelle la reprise d'entraînement a été écrite et validée (voir
+# requirements.txt) : elle s'appuie sur des API internes du prédicteur et des modèles GluonTS
+SUPPORTED_AUTOGLUON_VERSION = "1.4.0"
+# Métrique de la perte sur les dernières semaines, à l'entraînement complet comme au contrôle de dérive
+HOLDOUT_METRIC = "mean_wQuantileLoss"
+
+# Fichier écrit dans le dossier du prédicteur (et donc enregistré avec lui sur le registre)
+TRAINING_METADATA_FILENAME = "training_metadata.json"
+
+
+def write_training_metadata(model_path, metadata: dict):
+    metadata = {**metadata, "trained_at": datetime.now(timezone.utc).isoformat()}
+    with open(Path(model_path) / TRAINING_METADATA_FILENAME, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+def read_training_metadata(model_path):
+    path = Path(model_path) / TRAINING_METADATA_FILENAME
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+class StalePipelineError(Exception):
+    """Version entraînée avec une préparation des données antérieure : elle n'est pas servie."""
+
+def get_model_pipeline_version(metadata) -> int:
+    # Les versions entraînées avant l'enregistrement de pipeline_version datent du pipeline 1
+    return (metadata or {}).get("pipeline_version", 1)
+
+def check_pipeline_version(unique_id: str, model_path):
+    """
+    Lève StalePipelineError si la version a été entraînée avec un PIPELINE_VERSION antérieur :
+    les données préparées aujourd'hui (covariables, features) ne suivent plus la distribution apprise.
+    """
+    model_pipeline_version = get_model_pipeline_version(read_training_metadata(model_path))
+    if model_pipeline_version < PIPELINE_VERSION:
+        raise StalePipelineError(
+            f"Modèle '{unique_id}' entraîné avec le pipeline v{model_pipeline_version} "
+            f"(actuel : v{PIPELINE_VERSION}) : réentraînement nécessaire."
+        )
+
+class FineTuneUnsupportedError(Exception):
+    """La version en service ne peut pas être ré-entraînée à chaud : elle est réentraînée entièrement."""
+
+
+def get_holdout_loss(predictor, data) -> float:
+    """Perte HOLDOUT_METRIC (plus petit = meilleur) sur les `prediction_length` dernières semaines de `data`."""
+    scores = predictor.evaluate(data, metrics=[HOLDOUT_METRIC])
+    # evaluate retourne des scores "plus grand = meilleur" : la perte est l'opposé
+    return -float(scores[HOLDOUT_METRIC])
+
+def check_fine_tune_support():
+    from autogluon.timeseries import __version__ as autogluon_version
+    if autogluon_version != SUPPORTED_AUTOGLUON_VERSION:
+        raise FineTuneUnsupportedError(
+            f"fine-tuning écrit pour AutoGluon {SUPPORTED_AUTOGLUON_VERSION}, version installée {autogluon_version}"
+        )
+
+def _prepare_fine_tune_data(predictor, model, data):
+    """
+    Même chaîne de préparation qu'à l'entraînement : contrôle du prédicteur, génération des
+    covariables du learner, puis normalisations de la cible et des covariables du modèle.
+    """
+    data = predictor._check_and_prepare_data_frame(data, name="train_data")
+    data = predictor._learner.feature_generator.transform(data)
+    if model.target_scaler is not None:
+        data = model.target_scaler.fit_transform(data)
+    if model.covariate_scaler is not None:
+        data = model.covariate_scaler.fit_transform(data)
+    data, _ = model.preprocess(data, is_train=True)
+    return model._to_gluonts_dataset(data)
+
+def fine_tune_predictor(predictor, train_data, epochs: int):
+    """
+    Reprend l'entraînement du réseau du meilleur modèle du prédicteur pendant `epochs` époques sur
+    toutes les semaines de `train_data`, en partant de ses poids actuels : architecture et
+    hyperparamètres restent ceux de la version en service. Le modèle est réécrit sur disque.
+    Lève FineTuneUnsupportedError si la version d'AutoGluon ou le modèle ne s'y prête pas.
+    """
+    check_fine_tune_support()
+    trainer = predictor._learner.load_trainer()
+    model = trainer.load_model(predictor.model_best)
+    if getattr(model, "gts_predictor", None) is None:
+        raise FineTuneUnsupportedError(f"le modèle '{predictor.model_best}' n'est pas un réseau GluonTS")
+    if getattr(model, "covariate_regressor", None) is not None:
+        raise FineTuneUnsupportedError(f"le modèle '{predictor.model_best}' utilise un régresseur de covariables")
+
+    training_data = _prepare_fine_tune_data(predictor, model, train_data)
+    hyperparameters = model._hyperparameters
+    hyperparameters.pop("epochs", None)
+    hyperparameters["max_epochs"] = epochs
+    # Pas de validation (époques fixes) : sans arrêt précoce sur val_loss ni limite de temps
+    model.callbacks = model._get_callbacks(time_limit=None, early_stopping_patience=None)
+    estimator = model._get_estimator()
+    model.gts_predictor = estimator.train_from(model.gts_predictor, training_data=training_data)
+    predict_batch_size = model.get_hyperparameters().get("predict_batch_size")
+    if predict_batch_size is not None:
+        model.gts_predictor.batch_size = predict_batch_size
+    model.save()
+
+def _full_retrain(unique_id: str, donnees_hebdo, time_limit: float, reason: str) -> dict:
+    from .train import train_model
+    print(f"--- Réentraînement complet de {unique_id} : {reason} ---")
+    result = train_model(unique_id, donnees_hebdo=donnees_hebdo, time_limit=time_limit)
+    return {**result, "mode": "full", "reason": reason}
+
+def refit_model(unique_id: str, donnees_hebdo=None, time_limit: float = None,
+                drift_threshold: float = None, epochs: int = None) -> dict:
+    """
+    Réentraînement incrémental : la version en service est chargée depuis le registre et évaluée
+    sur les dernières semaines des données prolongées. Si sa perte n'a pas dérivé de plus de
+    `drift_threshold` par rapport à la perte de validation du dernier entraînement complet, elle
+    est ré-entraînée `epochs` époques (warm start) puis enregistrée sur Comet ; sinon (ou sans
+    version ni perte de référence) le modèle est entièrement réentraîné par `train_model`.
+
+    Retourne le même résumé que `train_model`, avec le mode ("fine_tune", "full" ou "kept").
+    """
+    if unique_id in GLOBAL_MODELS_CONFIG:
+        # Les modèles globaux multi-séries sont toujours réentraînés entièrement
+        return _full_retrain(unique_id, donnees_hebdo, time_limit, "modèle global")
+
+    import comet_ml
+    from autogluon.timeseries import TimeSeriesPredictor
+    from .train import PREDICTION_LENGTH, build_training_data, evaluate_mae
+
+    config = MODELS_CONFIG[unique_id]
+    drift_threshold = INCREMENTAL_DRIFT_THRESHOLD if drift_threshold is None else drift_threshold
+    epochs = epochs or INCREMENTAL_FINE_TUNE_EPOCHS
+
+    # === ÉTAPE 1: VERSION EN SERVICE ET DONNÉES PROLONGÉES ===
+    registry = create_model_registry()
+    try:
+        version = registry.latest_version(unique_id)
+        current_dir = ModelArtifactStore(ARTIFACT_STORE_ROOT).get_predictor_dir(unique_id, version, registry)
+    except Exception as e:
+        return _full_retrain(unique_id, donnees_hebdo, time_limit, f"aucune version récupérable ({e})")
+    metadata = read_training_metadata(current_dir)
+    if get_model_pipeline_version(metadata) < PIPELINE_VERSION:
+        return _full_retrain(unique_id, donnees_hebdo, time_limit, "version entraînée avec un pipeline antérieur")
+    if metadata is None or metadata.get("baseline_holdout_loss") is None or metadata.get("holdout_metric") != HOLDOUT_METRIC:
+        return _full_retrain(unique_id, donnees_hebdo, time_limit, "aucune perte de référence pour cette version")
+
+    data = build_training_data(unique_id, config, donnees_hebdo)
+    data_end = str(data.index.get_level_values('timestamp').max())
+    if data_end == metadata.get("data_end"):
+        print(f"✅ Aucune nouvelle semaine pour {unique_id} depuis la version {version} : modèle conservé.")
+        return {"unique_id": unique_id, "mae": metadata.get("mae"), "model_path": current_dir, "mode": "kept",
+                "message": "✅ Aucune nouvelle donnée, version en service conservée."}
+
+    # Copie locale de la version en service : le store d'artefacts n'est jamais modifié
+    local_model_path = f"AutogluonModels/temp_{unique_id}"
+    shutil.rmtree(local_model_path, ignore_errors=True)
+    shutil.copytree(current_dir, local_model_path)
+    predictor = TimeSeriesPredictor.load(local_model_path)
+    if predictor.prediction_length != PREDICTION_LENGTH:
+        return _full_retrain(unique_id, donnees_hebdo, time_limit, "horizon de prévision modifié")
+
+    # === ÉTAPE 2: CONTRÔLE DE DÉRIVE ===
+    # Même définition des deux côtés : perte HOLDOUT_METRIC sur les `prediction_length` dernières
+    # semaines disponibles (à l'entraînement complet, puis aujourd'hui)
+    baseline_loss = float(metadata["baseline_holdout_loss"])
+    current_loss = get_holdout_loss(predictor, data)
+    drift = (current_loss - baseline_loss) / abs(baseline_loss) if baseline_loss else float("inf")
+    print(f"Perte de la version {version} : {current_loss:.4f} (référence {baseline_loss:.4f}, dérive {drift:+.1%}).")
+    if drift > drift_threshold:
+        return _full_retrain(unique_id, donnees_hebdo, time_limit, f"dérive de {drift:+.1%} > {drift_threshold:.0%}")
+
+    # === ÉTAPE 3: FINE-TUNING (WARM START) ===
+    print(f"--- Fine-tuning de {unique_id} (version {version}) : {epochs} époques ---")
+    # Comme train_model : toutes les semaines sauf la fenêtre finale, gardée pour l'évaluation
+    try:
+        fine_tune_predictor(predictor, data.slice_by_timestep(end_index=-PREDICTION_LENGTH), epochs)
+    except FineTuneUnsupportedError as e:
+        print(f"⚠️ Fine-tuning impossible pour {unique_id} ({e}), repli sur un réentraînement complet.")
+        return _full_retrain(unique_id, donnees_hebdo, time_limit, f"fine-tuning impossible ({e})")
+    predictor = TimeSeriesPredictor.load(local_model_path)
+    tuned_loss = get_holdout_loss(predictor, data)
+    if tuned_loss > current_loss:
+        # Le fine-tuning dégrade la prévision : on garde la version en service
+        print(f"⚠️ Perte après fine-tuning {tuned_loss:.4f} > {current_loss:.4f} : version {version} conservée.")
+        return {"unique_id": unique_id, "mae": metadata.get("mae"), "model_path": current_dir, "mode": "kept",
+                "message": "⚠️ Fine-tuning sans gain, version en service conservée."}
+
+    # === ÉTAPE 4: ÉVALUATION ET SAUVEGARDE ===
+    mae_score = evaluate_mae(predictor, data, config)
+    print(f"✅ MAE Score: {mae_score} (perte {current_loss:.4f} -> {tuned_loss:.4f})")
+    # La référence reste celle du dernier entraînement complet : la dérive ne peut pas s'accumuler
+    write_training_metadata(local_model_path, {
+        **metadata,
+        "mode": "fine_tune",
+        "parent_version": version,
+        "mae": mae_score,
+        "data_end": data_end,
+        "fine_tunes_since_full": metadata.get("fine_tunes_since_full", 0) + 1,
+    })
+
+    experiment = comet_ml.Experiment(project_name=os.environ.get("COMET_PROJECT_NAME"))
+    experiment.set_name(f"FineTune_{unique_id}")
+    experiment.log_parameters({**config, "parent_version": version, "fine_tune_epochs": epochs})
+    experiment.log_metric("mae", mae_score)
+    experiment.log_metric("holdout_loss", tuned_loss)
+    experiment.log_metric("drift", drift)
+    print("--- Sauvegarde du modèle sur Comet ML ---")
+    experiment.log_model(name=get_model_name(unique_id), file_or_folder=local_model_path)
+    experiment.end()
+    return {
+        "unique_id": unique_id,
+        "mae": mae_score,
+        "model_path": local_model_path,
+        "mode": "fine_tune",
+        "message": "✅ Succès ! Fine-tuning enregistré sur Comet.",
+    }
@@ -0,0 +1,72 @@
+# Fichier: service-ia-python/app/inference_pool.py
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PoolSaturatedError(Exception):
+    """Trop de calculs en attente : l'appelant doit réessayer plus tard (HTTP 503)."""
+
+    def __init__(self, retry_after_seconds: int):
+        super().__init__("Service saturé, réessayez plus tard.")
+        self.retry_after_seconds = retry_after_seconds
+
+
+class InferencePool:
+    """
+    Pool de threads dédié aux calculs lourds (inférence AutoGluon, lectures en base), séparé
+    du threadpool partagé de Starlette.
+
+    - Taille bornée (`max_workers`) et file d'attente bornée (`max_pending`) : au-delà,
+      `submit` lève `PoolSaturatedError` au lieu d'accumuler de la latence.
+    - Requêtes identiques fusionnées (single-flight) : tant qu'un calcul pour une clé est en
+      cours, les appels suivants avec la même clé reçoivent le même Future.
+    Des threads plutôt que des processus : les prédicteurs en cache restent partagés, et
+    torch / numpy relâchent le GIL pendant les calculs.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, retry_after_seconds: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after_seconds = retry_after_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._in_flight = {}  # clé -> Future
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Soumet `fn(*args, **kwargs)` ou rejoint le calcul déjà en cours pour `key`."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            if len(self._in_flight) >= self.max_pending:
+                self.rejected += 1
+                raise PoolSaturatedError(self.retry_after_seconds)
+            future = self._executor.submit(fn, *args, **kwargs)
+            self._in_flight[key] = future
+            self.submitted += 1
+        future.add_done_callback(lambda _: self._release(key, future))
+        return future
+
+    def _release(self, key, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": len(self._in_flight),
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+            }
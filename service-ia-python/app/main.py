@@ -1,12 +1,31 @@
 # Fichier: service-ia-python/app/main.py
 
-from fastapi import FastAPI, HTTPException, Path, Request, Query
+from fastapi import FastAPI, HTTPException, Path, Request, Query, Response
+from fastapi.responses import JSONResponse
 # --- 1. IMPORTER LES NOUVEAUX ÉLÉMENTS ---
+import asyncio
+import threading
+import json
 from datetime import date
-from .predict import get_prediction
-from .historical import get_historical_data # <-- AJOUT
+from typing import List
+from pydantic import BaseModel, Field
+from .predict import start_warmup, get_readiness, get_future_forecast_records, get_future_forecast_records_batch, get_predictor_cache_stats, get_forecast_cache_stats, get_forecast_store_stats, model_refresher
+from .historical import get_historical_data, get_history_index_stats, history_index # <-- AJOUT
+from .responses import RESPONSE_FORMATS, check_response_format, frame_to_records, serialize_frame, serialize_records, serialize_batch
+from .features import get_feature_store_stats
+from .covariates import get_covariate_cache_stats
+from .inference_pool import InferencePool, PoolSaturatedError
+from .incremental import StalePipelineError
+from .metrics import register_stats_source, render_metrics
+from .backtest import run_backtest
+from .database import get_pool_status
+from .config import (
+    MODELS_CONFIG, PREDICT_RATE_LIMIT, HISTORY_MAX_YEARS_BACK,
+    INFERENCE_MAX_WORKERS, INFERENCE_MAX_PENDING, INFERENCE_RETRY_AFTER_SECONDS
+)
 from dotenv import load_dotenv
 import re
+import pandas as pd
 
 # --- IMPORTS POUR SLOWAPI (inchangés) ---
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -26,33 +45,126 @@ app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 
-# --- ENDPOINT DE PRÉDICTION (inchangé) ---
+# --- PRÉCHAUFFAGE EN ARRIÈRE-PLAN (import d'AutoGluon, puis surveillance des modèles) ---
+@app.on_event("startup")
+def start_background_warmup():
+    start_warmup()
+
+@app.on_event("startup")
+def load_history_index():
+    if history_index is None:
+        return
+
+    def _load():
+        try:
+            history_index.refresh()
+        except Exception as e:
+            # L'index sera chargé à la première requête /historical
+            print(f"⚠️ Chargement de l'index historique au démarrage impossible : {e}")
+    # Hors du démarrage : l'API répond (liveness) pendant le chargement
+    threading.Thread(target=_load, name="history-index-load", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_model_refresher():
+    model_refresher.stop()
+    inference_pool.shutdown()
+
+
+# --- POOL DE CALCUL DÉDIÉ (borné, avec fusion des requêtes identiques) ---
+inference_pool = InferencePool(INFERENCE_MAX_WORKERS, INFERENCE_MAX_PENDING, INFERENCE_RETRY_AFTER_SECONDS)
+
+async def run_in_pool(key, fn, *args):
+    """
+    Exécute `fn(*args)` dans le pool sans bloquer la boucle d'événements. Les requêtes
+    concurrentes de même clé partagent un seul calcul ; un pool saturé répond 503.
+    """
+    try:
+        future = inference_pool.submit(key, fn, *args)
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after_seconds)})
+    # shield : un client qui se déconnecte n'annule pas le calcul partagé avec les autres
+    return await asyncio.shield(asyncio.wrap_future(future))
+
+
+FORMAT_DESCRIPTION = (
+    f"Format de la réponse parmi {RESPONSE_FORMATS} : lignes (par défaut), "
+    "colonnes JSON, ou flux Arrow IPC."
+)
+
+def validate_format(fmt: str) -> str:
+    try:
+        return check_response_format(fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# --- ENDPOINT DE PRÉDICTION (servi depuis les prévisions précalculées) ---
 @app.get("/predict/{unique_id}")
-@limiter.limit("30/minute")
-def predict_endpoint(
+@limiter.limit(PREDICT_RATE_LIMIT)
+async def predict_endpoint(
     request: Request,
     unique_id: str = Path(
         ...,
         title="ID Unique du modèle",
         description="Doit être alphanumérique et peut contenir des tirets et underscores."
-    )
+    ),
+    format: str = Query("records", description=FORMAT_DESCRIPTION)
 ):
     print(f"Demande de prédiction API reçue pour : {unique_id}")
     try:
-        predictions_df = get_prediction(unique_id, future_only=True)
-        if predictions_df is None:
+        validate_format(format)
+        records = await run_in_pool(("predict", unique_id), get_future_forecast_records, unique_id)
+        if records is None:
              raise HTTPException(status_code=500, detail="La prédiction a échoué.")
         
-        return predictions_df.reset_index().to_dict(orient="records")
+        if format == "records":
+            return records
+        content, media_type = serialize_records(records, format)
+        return Response(content=content, media_type=media_type)
+    except HTTPException:
+        raise
+    except StalePipelineError as e:
+        # Modèle à réentraîner : il n'est pas servi sur des données préparées autrement
+        raise HTTPException(status_code=503, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Une erreur interne est survenue : {e}")
 
+# --- PRÉDICTION GROUPÉE (un seul appel pour toutes les catégories d'un tableau de bord) ---
+class BatchPredictionRequest(BaseModel):
+    unique_ids: List[str] = Field(..., min_length=1, max_length=len(MODELS_CONFIG), description="IDs uniques des modèles à prédire.")
+
+@app.post("/predict/batch")
+@limiter.limit(PREDICT_RATE_LIMIT)
+async def predict_batch_endpoint(
+    request: Request,
+    body: BatchPredictionRequest,
+    format: str = Query("records", description=FORMAT_DESCRIPTION)
+):
+    """
+    Prévisions futures de plusieurs modèles. Les IDs inconnus ou en échec sont listés dans
+    `errors` sans faire échouer les autres.
+    """
+    print(f"Demande de prédiction groupée reçue pour {len(body.unique_ids)} modèle(s)")
+    try:
+        validate_format(format)
+        unique_ids = list(dict.fromkeys(body.unique_ids))
+        results, errors = await run_in_pool(("predict_batch", tuple(sorted(unique_ids))), get_future_forecast_records_batch, unique_ids)
+        if format == "records":
+            return {"predictions": results, "errors": errors}
+        content, media_type = serialize_batch(results, errors, format)
+        headers = {"X-Prediction-Errors": json.dumps(errors)} if format == "arrow" and errors else None
+        return Response(content=content, media_type=media_type, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Une erreur interne est survenue : {e}")
+
 # --- 2. AJOUT DU NOUVEL ENDPOINT POUR L'HISTORIQUE ---
 @app.get("/historical/{unique_id}")
 @limiter.limit("30/minute")
-def historical_endpoint(
+async def historical_endpoint(
     request: Request,
     unique_id: str = Path(
         ...,
@@ -60,30 +172,115 @@ def historical_endpoint(
         description="L'ID utilisé pour la prédiction (ex: ligne1_category1_01)."
     ),
     start_date: date = Query(..., description="Date de début de la période de prédiction (YYYY-MM-DD)."),
-    end_date: date = Query(..., description="Date de fin de la période de prédiction (YYYY-MM-DD).")
+    end_date: date = Query(..., description="Date de fin de la période de prédiction (YYYY-MM-DD)."),
+    years_back: List[int] = Query([1], description="Années de comparaison (ex: 1, 2, 3 pour N-1, N-2, N-3)."),
+    format: str = Query("records", description=FORMAT_DESCRIPTION)
 ):
     """
-    Récupère les données de ventes N-1 pour une période donnée.
+    Récupère les données de ventes N-1 (ou N-k pour chaque valeur de `years_back`) pour une période donnée.
     """
     print(f"Demande de données historiques reçue pour {unique_id} entre {start_date} et {end_date}")
     try:
-        historical_df = get_historical_data(unique_id, start_date, end_date)
+        validate_format(format)
+        years_back = tuple(sorted(set(years_back)))
+        if not all(1 <= years <= HISTORY_MAX_YEARS_BACK for years in years_back):
+            raise HTTPException(status_code=400, detail=f"years_back doit être compris entre 1 et {HISTORY_MAX_YEARS_BACK}.")
+        historical_df = await run_in_pool(("historical", unique_id, start_date, end_date, years_back),
+                                          get_historical_data, unique_id, start_date, end_date, years_back)
         if historical_df is None:
             # Si aucune donnée n'est trouvée, retourner une liste vide est plus simple pour le frontend
-            return []
-        
-        # Convertir les Timestamps en chaînes de caractères au format ISO
-        historical_df['timestamp'] = historical_df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+            historical_df = pd.DataFrame({"timestamp": pd.Series(dtype="datetime64[ns]"), "qty_sold": pd.Series(dtype=float)})
 
-        return historical_df.to_dict(orient="records")
+        if format == "records":
+            return frame_to_records(historical_df)
+        content, media_type = serialize_frame(historical_df, format)
+        return Response(content=content, media_type=media_type)
 
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Une erreur interne est survenue : {e}")
+
+
+# --- BACKTEST À ORIGINES GLISSANTES ---
+@app.get("/backtest/{unique_id}")
+@limiter.limit("5/minute")
+async def backtest_endpoint(
+    request: Request,
+    unique_id: str = Path(..., title="ID Unique du modèle"),
+    windows: int = Query(8, ge=1, le=52, description="Nombre de dates de coupure."),
+    step: int = Query(4, ge=1, le=52, description="Écart entre deux coupures, en semaines."),
+    horizons: List[int] = Query([1, 4, 12], description="Horizons évalués, en semaines."),
+):
+    """
+    Évalue le modèle sur plusieurs fenêtres passées : MAE, RMSE et perte quantile pondérée
+    par horizon. Le calcul passe par le pool de calcul (503 si saturé).
+    """
+    print(f"Demande de backtest reçue pour {unique_id} ({windows} fenêtres, pas de {step} semaines)")
+    try:
+        horizons = tuple(sorted(set(horizons)))
+        return await run_in_pool(("backtest", unique_id, windows, step, horizons), run_backtest, unique_id, windows, step, horizons)
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Une erreur interne est survenue : {e}")
 
 
-# --- ENDPOINT RACINE (inchangé) ---
+# --- MESURES PROMETHEUS ---
+for source_name, stats_fn in {
+    "predictor_cache": get_predictor_cache_stats,
+    "forecast_cache": get_forecast_cache_stats,
+    "forecast_store": get_forecast_store_stats,
+    "feature_store": get_feature_store_stats,
+    "covariate_cache": get_covariate_cache_stats,
+    "history_index": get_history_index_stats,
+    "inference_pool": inference_pool.stats,
+    "db_pool": get_pool_status,
+}.items():
+    register_stats_source(source_name, stats_fn)
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """
+    Histogrammes de durée par étape (pipeline, étape, unique_id, type de modèle) et état des
+    caches, du pool de calcul et du pool de connexions, au format texte Prometheus.
+    """
+    content, media_type = render_metrics()
+    return Response(content=content, media_type=media_type)
+
+
+# --- ÉTAT DU CACHE DES MODÈLES ---
+@app.get("/cache/stats")
+def cache_stats_endpoint():
+    """
+    Compteurs des caches de prédicteurs et de prévisions (hits, misses, évictions, mémoire occupée).
+    """
+    return {
+        "predictors": get_predictor_cache_stats(),
+        "forecasts": get_forecast_cache_stats(),
+        "forecast_store": get_forecast_store_stats(),
+        "features": get_feature_store_stats(),
+        "covariates": get_covariate_cache_stats(),
+        "refresher": model_refresher.status(),
+        "inference_pool": inference_pool.stats(),
+        "history_index": get_history_index_stats(),
+    }
+
+
+# --- DISPONIBILITÉ (readiness) : le trafic n'est envoyé qu'une fois les modèles préchauffés ---
+@app.get("/ready")
+def readiness_endpoint():
+    readiness = get_readiness()
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content=readiness)
+    return readiness
+
+
+# --- ENDPOINT RACINE (inchangé, sert de liveness) ---
 @app.get("/")
 def read_root():
     return {"status": "API de prédiction des ventes est en ligne."}
\ No newline at end of file
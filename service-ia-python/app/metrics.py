@@ -0,0 +1,104 @@
+# Fichier: service-ia-python/app/metrics.py
+
+import time
+import contextvars
+from contextlib import contextmanager
+from .config import MODELS_CONFIG, GLOBAL_MODELS_CONFIG
+from .global_models import get_serving_model_id
+
+try:
+    from prometheus_client import CollectorRegistry, Histogram, generate_latest, CONTENT_TYPE_LATEST
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:  # Les mesures sont désactivées si prometheus_client n'est pas installé
+    CollectorRegistry = None
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bornes adaptées à des étapes allant de la milliseconde (cache) à la minute (téléchargement)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Pipeline et modèle en cours dans ce thread : les étapes imbriquées (data_access, features...)
+# sont étiquetées sans avoir à leur passer l'unique_id.
+_current_pipeline = contextvars.ContextVar("current_pipeline", default=None)
+
+
+def get_model_type(unique_id: str) -> str:
+    # Une catégorie servie par un modèle global est étiquetée avec le type du modèle global
+    model_id = get_serving_model_id(unique_id)
+    config = GLOBAL_MODELS_CONFIG.get(model_id) or MODELS_CONFIG.get(model_id, {})
+    return config.get("hyperparameters", {}).get("model", "unknown")
+
+
+class ServiceStatsCollector:
+    """
+    Expose à chaque collecte les compteurs des caches, du pool de calcul et du pool de connexions,
+    lus depuis leurs fonctions `stats()` : les valeurs numériques deviennent des jauges
+    `forecast_service_<source>_<champ>`.
+    """
+
+    def __init__(self):
+        self._sources = {}
+
+    def add_source(self, name: str, stats_fn):
+        self._sources[name] = stats_fn
+
+    def collect(self):
+        for name, stats_fn in self._sources.items():
+            try:
+                stats = stats_fn()
+            except Exception as e:
+                print(f"⚠️ Statistiques '{name}' indisponibles pour /metrics : {e}")
+                continue
+            for field, value in (stats or {}).items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                yield GaugeMetricFamily(f"forecast_service_{name}_{field}", f"{name} : {field}", value=value)
+
+
+if CollectorRegistry is not None:
+    registry = CollectorRegistry()
+    STAGE_LATENCY = Histogram(
+        "forecast_stage_duration_seconds",
+        "Durée de chaque étape des pipelines de prédiction et d'historique.",
+        ["pipeline", "stage", "unique_id", "model_type"],
+        buckets=LATENCY_BUCKETS,
+        registry=registry,
+    )
+    stats_collector = ServiceStatsCollector()
+    registry.register(stats_collector)
+else:
+    registry = None
+    STAGE_LATENCY = None
+    stats_collector = None
+
+
+@contextmanager
+def pipeline_context(pipeline: str, unique_id: str):
+    """Déclare le pipeline en cours ('predict', 'historical'...) et chronomètre sa durée totale."""
+    token = _current_pipeline.set((pipeline, unique_id))
+    try:
+        with timed_stage("total"):
+            yield
+    finally:
+        _current_pipeline.reset(token)
+
+@contextmanager
+def timed_stage(stage: str):
+    """Chronomètre une étape et l'enregistre dans l'histogramme du pipeline en cours (s'il y en a un)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current = _current_pipeline.get()
+        if STAGE_LATENCY is not None and current is not None:
+            pipeline, unique_id = current
+            STAGE_LATENCY.labels(pipeline, stage, unique_id, get_model_type(unique_id)).observe(time.perf_counter() - start)
+
+def register_stats_source(name: str, stats_fn):
+    if stats_collector is not None:
+        stats_collector.add_source(name, stats_fn)
+
+def render_metrics() -> tuple:
+    """Contenu et type MIME de /metrics (format texte Prometheus)."""
+    if registry is None:
+        return b"# prometheus_client n'est pas installe : mesures desactivees\n", CONTENT_TYPE_LATEST
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,131 @@
+# Fichier: service-ia-python/app/model_cache.py
+
+import os
+import threading
+from collections import OrderedDict
+
+
+def get_directory_size_bytes(path: str) -> int:
+    """Taille totale (en octets) des fichiers d'un dossier, utilisée comme estimation mémoire d'un prédicteur."""
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass
+    return total
+
+
+class PredictorCache:
+    """
+    Cache LRU des prédicteurs AutoGluon déjà chargés, indexé par (unique_id, version).
+
+    La mémoire occupée est bornée par `max_bytes` : lorsqu'un nouveau prédicteur ne tient pas,
+    les entrées les moins récemment utilisées sont évincées. Une seule version est conservée
+    par unique_id : l'arrivée d'une nouvelle version remplace l'ancienne.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (unique_id, version) -> dict(predictor, size_bytes, on_evict)
+        self._lock = threading.RLock()
+        self._loading_locks = {}
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, unique_id: str, version: str):
+        """Retourne le prédicteur en cache (et le marque comme récemment utilisé), ou None."""
+        key = (unique_id, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry["predictor"]
+
+    def put(self, unique_id: str, version: str, predictor, size_bytes: int, on_evict=None):
+        """Ajoute un prédicteur au cache, en évinçant les anciennes versions puis les entrées LRU si besoin."""
+        key = (unique_id, version)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            # Une nouvelle version rend les précédentes obsolètes
+            for old_key in [k for k in self._entries if k[0] == unique_id]:
+                self._remove(old_key, count_eviction=True)
+            # Éviction LRU jusqu'à ce que le nouveau prédicteur tienne dans le budget mémoire.
+            # Un prédicteur plus gros que le budget est tout de même gardé seul.
+            while self._entries and self.current_bytes + size_bytes > self.max_bytes:
+                lru_key = next(iter(self._entries))
+                self._remove(lru_key, count_eviction=True)
+            self._entries[key] = {"predictor": predictor, "size_bytes": size_bytes, "on_evict": on_evict}
+            self.current_bytes += size_bytes
+
+    def get_or_load(self, unique_id: str, version: str, loader):
+        """
+        Retourne le prédicteur en cache, ou le charge via `loader()` en cas d'absence.
+
+        `loader` doit retourner un tuple (predictor, size_bytes, on_evict). Les chargements
+        concurrents d'une même clé sont sérialisés pour ne charger le modèle qu'une seule fois.
+        """
+        predictor = self.get(unique_id, version)
+        if predictor is not None:
+            with self._lock:
+                self.hits += 1
+            return predictor
+
+        key = (unique_id, version)
+        with self._lock:
+            loading_lock = self._loading_locks.setdefault(key, threading.Lock())
+
+        with loading_lock:
+            # Un autre thread a pu charger le modèle pendant l'attente du verrou
+            predictor = self.get(unique_id, version)
+            if predictor is not None:
+                with self._lock:
+                    self.hits += 1
+                return predictor
+
+            with self._lock:
+                self.misses += 1
+            try:
+                predictor, size_bytes, on_evict = loader()
+                self.put(unique_id, version, predictor, size_bytes, on_evict=on_evict)
+            finally:
+                with self._lock:
+                    self._loading_locks.pop(key, None)
+            return predictor
+
+    def invalidate(self, unique_id: str = None):
+        """Vide le cache, entièrement ou pour un seul unique_id."""
+        with self._lock:
+            for key in [k for k in self._entries if unique_id is None or k[0] == unique_id]:
+                self._remove(key)
+
+    def stats(self) -> dict:
+        """Compteurs du cache (hits, misses, évictions) et occupation mémoire."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "entries": len(self._entries),
+                "current_mb": round(self.current_bytes / 1024 ** 2, 2),
+                "max_mb": round(self.max_bytes / 1024 ** 2, 2),
+                "models": [{"unique_id": uid, "version": version} for uid, version in self._entries],
+            }
+
+    def _remove(self, key, count_eviction: bool = False):
+        entry = self._entries.pop(key)
+        self.current_bytes -= entry["size_bytes"]
+        if count_eviction:
+            self.evictions += 1
+        if entry["on_evict"] is not None:
+            try:
+                entry["on_evict"]()
+            except Exception as e:
+                print(f"⚠️ Erreur lors du nettoyage du modèle évincé {key}: {e}")
@@ -0,0 +1,116 @@
+# Fichier: service-ia-python/app/model_refresher.py
+
+import time
+import threading
+import traceback
+from datetime import datetime, timezone
+
+
+class ModelRefresher:
+    """
+    Surveille le registre en arrière-plan et précharge les nouvelles versions des modèles.
+
+    Toutes les `interval_seconds`, la dernière version de chaque modèle est demandée au registre.
+    Si elle a changé, `warm_fn(unique_id, version)` la télécharge et la charge dans le cache des
+    prédicteurs (hors du thread de requête), puis la version servie est remplacée d'un seul coup.
+    Seule la version est conservée ici : le prédicteur reste sous le contrôle du cache (plafond
+    mémoire, éviction LRU) et les requêtes le résolvent via `PredictorCache.get_or_load`.
+
+    `model_ids` est une liste, ou une fonction qui la retourne : elle n'est alors appelée qu'au
+    premier passage (dans le thread de surveillance), pas à la construction.
+    """
+
+    def __init__(self, model_ids, registry, warm_fn, interval_seconds: float):
+        self._model_ids_source = model_ids
+        self._model_ids = None if callable(model_ids) else list(model_ids)
+        self.registry = registry
+        self.warm_fn = warm_fn
+        self.interval_seconds = interval_seconds
+        self._versions = {}  # unique_id -> version servie
+        self._last_errors = {}
+        self._last_poll_at = None
+        self._first_pass_done = threading.Event()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def model_ids(self) -> list:
+        if self._model_ids is None:
+            self._model_ids = list(self._model_ids_source())
+        return self._model_ids
+
+    def start(self):
+        """Démarre le thread de surveillance (le premier passage a lieu immédiatement)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="model-refresher", daemon=True)
+        self._thread.start()
+        print(f"🔄 Surveillance des modèles démarrée (intervalle : {self.interval_seconds}s).")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.refresh_all()
+            self._stop_event.wait(self.interval_seconds)
+
+    def refresh_all(self):
+        """Interroge le registre pour chaque modèle et précharge les nouvelles versions."""
+        for unique_id in self.model_ids:
+            if self._stop_event.is_set():
+                break
+            self.refresh_one(unique_id)
+        with self._lock:
+            self._last_poll_at = datetime.now(timezone.utc).isoformat()
+        self._first_pass_done.set()
+
+    def first_pass_done(self) -> bool:
+        """Vrai dès que chaque modèle a été interrogé (et préchargé si possible) une première fois."""
+        return self._first_pass_done.is_set()
+
+    def refresh_one(self, unique_id: str) -> bool:
+        """Retourne True si une nouvelle version a été chargée et mise en service."""
+        try:
+            latest_version = self.registry.latest_version(unique_id)
+            if latest_version == self.get_current_version(unique_id):
+                return False
+
+            start = time.perf_counter()
+            self.warm_fn(unique_id, latest_version)
+            with self._lock:
+                previous_version = self._versions.get(unique_id)
+                self._versions[unique_id] = latest_version
+                self._last_errors.pop(unique_id, None)
+            print(f"✅ Modèle '{unique_id}' : version {previous_version} -> {latest_version} "
+                  f"mise en service ({time.perf_counter() - start:.1f}s de préchargement).")
+            return True
+        except Exception as e:
+            # On continue de servir la version précédente
+            with self._lock:
+                self._last_errors[unique_id] = str(e)
+            print(f"⚠️ Échec du rafraîchissement du modèle '{unique_id}': {e}\n{traceback.format_exc()}")
+            return False
+
+    def get_current_version(self, unique_id: str):
+        """Version actuellement servie pour ce modèle, ou None si elle n'est pas encore connue."""
+        with self._lock:
+            return self._versions.get(unique_id)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.is_running(),
+                "interval_seconds": self.interval_seconds,
+                "last_poll_at": self._last_poll_at,
+                "versions": dict(self._versions),
+                "errors": dict(self._last_errors),
+            }
@@ -0,0 +1,275 @@
+# Fichier: service-ia-python/app/model_store.py
+
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from .config import MODEL_REGISTRY_BACKEND, LOCAL_REGISTRY_ROOT
+
+MANIFEST_FILENAME = "manifest.json"
+PREDICTOR_SUBDIR = "predictor"
+
+
+def get_model_name(unique_id: str) -> str:
+    return f"sales-forecast-{unique_id.replace('_', '-')}"
+
+def find_predictor_dir(output_folder: str, unique_id: str) -> str:
+    """Localise le dossier contenant 'predictor.pkl' dans un modèle téléchargé depuis le registre."""
+    # <<< LOGIQUE DE RECHERCHE DÉFINITIVE AVEC PLUSIEURS STRATÉGIES >>>
+    path_to_model_dir = None
+
+    # Stratégie 1 : Chemin idéal (sous-dossier 'temp_...')
+    potential_path_1 = os.path.join(output_folder, f"temp_{unique_id}")
+    if os.path.exists(os.path.join(potential_path_1, "predictor.pkl")):
+        path_to_model_dir = potential_path_1
+        print(f"Stratégie 1 réussie : Modèle trouvé dans {path_to_model_dir}")
+
+    # Stratégie 2 : Chemin "plat" de Windows (fichiers avec '\' à la racine)
+    if not path_to_model_dir:
+        win_style_filename = f"temp_{unique_id}\\predictor.pkl"
+        if os.path.exists(os.path.join(output_folder, win_style_filename)):
+            path_to_model_dir = normalize_windows_layout(output_folder, unique_id)
+            print(f"Stratégie 2 réussie : Modèle Windows reconstruit dans {path_to_model_dir}")
+
+    # Stratégie 3 : Recherche récursive de secours
+    if not path_to_model_dir:
+        print("Stratégies 1 et 2 échouées. Lancement de la recherche récursive de secours...")
+        for root, dirs, files in os.walk(output_folder):
+            if "predictor.pkl" in files:
+                path_to_model_dir = root
+                print(f"Stratégie 3 réussie : Modèle trouvé par scan récursif dans {path_to_model_dir}")
+                break
+
+    if not path_to_model_dir:
+        raise FileNotFoundError("Impossible de trouver 'predictor.pkl' avec toutes les stratégies de recherche.")
+    return path_to_model_dir
+
+def normalize_windows_layout(output_folder: str, unique_id: str) -> str:
+    """
+    Les modèles enregistrés depuis Windows arrivent à plat ('temp_x\\models\\...' comme nom de fichier).
+    On reconstruit l'arborescence réelle pour qu'AutoGluon puisse relire tous les sous-modèles.
+    """
+    prefix = f"temp_{unique_id}\\"
+    target_dir = os.path.join(output_folder, f"temp_{unique_id}")
+    for filename in os.listdir(output_folder):
+        if not filename.startswith(prefix):
+            continue
+        relative_path = filename[len(prefix):].replace("\\", os.sep)
+        destination = os.path.join(target_dir, relative_path)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(os.path.join(output_folder, filename), destination)
+    return target_dir
+
+def compute_directory_hash(path) -> str:
+    """Empreinte SHA-256 du contenu d'un dossier (chemins relatifs + octets de chaque fichier)."""
+    digest = hashlib.sha256()
+    path = Path(path)
+    for file_path in sorted(p for p in path.rglob("*") if p.is_file()):
+        digest.update(file_path.relative_to(path).as_posix().encode("utf-8"))
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ==============================================================================
+# --- REGISTRES DE MODÈLES ---
+# ==============================================================================
+
+class ModelRegistry:
+    """Interface commune des registres de modèles (Comet, dossier local...)."""
+
+    backend_name = "base"
+
+    def latest_version(self, unique_id: str) -> str:
+        """Retourne l'identifiant de la version la plus récente du modèle."""
+        raise NotImplementedError
+
+    def download(self, unique_id: str, version: str, output_folder: str) -> None:
+        """Télécharge les fichiers d'une version du modèle dans `output_folder`."""
+        raise NotImplementedError
+
+    def local_path(self, unique_id: str, version: str):
+        """Dossier déjà utilisable tel quel pour cette version, ou None s'il faut passer par le store."""
+        return None
+
+
+class CometModelRegistry(ModelRegistry):
+    """
+    Registre de modèles Comet ML (comportement historique du service).
+    Le client (et l'import de comet_ml) n'est créé qu'au premier appel : le service démarre
+    même si Comet est lent ou injoignable.
+    """
+
+    backend_name = "comet"
+
+    def __init__(self, workspace: str = None):
+        self.workspace = workspace or os.environ.get("COMET_WORKSPACE")
+        self._api = None
+        self._api_lock = threading.Lock()
+
+    @property
+    def api(self):
+        if self._api is None:
+            with self._api_lock:
+                if self._api is None:
+                    import comet_ml.api
+                    self._api = comet_ml.api.API()
+        return self._api
+
+    def _get_model(self, unique_id: str):
+        return self.api.get_model(workspace=self.workspace, model_name=get_model_name(unique_id))
+
+    def latest_version(self, unique_id: str) -> str:
+        return self._get_model(unique_id).find_versions()[0]
+
+    def download(self, unique_id: str, version: str, output_folder: str) -> None:
+        self._get_model(unique_id).download(version=version, output_folder=output_folder, expand=True)
+
+
+class LocalModelRegistry(ModelRegistry):
+    """
+    Registre purement local : chaque modèle est un dossier `temp_{unique_id}` sous `root`
+    (ex: downloaded_model/temp_ligne1_category1_01), servi tel quel, sans aucun accès réseau.
+    La version est dérivée du contenu du dossier (noms, tailles et dates des fichiers).
+    """
+
+    backend_name = "local"
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _model_dir(self, unique_id: str) -> Path:
+        model_dir = self.root / f"temp_{unique_id}"
+        if not (model_dir / "predictor.pkl").exists():
+            raise FileNotFoundError(f"Aucun modèle local trouvé pour '{unique_id}' dans {self.root}.")
+        return model_dir
+
+    def latest_version(self, unique_id: str) -> str:
+        model_dir = self._model_dir(unique_id)
+        digest = hashlib.sha256()
+        for file_path in sorted(p for p in model_dir.rglob("*") if p.is_file()):
+            stat = file_path.stat()
+            digest.update(f"{file_path.relative_to(model_dir).as_posix()}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+        return f"local-{digest.hexdigest()[:12]}"
+
+    def download(self, unique_id: str, version: str, output_folder: str) -> None:
+        shutil.copytree(self._model_dir(unique_id), os.path.join(output_folder, f"temp_{unique_id}"))
+
+    def local_path(self, unique_id: str, version: str):
+        return str(self._model_dir(unique_id))
+
+
+def create_model_registry(backend: str = None) -> ModelRegistry:
+    """Instancie le registre configuré par MODEL_REGISTRY_BACKEND ('comet' ou 'local')."""
+    backend = (backend or MODEL_REGISTRY_BACKEND).lower()
+    if backend == "comet":
+        return CometModelRegistry()
+    if backend == "local":
+        return LocalModelRegistry(LOCAL_REGISTRY_ROOT)
+    raise ValueError(f"Registre de modèles '{backend}' inconnu. Valeurs possibles : ['comet', 'local']")
+
+
+# ==============================================================================
+# --- STOCKAGE PERSISTANT DES ARTEFACTS ---
+# ==============================================================================
+
+class ModelArtifactStore:
+    """
+    Stockage persistant des modèles téléchargés, sous la forme :
+        <root>/<model_name>/<version>/predictor/      (dossier AutoGluon normalisé)
+        <root>/<model_name>/<version>/manifest.json   (version, empreinte SHA-256, date)
+
+    Chaque version n'est téléchargée et normalisée qu'une seule fois ; les redémarrages
+    du conteneur réutilisent le dossier existant après vérification de son empreinte.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _version_dir(self, unique_id: str, version: str) -> Path:
+        safe_version = re.sub(r"[^A-Za-z0-9._-]", "_", str(version))
+        return self.root / get_model_name(unique_id) / safe_version
+
+    def read_manifest(self, unique_id: str, version: str):
+        manifest_path = self._version_dir(unique_id, version) / MANIFEST_FILENAME
+        if not manifest_path.exists():
+            return None
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get_predictor_dir(self, unique_id: str, version: str, registry: ModelRegistry) -> str:
+        """Retourne le dossier du prédicteur pour cette version, en le téléchargeant si nécessaire."""
+        local_path = registry.local_path(unique_id, version)
+        if local_path is not None:
+            print(f"Modèle local utilisé tel quel : {local_path}")
+            return local_path
+
+        version_dir = self._version_dir(unique_id, version)
+        predictor_dir = version_dir / PREDICTOR_SUBDIR
+        manifest = self.read_manifest(unique_id, version)
+        if manifest is not None and predictor_dir.exists():
+            if compute_directory_hash(predictor_dir) == manifest["sha256"]:
+                print(f"Modèle trouvé dans le store local : {predictor_dir}")
+                return str(predictor_dir)
+            print(f"⚠️ Empreinte invalide pour {version_dir}, nouveau téléchargement.")
+            shutil.rmtree(version_dir, ignore_errors=True)
+
+        return self._download_and_normalize(unique_id, version, registry)
+
+    def _download_and_normalize(self, unique_id: str, version: str, registry: ModelRegistry) -> str:
+        version_dir = self._version_dir(unique_id, version)
+        version_dir.parent.mkdir(parents=True, exist_ok=True)
+        # Téléchargement dans un dossier de travail sur le même disque, puis renommage atomique
+        staging_dir = tempfile.mkdtemp(prefix=f".{version_dir.name}_", dir=version_dir.parent)
+        try:
+            download_dir = os.path.join(staging_dir, "download")
+            os.makedirs(download_dir)
+            print(f"Téléchargement du modèle '{get_model_name(unique_id)}' (version {version}) depuis {registry.backend_name}...")
+            registry.download(unique_id, version, download_dir)
+            found_dir = find_predictor_dir(download_dir, unique_id)
+
+            normalized_dir = os.path.join(staging_dir, "version")
+            os.makedirs(normalized_dir)
+            shutil.move(found_dir, os.path.join(normalized_dir, PREDICTOR_SUBDIR))
+            manifest = {
+                "model_name": get_model_name(unique_id),
+                "unique_id": unique_id,
+                "version": version,
+                "registry": registry.backend_name,
+                "sha256": compute_directory_hash(os.path.join(normalized_dir, PREDICTOR_SUBDIR)),
+                "stored_at": datetime.now(timezone.utc).isoformat(),
+            }
+            with open(os.path.join(normalized_dir, MANIFEST_FILENAME), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+
+            try:
+                os.replace(normalized_dir, version_dir)
+            except OSError:
+                # Un autre processus a stocké la même version entre-temps : on garde la sienne
+                if not (version_dir / MANIFEST_FILENAME).exists():
+                    raise
+            print(f"✅ Modèle stocké dans {version_dir}")
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        return str(version_dir / PREDICTOR_SUBDIR)
+
+    def latest_stored_version(self, unique_id: str):
+        """Version la plus récemment stockée pour ce modèle (utile si le registre est injoignable)."""
+        model_dir = self.root / get_model_name(unique_id)
+        if not model_dir.exists():
+            return None
+        manifests = []
+        for version_dir in model_dir.iterdir():
+            manifest_path = version_dir / MANIFEST_FILENAME
+            if manifest_path.exists():
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    manifests.append(json.load(f))
+        if not manifests:
+            return None
+        return max(manifests, key=lambda m: m["stored_at"])["version"]
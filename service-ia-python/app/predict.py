@@ -1,187 +1,488 @@
 # Fichier: service-ia-python/app/predict.py (Version finale avec recherche de chemin multiple)
 
+import threading
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine
-from autogluon.timeseries import TimeSeriesDataFrame, TimeSeriesPredictor
-from .config import MODELS_CONFIG
-import comet_ml.api
-import os
-import shutil
+from .config import (
+    MODELS_CONFIG, PREDICTOR_CACHE_MAX_MB, ARTIFACT_STORE_ROOT, MODEL_REFRESH_INTERVAL_SECONDS,
+    FORECAST_CACHE_MAX_ENTRIES, FORECAST_CACHE_TTL_SECONDS, FORECAST_STORE_TABLE, FORECAST_WATERMARK_CHECK_SECONDS, MODEL_REFRESHER_ENABLED
+)
+from .model_cache import PredictorCache, get_directory_size_bytes
+from .model_store import ModelArtifactStore, create_model_registry
+from .model_refresher import ModelRefresher
+from .forecast_cache import ForecastCache
+from .forecast_store import ForecastStore, WatermarkCache, forecast_to_records
+from .data_access import get_data_watermark, get_weekly_data_for_configs
+from .features import get_prepared_data, prepare_weekly_frame, get_target_column
+from .global_models import (
+    get_global_model_id, get_global_members, get_member_config, get_static_features,
+    get_global_prepared_data, get_serving_model_id, get_serving_model_ids
+)
+from .hierarchy import get_hierarchy_total, get_base_ids, get_hierarchy_members, format_hierarchy_version, reconcile_forecasts
+from .metrics import pipeline_context, timed_stage
+from .incremental import check_pipeline_version
 from dotenv import load_dotenv
-import tempfile
 import traceback
 import argparse
 
 load_dotenv()
-comet_api = comet_ml.api.API()
-
-# --- Fonctions de préparation des données (inchangées) ---
-def get_data_with_covariates(config, engine):
-    print(f"--- 1. Récupération des données pour {config['category_id_in_file']} ---")
-    item_id_to_fetch = config["category_id_in_file"]
-    known_covariates = config.get("known_covariates", [])
-    source_table = config.get("source_table", "sales")
-    
-    base_query = f"SELECT s.item_id, s.\"timestamp\", s.qty_sold"
-    joins = ""
-    
-    if "temperature_mean" in known_covariates or "rain" in known_covariates:
-        base_query += ", w.temperature_mean, w.precipitation AS rain"
-        joins += " LEFT JOIN weather w ON DATE(s.\"timestamp\" AT TIME ZONE 'UTC') = w.date AND w.city = 'PARIS'"
-    if "ipc" in known_covariates:
-        base_query += ", i.ipc_clothing_shoes AS ipc"
-        joins += " LEFT JOIN ipc i ON DATE_TRUNC('month', s.\"timestamp\" AT TIME ZONE 'UTC')::DATE = i.time_period"
-    if "moral_menages" in known_covariates:
-        base_query += ", hc.synthetic_indicator AS moral_menages"
-        joins += " LEFT JOIN household_confidence hc ON DATE_TRUNC('month', s.\"timestamp\" AT TIME ZONE 'UTC')::DATE = hc.time_period"
-
-    final_query = f"""
-    {base_query}
-    FROM {source_table} s
-    {joins}
-    WHERE s.item_id = '{item_id_to_fetch}'
-    ORDER BY s."timestamp";
+
+# --- Import différé d'AutoGluon ---
+# AutoGluon (et torch) mettent plusieurs secondes à s'importer : l'import a lieu au premier
+# besoin ou pendant le préchauffage, pas au chargement du module. L'API démarre immédiatement.
+
+_autogluon_ready = threading.Event()
+_hierarchy_ready = threading.Event()
+
+def get_autogluon():
+    """Retourne le module autogluon.timeseries, importé au premier appel."""
+    import autogluon.timeseries
+    _autogluon_ready.set()
+    return autogluon.timeseries
+
+def start_warmup():
     """
-    
-    df = pd.read_sql(final_query, engine, parse_dates=['timestamp'])
-    print(f"✅ {len(df)} lignes de données brutes récupérées.")
-    return df
-
-def apply_feature_engineering(df, config):
-    if "feature_engineering" not in config:
-        return df
-    print("--- Application du Feature Engineering ---")
-    fe_config = config["feature_engineering"]
-    target = config["original_target_col"]
-    for lag in fe_config.get("lags", []):
-        df[f'lag_{lag}'] = df[target].shift(lag)
-    for window in fe_config.get("rolling_means", []):
-        df[f'rolling_mean_{window}'] = df[target].shift(1).rolling(window=window).mean()
-    return df
+    Préchauffage en arrière-plan : import d'AutoGluon, puis (si la surveillance est activée)
+    préchargement de la dernière version de chaque modèle par le thread de surveillance.
+    """
+    def _warmup():
+        try:
+            get_autogluon()
+            print("✅ AutoGluon importé.")
+        except Exception as e:
+            print(f"🛑 Import d'AutoGluon impossible : {e}")
+        # Vérification des hiérarchies sur l'historique (requêtes en base) : ici, pas à l'import
+        get_serving_model_ids()
+        _hierarchy_ready.set()
+        if MODEL_REFRESHER_ENABLED:
+            model_refresher.start()
+    threading.Thread(target=_warmup, name="warmup", daemon=True).start()
+
+def get_readiness() -> dict:
+    """
+    Prêt quand AutoGluon est importé, la hiérarchie vérifiée et que la surveillance a fait son
+    premier passage. Le nombre de modèles servis n'est connu qu'après la vérification.
+    """
+    refresher_status = model_refresher.status()
+    models_ready = (not MODEL_REFRESHER_ENABLED) or model_refresher.first_pass_done()
+    hierarchy_ready = _hierarchy_ready.is_set()
+    return {
+        "ready": _autogluon_ready.is_set() and hierarchy_ready and models_ready,
+        "autogluon_loaded": _autogluon_ready.is_set(),
+        "models_warmed": sorted(refresher_status["versions"]),
+        "models_failed": refresher_status["errors"],
+        "models_total": len(get_serving_model_ids()) if hierarchy_ready else None,
+    }
+
+# --- Chargement des modèles (avec cache en mémoire) ---
+
+predictor_cache = PredictorCache(max_bytes=PREDICTOR_CACHE_MAX_MB * 1024 ** 2)
+model_registry = create_model_registry()
+artifact_store = ModelArtifactStore(ARTIFACT_STORE_ROOT)
+
+def download_and_load_predictor(unique_id: str, version: str):
+    """
+    Récupère une version du modèle depuis le store persistant (téléchargée au besoin) et la charge.
+    Retourne (predictor, taille en octets, fonction de nettoyage) pour le cache ; le store étant
+    persistant, rien n'est supprimé à l'éviction. Une version entraînée avec un pipeline de
+    préparation antérieur est refusée (StalePipelineError).
+    """
+    with timed_stage("download"):
+        path_to_model_dir = artifact_store.get_predictor_dir(unique_id, version, model_registry)
+    check_pipeline_version(unique_id, path_to_model_dir)
+    size_bytes = get_directory_size_bytes(path_to_model_dir)
+    with timed_stage("load"):
+        predictor = get_autogluon().TimeSeriesPredictor.load(path_to_model_dir)
+        # Les réseaux sont gardés en mémoire : plus de relecture disque à chaque prédiction
+        predictor.persist()
+    return predictor, size_bytes, None
+
+def resolve_model_version(unique_id: str) -> str:
+    """Dernière version connue du registre, ou dernière version stockée si le registre est injoignable."""
+    try:
+        with timed_stage("registry_lookup"):
+            return model_registry.latest_version(unique_id)
+    except Exception as e:
+        stored_version = artifact_store.latest_stored_version(unique_id)
+        if stored_version is None:
+            raise
+        print(f"⚠️ Registre '{model_registry.backend_name}' injoignable ({e}), utilisation de la version stockée {stored_version}.")
+        return stored_version
+
+def warm_predictor(unique_id: str, version: str):
+    """Charge une version dans le cache (appelé par le thread de surveillance) et retourne le prédicteur."""
+    return predictor_cache.get_or_load(
+        unique_id, version,
+        lambda: download_and_load_predictor(unique_id, version)
+    )
+
+# Liste des modèles résolue au premier passage : la vérification des hiérarchies interroge la base
+model_refresher = ModelRefresher(get_serving_model_ids, model_registry, warm_predictor, MODEL_REFRESH_INTERVAL_SECONDS)
+
+def load_predictor(unique_id: str):
+    """Retourne (predictor, version) pour la dernière version du modèle, depuis le cache si possible."""
+    # Chemin rapide : la version déjà préchargée par la surveillance en arrière-plan,
+    # sans aller-retour vers le registre (rechargée si le cache l'a évincée entre-temps).
+    version = model_refresher.get_current_version(unique_id)
+    if version is None:
+        version = resolve_model_version(unique_id)
+    return warm_predictor(unique_id, version), version
+
+def get_predictor_cache_stats() -> dict:
+    return predictor_cache.stats()
+
+# --- Cache des prévisions ---
+
+forecast_cache = ForecastCache(max_entries=FORECAST_CACHE_MAX_ENTRIES, ttl_seconds=FORECAST_CACHE_TTL_SECONDS)
+
+def get_forecast_cache_stats() -> dict:
+    return forecast_cache.stats()
 
 # --- Fonction de prédiction principale ---
 
+def build_future_known_covariates(full_data_ts, known_covariates_names, prediction_length: int):
+    """
+    Covariables connues des `prediction_length` semaines futures de chaque série : dernière valeur
+    connue répétée (toutes les séries d'un modèle global en une fois).
+    """
+    TimeSeriesDataFrame = get_autogluon().TimeSeriesDataFrame
+    last_known = full_data_ts[known_covariates_names].groupby(level='item_id', sort=False).tail(1).reset_index()
+    offsets = np.arange(1, prediction_length + 1)
+    future_covariates_df = last_known.loc[last_known.index.repeat(prediction_length)].reset_index(drop=True)
+    future_covariates_df['timestamp'] = future_covariates_df['timestamp'] + pd.to_timedelta(np.tile(offsets, len(last_known)) * 7, unit="D")
+    return TimeSeriesDataFrame(future_covariates_df, id_column="item_id", timestamp_column="timestamp")
+
 def get_prediction(unique_id: str, future_only: bool = True) -> pd.DataFrame:
+    predictions, _, _ = run_prediction(unique_id, future_only=future_only)
+    return predictions
+
+def run_prediction(unique_id: str, future_only: bool = True, donnees_hebdo: pd.DataFrame = None) -> tuple:
+    """
+    Calcule les prévisions et retourne (prévisions, version du modèle, watermark des données).
+    `donnees_hebdo` permet de fournir des données hebdomadaires déjà récupérées (requêtes groupées).
+    Une catégorie servie par un modèle global reçoit sa part de la prédiction de toute la ligne
+    (`donnees_hebdo` est alors ignoré : le modèle global prépare toutes ses séries), et un total
+    hiérarchique sa prévision réconciliée.
+    """
+    with pipeline_context("predict", unique_id):
+        total_id = get_hierarchy_total(unique_id)
+        if total_id is not None:
+            predictions, model_version, watermark = _run_hierarchical_prediction(total_id, future_only)
+            return predictions[unique_id], model_version, watermark
+        return _run_base_prediction(unique_id, future_only, donnees_hebdo)
+
+def _run_base_prediction(unique_id: str, future_only: bool, donnees_hebdo: pd.DataFrame) -> tuple:
+    """Prévision du modèle servant `unique_id` (modèle global ou modèle de la catégorie), sans réconciliation."""
+    global_id = get_global_model_id(unique_id)
+    if global_id is not None:
+        predictions, model_version, watermarks = _run_global_prediction(global_id, future_only)
+        return predictions[unique_id], model_version, watermarks[unique_id]
+    return _run_prediction(unique_id, future_only, donnees_hebdo)
+
+def _run_prediction(unique_id: str, future_only: bool, donnees_hebdo: pd.DataFrame) -> tuple:
+    TimeSeriesDataFrame = get_autogluon().TimeSeriesDataFrame
     print(f"--- Début de la prédiction pour '{unique_id}' ---")
     if unique_id not in MODELS_CONFIG:
         raise ValueError(f"ID de modèle '{unique_id}' non trouvé.")
     config = MODELS_CONFIG[unique_id]
     
-    with tempfile.TemporaryDirectory() as temp_output_folder:
-        try:
-            # === ÉTAPE 1: CHARGEMENT DU MODÈLE ===
-            workspace, model_name = os.environ.get("COMET_WORKSPACE"), f"sales-forecast-{unique_id.replace('_', '-')}"
-            print(f"Téléchargement du modèle '{model_name}'...")
-            model_registry_item = comet_api.get_model(workspace=workspace, model_name=model_name)
-            latest_version_str = model_registry_item.find_versions()[0]
-            model_registry_item.download(version=latest_version_str, output_folder=temp_output_folder, expand=True)
-
-            # <<< LOGIQUE DE RECHERCHE DÉFINITIVE AVEC PLUSIEURS STRATÉGIES >>>
-            path_to_model_dir = None
-            
-            # Stratégie 1 : Chemin idéal (sous-dossier 'temp_...')
-            potential_path_1 = os.path.join(temp_output_folder, f"temp_{unique_id}")
-            if os.path.exists(os.path.join(potential_path_1, "predictor.pkl")):
-                path_to_model_dir = potential_path_1
-                print(f"Stratégie 1 réussie : Modèle trouvé dans {path_to_model_dir}")
-
-            # Stratégie 2 : Chemin "plat" de Windows (fichier avec '\' à la racine)
-            if not path_to_model_dir:
-                # Note: On doit construire le chemin avec l'antislash de Windows
-                win_style_filename = f"temp_{unique_id}\\predictor.pkl"
-                potential_path_2 = os.path.join(temp_output_folder, win_style_filename)
-                if os.path.exists(potential_path_2):
-                    # On doit charger le dossier qui contient ce fichier
-                    path_to_model_dir = os.path.dirname(potential_path_2)
-                    print(f"Stratégie 2 réussie : Modèle Windows trouvé dans {path_to_model_dir}")
-            
-            # Stratégie 3 : Recherche récursive de secours
-            if not path_to_model_dir:
-                print("Stratégies 1 et 2 échouées. Lancement de la recherche récursive de secours...")
-                for root, dirs, files in os.walk(temp_output_folder):
-                    if "predictor.pkl" in files:
-                        path_to_model_dir = root
-                        print(f"Stratégie 3 réussie : Modèle trouvé par scan récursif dans {path_to_model_dir}")
-                        break
-            
-            if not path_to_model_dir:
-                raise FileNotFoundError("Impossible de trouver 'predictor.pkl' avec toutes les stratégies de recherche.")
-            # <<< FIN DE LA CORRECTION >>>
-
-            predictor = TimeSeriesPredictor.load(path_to_model_dir)
-            print("✅ Modèle AutoGluon chargé avec succès.")
+    try:
+        # === ÉTAPE 1: CHARGEMENT DU MODÈLE ===
+        predictor, model_version = load_predictor(unique_id)
+        print(f"✅ Modèle AutoGluon prêt (version {model_version}).")
 
-        except Exception as e:
-            print(f"🛑 ERREUR CRITIQUE lors du chargement du modèle: {e}\n{traceback.format_exc()}")
-            raise e
+    except Exception as e:
+        print(f"🛑 ERREUR CRITIQUE lors du chargement du modèle: {e}\n{traceback.format_exc()}")
+        raise e
 
-        try:
-            # === ÉTAPE 2: PRÉPARATION DES DONNÉES ===
-            db_password, db_host, db_user, db_name, db_port = (os.environ.get(k) for k in ["DB_PASSWORD", "DB_HOST", "DB_USER", "DB_NAME", "DB_PORT"])
-            connection_str = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-            engine = create_engine(connection_str)
-            
-            df_daily = get_data_with_covariates(config, engine)
-            
-            print("--- 2. Agrégation et nettoyage des données ---")
-            agg_config = {'qty_sold': 'sum'}
-            for cov in config.get("known_covariates", []): agg_config[cov] = 'mean'
-            donnees_hebdo = df_daily.set_index('timestamp').resample('W-MON').agg(agg_config).reset_index()
-            donnees_hebdo['timestamp'] = pd.to_datetime(donnees_hebdo['timestamp']).dt.tz_localize(None)
-            donnees_hebdo['item_id'] = config["category_id_in_file"]
-            for col in config.get("known_covariates", []):
-                donnees_hebdo[col] = donnees_hebdo[col].interpolate(method='linear').ffill().bfill()
-            
-            donnees_hebdo = apply_feature_engineering(donnees_hebdo, config)
-            
-            donnees_hebdo.dropna(inplace=True)
-            if donnees_hebdo.empty: raise ValueError("Données vides après nettoyage (dropna).")
-            
-            if config.get("transformation") == "log":
-                donnees_hebdo[predictor.target] = np.log1p(donnees_hebdo[config["original_target_col"]])
+    try:
+        # === ÉTAPE 2: PRÉPARATION DES DONNÉES ===
+        # Les prévisions futures sont déterministes pour (modèle, données) : on les sert
+        # depuis le cache tant que ni la version ni le watermark des données n'ont changé.
+        with timed_stage("watermark"):
+            data_watermark = get_data_watermark(config)
+        if future_only:
+            cache_key = (unique_id, model_version, data_watermark)
+            cached_predictions = forecast_cache.get(cache_key)
+            if cached_predictions is not None:
+                print(f"✅ Prévisions pour '{unique_id}' servies depuis le cache.")
+                return cached_predictions, model_version, data_watermark
+        
+        # Même préparation qu'à l'entraînement, lue depuis le feature store si possible
+        with timed_stage("data_preparation"):
+            if donnees_hebdo is None:
+                donnees_hebdo = get_prepared_data(unique_id, config, watermark=data_watermark)
+            else:
+                donnees_hebdo = prepare_weekly_frame(donnees_hebdo, config)
+        if get_target_column(config) != predictor.target:
+            raise ValueError(f"Cible du modèle '{predictor.target}' différente de la config ('{get_target_column(config)}').")
 
-            full_data_ts = TimeSeriesDataFrame.from_data_frame(donnees_hebdo, id_column="item_id", timestamp_column="timestamp")
-            print("✅ Données prêtes.")
+        full_data_ts = TimeSeriesDataFrame.from_data_frame(donnees_hebdo, id_column="item_id", timestamp_column="timestamp")
+        print("✅ Données prêtes.")
 
-            # === ÉTAPE 3: PRÉDICTION ===
-            print("--- 3. Génération des prévisions ---")
-            known_covariates_df = None
-            prediction_length = predictor.prediction_length
+        # === ÉTAPE 3: PRÉDICTION ===
+        print("--- 3. Génération des prévisions ---")
+        known_covariates_df = None
+        prediction_length = predictor.prediction_length
 
-            if future_only:
-                data_history = full_data_ts
-                if predictor.known_covariates_names:
-                    last_known_covariates = full_data_ts.tail(1)[predictor.known_covariates_names]
-                    future_covariates_df = pd.concat([last_known_covariates] * prediction_length, ignore_index=True)
-                    last_date = full_data_ts.index.get_level_values('timestamp').max()
-                    future_dates = pd.date_range(start=last_date + pd.Timedelta(days=7), periods=prediction_length, freq='W-MON')
-                    future_covariates_df['timestamp'] = future_dates
-                    future_covariates_df['item_id'] = config["category_id_in_file"]
-                    known_covariates_df = TimeSeriesDataFrame(future_covariates_df, id_column="item_id", timestamp_column="timestamp")
-            else:
-                data_history = full_data_ts.slice_by_timestep(end_index=-prediction_length)
-                known_covariates_df = full_data_ts.tail(prediction_length) if predictor.known_covariates_names else None
-            
-            predictions = predictor.predict(data_history, known_covariates=known_covariates_df)
+        if future_only:
+            data_history = full_data_ts
+            if predictor.known_covariates_names:
+                known_covariates_df = build_future_known_covariates(full_data_ts, predictor.known_covariates_names, prediction_length)
+        else:
+            data_history = full_data_ts.slice_by_timestep(end_index=-prediction_length)
+            known_covariates_df = full_data_ts.tail(prediction_length) if predictor.known_covariates_names else None
+        
+        with timed_stage("predict"):
+            predictions = predictor.predict(data_history, known_covariates=known_covariates_df, use_cache=False)
 
-            # === ÉTAPE 4: RETRANSFORMATION ===
+        # === ÉTAPE 4: RETRANSFORMATION ===
+        with timed_stage("inverse_transform"):
             if config.get("transformation") == "log":
                 final_predictions = np.expm1(predictions)
             else:
                 final_predictions = predictions
             final_predictions = final_predictions.clip(lower=0)
-            
-            if not future_only and 'actual_sales' in full_data_ts.columns:
-                 y_test = full_data_ts.tail(prediction_length)[config["original_target_col"]]
-                 final_predictions['actual_sales'] = y_test.values
+        
+        if not future_only and 'actual_sales' in full_data_ts.columns:
+             y_test = full_data_ts.tail(prediction_length)[config["original_target_col"]]
+             final_predictions['actual_sales'] = y_test.values
+
+        if future_only:
+            forecast_cache.put(cache_key, final_predictions)
 
-            print(f"--- Prédiction pour '{unique_id}' terminée avec succès. ---")
-            return final_predictions
+        print(f"--- Prédiction pour '{unique_id}' terminée avec succès. ---")
+        return final_predictions, model_version, data_watermark
 
+    except Exception as e:
+        print(f"🛑 ERREUR lors de la préparation des données ou de la prédiction pour {unique_id}:\n   Message: {e}\n   Traceback: {traceback.format_exc()}")
+        raise e
+
+def run_global_prediction(global_id: str, future_only: bool = True) -> tuple:
+    """
+    Prévisions de toutes les catégories d'un modèle global en un seul appel à `predict`.
+    Retourne (dict unique_id -> prévisions, version du modèle, dict unique_id -> watermark).
+    """
+    with pipeline_context("predict", global_id):
+        return _run_global_prediction(global_id, future_only)
+
+def _run_global_prediction(global_id: str, future_only: bool) -> tuple:
+    TimeSeriesDataFrame = get_autogluon().TimeSeriesDataFrame
+    print(f"--- Début de la prédiction globale '{global_id}' ---")
+    members = get_global_members(global_id)
+    member_configs = {uid: get_member_config(global_id, uid) for uid in members}
+
+    predictor, model_version = load_predictor(global_id)
+    print(f"✅ Modèle global AutoGluon prêt (version {model_version}).")
+
+    with timed_stage("watermark"):
+        watermarks = {uid: get_data_watermark(config) for uid, config in member_configs.items()}
+    if future_only:
+        cached = {uid: forecast_cache.get((uid, model_version, watermarks[uid])) for uid in members}
+        if all(predictions is not None for predictions in cached.values()):
+            print(f"✅ Prévisions de '{global_id}' servies depuis le cache.")
+            return cached, model_version, watermarks
+
+    with timed_stage("data_preparation"):
+        donnees_hebdo, _ = get_global_prepared_data(global_id, watermarks=watermarks)
+    full_data_ts = TimeSeriesDataFrame.from_data_frame(donnees_hebdo, id_column="item_id", timestamp_column="timestamp")
+    full_data_ts.static_features = get_static_features(global_id)
+
+    prediction_length = predictor.prediction_length
+    known_covariates_df = None
+    if future_only:
+        data_history = full_data_ts
+        if predictor.known_covariates_names:
+            known_covariates_df = build_future_known_covariates(full_data_ts, predictor.known_covariates_names, prediction_length)
+    else:
+        data_history = full_data_ts.slice_by_timestep(end_index=-prediction_length)
+        known_covariates_df = full_data_ts.slice_by_timestep(start_index=-prediction_length) if predictor.known_covariates_names else None
+
+    # Un seul appel pour toutes les séries de la ligne produit
+    with timed_stage("predict"):
+        predictions = predictor.predict(data_history, known_covariates=known_covariates_df, use_cache=False)
+
+    results = {}
+    with timed_stage("inverse_transform"):
+        for unique_id, config in member_configs.items():
+            member_predictions = predictions.loc[[config["category_id_in_file"]]]
+            if config.get("transformation") == "log":
+                member_predictions = np.expm1(member_predictions)
+            results[unique_id] = member_predictions.clip(lower=0)
+            if future_only:
+                forecast_cache.put((unique_id, model_version, watermarks[unique_id]), results[unique_id])
+
+    print(f"--- Prédiction globale '{global_id}' terminée ({len(results)} catégories). ---")
+    return results, model_version, watermarks
+
+def _run_hierarchical_prediction(total_id: str, future_only: bool) -> tuple:
+    """
+    Prévisions réconciliées d'un total et de ses catégories, à partir des prévisions de base
+    (servies depuis le cache des prévisions quand elles y sont). Retourne (dict unique_id ->
+    prévisions, version composite des modèles de base, watermark combiné de leurs données).
+    """
+    print(f"--- Prévision hiérarchique de '{total_id}' ---")
+    base_predictions, versions, watermark = {}, {}, []
+    for unique_id in get_base_ids(total_id):
+        base_predictions[unique_id], versions[unique_id], base_watermark = _run_base_prediction(unique_id, future_only, None)
+        watermark.extend(base_watermark)
+    with timed_stage("reconciliation"):
+        reconciled = reconcile_forecasts(total_id, base_predictions)
+    return reconciled, format_hierarchy_version(versions), tuple(watermark)
+
+def get_forecast_version(unique_id: str):
+    """
+    Version attendue des prévisions stockées de `unique_id` : celle du modèle servi, ou la version
+    composite de ses modèles de base s'il est réconcilié. None tant qu'une version est inconnue.
+    """
+    total_id = get_hierarchy_total(unique_id)
+    if total_id is None:
+        return model_refresher.get_current_version(get_serving_model_id(unique_id))
+    versions = {uid: model_refresher.get_current_version(get_serving_model_id(uid)) for uid in get_base_ids(total_id)}
+    if any(version is None for version in versions.values()):
+        return None
+    return format_hierarchy_version(versions)
+
+def _get_base_watermark(unique_id: str) -> tuple:
+    global_id = get_global_model_id(unique_id)
+    config = get_member_config(global_id, unique_id) if global_id is not None else MODELS_CONFIG[unique_id]
+    return get_data_watermark(config)
+
+def get_forecast_watermark(unique_id: str) -> tuple:
+    """
+    Watermark des données actuelles, tel que l'enregistre le calcul des prévisions de `unique_id` :
+    celui de ses données, ou la concaténation de ceux de ses modèles de base s'il est réconcilié.
+    """
+    total_id = get_hierarchy_total(unique_id)
+    if total_id is None:
+        return _get_base_watermark(unique_id)
+    watermark = []
+    for base_id in get_base_ids(total_id):
+        watermark.extend(_get_base_watermark(base_id))
+    return tuple(watermark)
+
+# --- Prévisions précalculées (servies par /predict) ---
+
+forecast_store = ForecastStore(FORECAST_STORE_TABLE)
+watermark_cache = WatermarkCache(FORECAST_WATERMARK_CHECK_SECONDS)
+
+def store_forecast(unique_id: str, model_version: str, data_watermark: tuple, records: list):
+    """Enregistre les prévisions et le watermark de leurs données (qui devient le watermark courant)."""
+    watermark_cache.put(unique_id, data_watermark)
+    try:
+        forecast_store.write(unique_id, model_version, data_watermark, records)
+    except Exception as e:
+        print(f"⚠️ Enregistrement des prévisions de '{unique_id}' impossible: {e}")
+
+def get_fresh_forecast(unique_id: str):
+    """Prévisions stockées à jour (version servie, watermark courant en cache), ou None."""
+    watermark = watermark_cache.get(unique_id, lambda: get_forecast_watermark(unique_id))
+    return forecast_store.get_fresh(unique_id, get_forecast_version(unique_id), watermark)
+
+def compute_and_store_global_forecast(global_id: str) -> dict:
+    """
+    Calcule les prévisions futures de toutes les catégories d'un modèle global et les enregistre
+    (sauf celles réconciliées dans une hiérarchie, enregistrées par `compute_and_store_forecast`).
+    """
+    predictions, model_version, watermarks = run_global_prediction(global_id, future_only=True)
+    results = {}
+    for unique_id, member_predictions in predictions.items():
+        if get_hierarchy_total(unique_id) is not None:
+            continue
+        results[unique_id] = forecast_to_records(member_predictions)
+        store_forecast(unique_id, model_version, watermarks[unique_id], results[unique_id])
+    return results
+
+def compute_and_store_forecast(unique_id: str, donnees_hebdo: pd.DataFrame = None) -> list:
+    """Calcule les prévisions futures d'un modèle et les enregistre dans le store."""
+    total_id = get_hierarchy_total(unique_id)
+    if total_id is not None:
+        return compute_and_store_hierarchical_forecast(total_id)[unique_id]
+    global_id = get_global_model_id(unique_id)
+    if global_id is not None:
+        return compute_and_store_global_forecast(global_id)[unique_id]
+    predictions, model_version, data_watermark = run_prediction(unique_id, future_only=True, donnees_hebdo=donnees_hebdo)
+    records = forecast_to_records(predictions)
+    store_forecast(unique_id, model_version, data_watermark, records)
+    return records
+
+def compute_and_store_hierarchical_forecast(total_id: str) -> dict:
+    """Calcule et enregistre les prévisions réconciliées d'un total (et, en "mint", de ses catégories)."""
+    with pipeline_context("predict", total_id):
+        predictions, model_version, watermark = _run_hierarchical_prediction(total_id, future_only=True)
+    results = {}
+    for unique_id in get_hierarchy_members(total_id):
+        results[unique_id] = forecast_to_records(predictions[unique_id])
+        store_forecast(unique_id, model_version, watermark, results[unique_id])
+    return results
+
+def get_future_forecast_records(unique_id: str) -> list:
+    """
+    Prévisions futures au format de l'API : lues dans le store si elles correspondent à la
+    version servie du modèle et aux données actuelles, sinon calculées (puis stockées pour les appels suivants).
+    """
+    if unique_id not in MODELS_CONFIG:
+        raise ValueError(f"ID de modèle '{unique_id}' non trouvé.")
+    with pipeline_context("predict_api", unique_id):
+        with timed_stage("forecast_store_read"):
+            stored = get_fresh_forecast(unique_id)
+        if stored is not None:
+            return stored["records"]
+        print(f"Aucune prévision précalculée à jour pour '{unique_id}', calcul direct.")
+        return compute_and_store_forecast(unique_id)
+
+def get_future_forecast_records_batch(unique_ids) -> tuple:
+    """
+    Prévisions futures de plusieurs modèles en un appel. Retourne (résultats, erreurs) :
+    deux dicts unique_id -> liste de prévisions / message d'erreur.
+
+    Les prévisions à jour sont lues dans le store ; pour les autres, les données hebdomadaires
+    sont récupérées en une requête par `source_table` avant l'inférence de chaque modèle, et
+    chaque modèle global n'est prédit qu'une fois pour toutes ses catégories.
+    """
+    results, errors, misses = {}, {}, []
+    for unique_id in dict.fromkeys(unique_ids):
+        if unique_id not in MODELS_CONFIG:
+            errors[unique_id] = f"ID de modèle '{unique_id}' non trouvé."
+            continue
+        stored = get_fresh_forecast(unique_id)
+        if stored is not None:
+            results[unique_id] = stored["records"]
+        else:
+            misses.append(unique_id)
+
+    if misses:
+        print(f"--- Calcul direct des prévisions pour {len(misses)} modèle(s) : {misses} ---")
+        single_misses = [uid for uid in misses if get_global_model_id(uid) is None and get_hierarchy_total(uid) is None]
+        try:
+            shared_data = get_weekly_data_for_configs({uid: MODELS_CONFIG[uid] for uid in single_misses}) if single_misses else {}
         except Exception as e:
-            print(f"🛑 ERREUR lors de la préparation des données ou de la prédiction pour {unique_id}:\n   Message: {e}\n   Traceback: {traceback.format_exc()}")
-            raise e
+            # Repli : chaque modèle récupère ses propres données
+            print(f"⚠️ Récupération groupée impossible ({e}), récupération modèle par modèle.")
+            shared_data = {}
+        failed_globals = {}
+        for unique_id in misses:
+            if unique_id in results:
+                continue
+            # Les prévisions réconciliées passent par compute_and_store_forecast
+            global_id = get_global_model_id(unique_id) if get_hierarchy_total(unique_id) is None else None
+            if global_id in failed_globals:
+                errors[unique_id] = failed_globals[global_id]
+                continue
+            try:
+                if global_id is not None:
+                    group_results = compute_and_store_global_forecast(global_id)
+                    results.update({uid: records for uid, records in group_results.items() if uid in misses})
+                else:
+                    results[unique_id] = compute_and_store_forecast(unique_id, donnees_hebdo=shared_data.get(unique_id))
+            except Exception as e:
+                errors[unique_id] = str(e)
+                if global_id is not None:
+                    failed_globals[global_id] = str(e)
+    return results, errors
+
+def get_forecast_store_stats() -> dict:
+    return {**forecast_store.stats(), "watermarks": watermark_cache.stats()}
 
 # --- Point d'entrée pour les tests en local ---
 if __name__ == "__main__":
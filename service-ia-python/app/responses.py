@@ -0,0 +1,91 @@
+# Fichier: service-ia-python/app/responses.py
+
+import json
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # Repli sur le module json standard
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # Le format Arrow est refusé si pyarrow n'est pas installé
+    pa = None
+
+# records : liste de lignes (format historique) ; columns : un tableau par colonne ;
+# arrow : flux Arrow IPC, pour les consommateurs en masse
+RESPONSE_FORMATS = ["records", "columns", "arrow"]
+JSON_MEDIA_TYPE = "application/json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def check_response_format(fmt: str) -> str:
+    if fmt not in RESPONSE_FORMATS:
+        raise ValueError(f"Format '{fmt}' inconnu. Valeurs possibles : {RESPONSE_FORMATS}")
+    if fmt == "arrow" and pa is None:
+        raise ValueError("Format 'arrow' indisponible : pyarrow n'est pas installé.")
+    return fmt
+
+def dumps_json(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def records_to_frame(records: list) -> pd.DataFrame:
+    """Prévisions au format records (store, API) -> DataFrame avec des timestamps typés."""
+    df = pd.DataFrame.from_records(records)
+    if 'timestamp' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
+
+def frame_to_records(df: pd.DataFrame) -> list:
+    """Format historique de l'API : une liste de lignes, dates en chaînes ISO."""
+    df = df.assign(**{col: df[col].dt.strftime(TIMESTAMP_FORMAT)
+                      for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])})
+    return df.to_dict(orient="records")
+
+def frame_to_columns(df: pd.DataFrame) -> dict:
+    """Un tableau par colonne ; les dates sont formatées en une seule opération vectorisée."""
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime(TIMESTAMP_FORMAT)
+        columns[str(col)] = values.tolist()
+    return columns
+
+def frame_to_arrow(df: pd.DataFrame) -> bytes:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Les noms de quantiles ("0.1", "0.9") doivent être des chaînes dans un schéma Arrow
+    table = table.rename_columns([str(name) for name in table.column_names])
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def serialize_frame(df: pd.DataFrame, fmt: str) -> tuple:
+    """DataFrame -> (contenu, type MIME) pour les formats 'columns' et 'arrow'."""
+    if fmt == "arrow":
+        return frame_to_arrow(df), ARROW_MEDIA_TYPE
+    return dumps_json(frame_to_columns(df)), JSON_MEDIA_TYPE
+
+def serialize_records(records: list, fmt: str) -> tuple:
+    return serialize_frame(records_to_frame(records), fmt)
+
+def serialize_batch(results: dict, errors: dict, fmt: str) -> tuple:
+    """
+    Réponse groupée : en 'columns', un objet de colonnes par modèle ; en 'arrow', une seule
+    table avec une colonne `unique_id` (les erreurs sont alors renvoyées par l'appelant dans
+    l'en-tête `X-Prediction-Errors`).
+    """
+    if fmt == "arrow":
+        frames = [records_to_frame(records).assign(unique_id=unique_id) for unique_id, records in results.items()]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({"unique_id": []})
+        return frame_to_arrow(df), ARROW_MEDIA_TYPE
+    payload = {
+        "predictions": {unique_id: frame_to_columns(records_to_frame(records)) for unique_id, records in results.items()},
+        "errors": errors,
+    }
+    return dumps_json(payload), JSON_MEDIA_TYPE
@@ -2,104 +2,31 @@
 
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine
 import os
 import argparse
 from autogluon.timeseries import TimeSeriesDataFrame, TimeSeriesPredictor
 from sklearn.metrics import mean_absolute_error
 import comet_ml
 from dotenv import load_dotenv
-from .config import MODELS_CONFIG
+from .config import MODELS_CONFIG, GLOBAL_MODELS_CONFIG
+from .features import get_prepared_data, prepare_weekly_frame, get_target_column, PIPELINE_VERSION
+from .incremental import write_training_metadata, get_holdout_loss, HOLDOUT_METRIC
+from .global_models import (
+    get_global_members, get_member_config, get_static_features, get_global_prepared_data,
+    filter_training_window, get_serving_model_ids
+)
 
 load_dotenv()
-engine = None
 
-def init_db_engine():
-    """Initialise la connexion à la base de données."""
-    global engine
-    if engine is None:
-        db_password, db_host, db_user, db_name, db_port = (os.environ.get(k) for k in ["DB_PASSWORD", "DB_HOST", "DB_USER", "DB_NAME", "DB_PORT"])
-        connection_str = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-        engine = create_engine(connection_str)
+PREDICTION_LENGTH = 12
 
-def get_training_data(config):
-    """
-    Construit et exécute une requête SQL dynamique pour récupérer toutes les données
-    nécessaires à l'entraînement (ventes + covariables externes si besoin).
-    """
-    init_db_engine()
-    item_id_to_fetch = config["category_id_in_file"]
-    known_covariates = config.get("known_covariates", [])
-    source_table = config.get("source_table", "sales")
-    print(f"--- 1. Récupération des données d'entraînement pour {item_id_to_fetch} ---")
-
-    base_query = f"SELECT s.item_id, s.\"timestamp\", s.qty_sold"
-    joins = ""
-
-    if "temperature_mean" in known_covariates or "rain" in known_covariates:
-        base_query += ", w.temperature_mean, w.precipitation AS rain"
-        joins += " LEFT JOIN weather w ON DATE(s.\"timestamp\" AT TIME ZONE 'UTC') = w.date AND w.city = 'PARIS'"
-    if "ipc" in known_covariates:
-        base_query += ", i.ipc_clothing_shoes AS ipc"
-        joins += " LEFT JOIN ipc i ON DATE_TRUNC('month', s.\"timestamp\" AT TIME ZONE 'UTC')::DATE = i.time_period"
-    if "moral_menages" in known_covariates:
-        base_query += ", hc.synthetic_indicator AS moral_menages"
-        joins += " LEFT JOIN household_confidence hc ON DATE_TRUNC('month', s.\"timestamp\" AT TIME ZONE 'UTC')::DATE = hc.time_period"
-
-    final_query = f"""
-    {base_query}
-    FROM {source_table} s
-    {joins}
-    WHERE s.item_id = '{item_id_to_fetch}'
-    ORDER BY s."timestamp";
-    """
-    
-    df = pd.read_sql(final_query, engine, parse_dates=['timestamp'])
-    print(f"✅ {len(df)} lignes de données brutes récupérées.")
-    return df
-
-def apply_feature_engineering(df, config):
-    """Applique le feature engineering si spécifié dans la config."""
-    if "feature_engineering" not in config:
-        return df
-    print("--- Application du Feature Engineering (lags, rolling mean) ---")
-    fe_config = config["feature_engineering"]
-    target = config["original_target_col"]
-    for lag in fe_config.get("lags", []):
-        df[f'lag_{lag}'] = df[target].shift(lag)
-    for window in fe_config.get("rolling_means", []):
-        df[f'rolling_mean_{window}'] = df[target].shift(1).rolling(window=window).mean()
-    return df
-
-def train_model(unique_id: str):
-    print(f"--- Début de l'entraînement pour {unique_id} ---")
-    config = MODELS_CONFIG[unique_id]
-    
-    experiment = comet_ml.Experiment(project_name=os.environ.get("COMET_PROJECT_NAME"))
-    experiment.set_name(f"Training_{unique_id}")
-    experiment.log_parameters(config)
-    
-    # === ÉTAPE 1: PRÉPARATION DES DONNÉES ===
-    df_daily = get_training_data(config)
-    
-    print("--- 2. Agrégation et nettoyage des données ---")
-    agg_config = {'qty_sold': 'sum'}
-    for cov in config.get("known_covariates", []): agg_config[cov] = 'mean'
-    donnees_hebdo = df_daily.set_index('timestamp').resample('W-MON').agg(agg_config).reset_index()
-    donnees_hebdo['timestamp'] = pd.to_datetime(donnees_hebdo['timestamp']).dt.tz_localize(None)
-    donnees_hebdo['item_id'] = config["category_id_in_file"]
-
-    for col in config.get("known_covariates", []):
-        donnees_hebdo[col] = donnees_hebdo[col].interpolate(method='linear').ffill().bfill()
-
-    donnees_hebdo = apply_feature_engineering(donnees_hebdo, config)
-    donnees_hebdo.dropna(inplace=True)
-    if donnees_hebdo.empty: raise ValueError("Données vides après nettoyage.")
-
-    target_col = config["original_target_col"]
-    if config.get("transformation") == "log":
-        target_col = f"{target_col}_log"
-        donnees_hebdo[target_col] = np.log1p(donnees_hebdo[config["original_target_col"]])
+def build_training_data(unique_id: str, config, donnees_hebdo: pd.DataFrame = None) -> TimeSeriesDataFrame:
+    """Données d'entraînement du modèle : préparation commune puis filtres de dates de la config."""
+    # Préparation partagée avec predict.py (feature store), ou à partir des données fournies
+    if donnees_hebdo is None:
+        donnees_hebdo = get_prepared_data(unique_id, config)
+    else:
+        donnees_hebdo = prepare_weekly_frame(donnees_hebdo, config)
 
     if config.get("training_start_date"):
         donnees_hebdo = donnees_hebdo[donnees_hebdo['timestamp'] >= config["training_start_date"]]
@@ -110,13 +37,50 @@ def train_model(unique_id: str):
         print(f"Filtrage des données : conservation des données après l'indice {config['data_filter_start']}.")
         start_date = data.loc[config["category_id_in_file"]].index[config["data_filter_start"]]
         data = data.query("timestamp >= @start_date")
+    return data
 
+def evaluate_mae(predictor, data: TimeSeriesDataFrame, config) -> float:
+    """MAE (échelle d'origine) de la médiane prédite sur les `prediction_length` dernières semaines."""
+    prediction_length = predictor.prediction_length
+    train_data = data.slice_by_timestep(end_index=-prediction_length)
+    # <<< LA CORRECTION EST ICI >>>
+    # On fournit à la fonction predict les covariables de TOUT le jeu de données.
+    # AutoGluon se chargera de sélectionner la bonne fenêtre de temps pour l'évaluation.
+    known_covariates_for_evaluation = data[config.get("known_covariates", [])]
+    predictions = predictor.predict(train_data, known_covariates=known_covariates_for_evaluation)
+
+    y_test = data.tail(prediction_length)[config["original_target_col"]]
+    y_pred = predictions['0.5']
+    if config.get("transformation") == "log":
+        y_pred = np.expm1(y_pred)
+    return float(mean_absolute_error(y_test, y_pred.clip(0)))
+
+def train_model(unique_id: str, donnees_hebdo: pd.DataFrame = None, time_limit: float = None) -> dict:
+    """
+    Entraîne, évalue et enregistre sur Comet le modèle `unique_id`.
+
+    `donnees_hebdo` permet de fournir des données hebdomadaires déjà récupérées (orchestrateur
+    multi-modèles) ; `time_limit` borne la durée du fit AutoGluon, en secondes.
+    Retourne un résumé de l'exécution (MAE, chemin local du modèle, message).
+    Un ID de GLOBAL_MODELS_CONFIG entraîne le modèle global correspondant.
+    """
+    if unique_id in GLOBAL_MODELS_CONFIG:
+        return train_global_model(unique_id, time_limit=time_limit)
+    print(f"--- Début de l'entraînement pour {unique_id} ---")
+    config = MODELS_CONFIG[unique_id]
+    
+    experiment = comet_ml.Experiment(project_name=os.environ.get("COMET_PROJECT_NAME"))
+    experiment.set_name(f"Training_{unique_id}")
+    experiment.log_parameters(config)
+    
+    # === ÉTAPE 1: PRÉPARATION DES DONNÉES ===
+    data = build_training_data(unique_id, config, donnees_hebdo)
+    target_col = get_target_column(config)
     print("✅ Données prêtes pour l'entraînement.")
 
     # === ÉTAPE 2: ENTRAÎNEMENT DU MODÈLE ===
-    prediction_length = 12
+    prediction_length = PREDICTION_LENGTH
     train_data = data.slice_by_timestep(end_index=-prediction_length)
-    test_data = data
     
     print("--- 3. Lancement de l'entraînement AutoGluon ---")
     local_model_path = f"AutogluonModels/temp_{unique_id}"
@@ -136,11 +100,12 @@ def train_model(unique_id: str):
         print(f"Entraînement du modèle unique : {model_to_train} avec les hyperparamètres spécifiés.")
         predictor.fit(
             train_data,
-            hyperparameters={model_to_train: hyperparams}
+            hyperparameters={model_to_train: hyperparams},
+            time_limit=time_limit
         )
     else:
         default_models = {"Naive": {}, "SeasonalNaive": {}, "ETS": {}, "Theta": {}}
-        time_limit = config.get("time_limit", 300)
+        time_limit = time_limit or config.get("time_limit", 300)
         print(f"Entraînement avec des modèles simples par défaut (limite de temps : {time_limit}s).")
         predictor.fit(
             train_data,
@@ -150,30 +115,153 @@ def train_model(unique_id: str):
 
     # === ÉTAPE 3: ÉVALUATION ET SAUVEGARDE ===
     print("--- 4. Évaluation du modèle ---")
-    
-    # <<< LA CORRECTION EST ICI >>>
-    # On fournit à la fonction predict les covariables de TOUT le jeu de données.
-    # AutoGluon se chargera de sélectionner la bonne fenêtre de temps pour l'évaluation.
-    known_covariates_for_evaluation = test_data[config.get("known_covariates", [])]
-    predictions = predictor.predict(train_data, known_covariates=known_covariates_for_evaluation)
-    
-    y_test = test_data.tail(prediction_length)[config["original_target_col"]]
-    y_pred = predictions['0.5']
-    if config.get("transformation") == "log":
-        y_pred = np.expm1(y_pred)
-    
-    mae_score = mean_absolute_error(y_test, y_pred.clip(0))
+    mae_score = evaluate_mae(predictor, data, config)
     print(f"✅ MAE Score: {mae_score}")
     experiment.log_metric("mae", mae_score)
+
+    # Perte de référence des réentraînements incrémentaux : même fenêtre finale et même métrique
+    # que le contrôle de dérive (get_holdout_loss)
+    holdout_loss = get_holdout_loss(predictor, data)
+    experiment.log_metric("holdout_loss", holdout_loss)
+    write_training_metadata(local_model_path, {
+        "unique_id": unique_id,
+        "mode": "full",
+        "baseline_holdout_loss": holdout_loss,
+        "holdout_metric": HOLDOUT_METRIC,
+        "pipeline_version": PIPELINE_VERSION,
+        "mae": mae_score,
+        "data_end": str(data.index.get_level_values('timestamp').max()),
+        "fine_tunes_since_full": 0,
+    })
     
     print("--- 5. Sauvegarde du modèle sur Comet ML ---")
     experiment.log_model(name=f"sales-forecast-{unique_id.replace('_', '-')}", file_or_folder=local_model_path)
     experiment.end()
-    return "✅ Succès ! Retrouvez cette exécution sur Comet."
+    return {
+        "unique_id": unique_id,
+        "mae": float(mae_score),
+        "model_path": local_model_path,
+        "message": "✅ Succès ! Retrouvez cette exécution sur Comet.",
+    }
+
+def train_global_model(global_id: str, time_limit: float = None) -> dict:
+    """
+    Entraîne un seul modèle multi-séries sur toutes les catégories d'une source_table, avec
+    les covariables statiques de chaque série, puis l'enregistre sur Comet sous `global_id`.
+    La MAE retournée est la moyenne des MAE par catégorie (détaillées dans "member_mae").
+    """
+    print(f"--- Début de l'entraînement du modèle global {global_id} ---")
+    global_config = GLOBAL_MODELS_CONFIG[global_id]
+    members = get_global_members(global_id)
+    member_configs = {uid: get_member_config(global_id, uid) for uid in members}
+    target_cols = {get_target_column(config) for config in member_configs.values()}
+    if len(target_cols) != 1:
+        raise ValueError(f"Les catégories de '{global_id}' n'ont pas la même cible : {sorted(target_cols)}.")
+    target_col = target_cols.pop()
+    known_covariates = global_config.get("known_covariates", [])
+
+    experiment = comet_ml.Experiment(project_name=os.environ.get("COMET_PROJECT_NAME"))
+    experiment.set_name(f"Training_{global_id}")
+    experiment.log_parameters({**global_config, "members": members})
+
+    # === ÉTAPE 1: PRÉPARATION DES DONNÉES (une série par catégorie) ===
+    donnees_hebdo, _ = get_global_prepared_data(global_id)
+    donnees_hebdo = pd.concat([
+        filter_training_window(donnees_hebdo[donnees_hebdo['item_id'] == config["category_id_in_file"]], config)
+        for config in member_configs.values()
+    ], ignore_index=True)
+    data = TimeSeriesDataFrame.from_data_frame(donnees_hebdo, id_column="item_id", timestamp_column="timestamp")
+    data.static_features = get_static_features(global_id)
+    print(f"✅ Données prêtes pour l'entraînement ({data.num_items} séries).")
+
+    # === ÉTAPE 2: ENTRAÎNEMENT DU MODÈLE ===
+    prediction_length = PREDICTION_LENGTH
+    train_data = data.slice_by_timestep(end_index=-prediction_length)
+    local_model_path = f"AutogluonModels/temp_{global_id}"
+
+    predictor = TimeSeriesPredictor(
+        prediction_length=prediction_length,
+        path=local_model_path,
+        target=target_col,
+        eval_metric="mean_wQuantileLoss",
+        quantile_levels=[0.1, 0.5, 0.9],
+        known_covariates_names=known_covariates
+    )
+    hyperparams = global_config["hyperparameters"].copy()
+    model_to_train = hyperparams.pop("model")
+    print(f"Entraînement du modèle global : {model_to_train} sur {members}.")
+    predictor.fit(
+        train_data,
+        hyperparameters={model_to_train: hyperparams},
+        time_limit=time_limit or global_config.get("time_limit")
+    )
+
+    # === ÉTAPE 3: ÉVALUATION PAR CATÉGORIE ET SAUVEGARDE ===
+    print("--- 4. Évaluation du modèle global ---")
+    predictions = predictor.predict(train_data, known_covariates=data[known_covariates] if known_covariates else None)
+    member_mae = {}
+    for unique_id, config in member_configs.items():
+        item_id = config["category_id_in_file"]
+        y_test = data.loc[item_id].tail(prediction_length)[config["original_target_col"]]
+        y_pred = predictions.loc[item_id]['0.5']
+        if config.get("transformation") == "log":
+            y_pred = np.expm1(y_pred)
+        member_mae[unique_id] = float(mean_absolute_error(y_test, y_pred.clip(0)))
+        experiment.log_metric(f"mae_{unique_id}", member_mae[unique_id])
+    mae_score = float(np.mean(list(member_mae.values())))
+    print(f"✅ MAE moyenne : {mae_score} ({member_mae})")
+    experiment.log_metric("mae", mae_score)
+    write_training_metadata(local_model_path, {
+        "unique_id": global_id,
+        "mode": "full",
+        "pipeline_version": PIPELINE_VERSION,
+        "mae": mae_score,
+        "member_mae": member_mae,
+        "data_end": str(data.index.get_level_values('timestamp').max()),
+    })
+
+    print("--- 5. Sauvegarde du modèle sur Comet ML ---")
+    experiment.log_model(name=f"sales-forecast-{global_id.replace('_', '-')}", file_or_folder=local_model_path)
+    experiment.end()
+    return {
+        "unique_id": global_id,
+        "mae": mae_score,
+        "member_mae": member_mae,
+        "model_path": local_model_path,
+        "message": "✅ Succès ! Retrouvez cette exécution sur Comet.",
+    }
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--category", required=True, help="ID unique de la catégorie à entraîner")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--category", help="ID unique de la catégorie (ou du modèle global) à entraîner")
+    target.add_argument("--all", action="store_true", help="Entraîne en parallèle tous les modèles servis (modèles globaux si activés)")
+    target.add_argument("--ids", help="Liste d'IDs séparés par des virgules, entraînés en parallèle")
+    parser.add_argument("--jobs", type=int, default=None, help="Nombre d'entraînements simultanés (orchestrateur)")
+    parser.add_argument("--time_limit", type=float, default=None, help="Limite de temps par modèle, en secondes (orchestrateur)")
+    parser.add_argument("--incremental", action="store_true", help="Fine-tune la version en service (réentraînement complet en cas de dérive)")
+    parser.add_argument("--refresh_forecasts", action="store_true", help="Recalcule ensuite les prévisions précalculées des modèles entraînés")
     args = parser.parse_args()
-    result_message = train_model(args.category)
-    print(f"\n{result_message}")
\ No newline at end of file
+
+    if args.category:
+        if args.incremental:
+            from .incremental import refit_model
+            result = refit_model(args.category)
+        else:
+            result = train_model(args.category)
+        print(f"\n{result['message']}")
+        trained_ids = [args.category]
+        failed = False
+    else:
+        from .train_orchestrator import train_models_in_parallel, print_training_report
+        ids = get_serving_model_ids() if args.all else [uid.strip() for uid in args.ids.split(",") if uid.strip()]
+        report = train_models_in_parallel(ids, n_jobs=args.jobs, time_limit=args.time_limit, incremental=args.incremental)
+        print_training_report(report)
+        trained_ids = [job["unique_id"] for job in report if job["status"] == "success"]
+        failed = any(job["status"] != "success" for job in report)
+
+    if args.refresh_forecasts and trained_ids:
+        from .batch_forecast import run_batch_forecast
+        run_batch_forecast(trained_ids)
+    if failed:
+        raise SystemExit(1)
\ No newline at end of file
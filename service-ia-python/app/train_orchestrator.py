@@ -0,0 +1,95 @@
+# Fichier: service-ia-python/app/train_orchestrator.py
+
+import os
+import time
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .config import MODELS_CONFIG, GLOBAL_MODELS_CONFIG, TRAINING_MAX_PARALLEL_JOBS
+from .data_access import get_weekly_data_for_configs
+from .workers import THREAD_ENV_VARS, init_training_worker
+
+
+def compute_job_budget(n_models: int, n_jobs: int = None) -> tuple:
+    """Nombre d'entraînements simultanés et nombre de cœurs alloués à chacun."""
+    cpu_count = os.cpu_count() or 1
+    if n_jobs is None:
+        n_jobs = TRAINING_MAX_PARALLEL_JOBS or cpu_count
+    n_jobs = max(1, min(n_jobs, n_models, cpu_count))
+    return n_jobs, max(1, cpu_count // n_jobs)
+
+def _run_training_job(unique_id: str, donnees_hebdo, time_limit: float, incremental: bool = False) -> dict:
+    # Import dans le processus enfant, une fois le budget de threads appliqué
+    from .train import train_model
+    from .incremental import refit_model
+    start = time.perf_counter()
+    try:
+        train_fn = refit_model if incremental else train_model
+        result = train_fn(unique_id, donnees_hebdo=donnees_hebdo, time_limit=time_limit)
+        return {"unique_id": unique_id, "status": "success", "mae": result["mae"], "mode": result.get("mode", "full"),
+                "duration_s": round(time.perf_counter() - start, 1), "error": None}
+    except Exception as e:
+        print(f"🛑 Échec de l'entraînement de {unique_id}: {e}\n{traceback.format_exc()}")
+        return {"unique_id": unique_id, "status": "failed", "mae": None,
+                "duration_s": round(time.perf_counter() - start, 1), "error": str(e)}
+
+def train_models_in_parallel(unique_ids, n_jobs: int = None, time_limit: float = None, incremental: bool = False) -> list:
+    """
+    Entraîne plusieurs modèles de MODELS_CONFIG (ou de GLOBAL_MODELS_CONFIG) dans un pool de processus.
+
+    Les données hebdomadaires sont récupérées une seule fois par `source_table` dans le processus
+    parent, puis transmises aux entraînements (les modèles globaux préparent leurs propres séries). Chaque processus reçoit une part égale des cœurs
+    (threads torch/BLAS bornés) et `time_limit` est appliqué au fit AutoGluon de chaque modèle.
+    Avec `incremental`, chaque modèle passe par `refit_model` (fine-tuning de la version en service).
+    Retourne un rapport par modèle (statut, MAE, durée, erreur éventuelle).
+    """
+    unknown = [uid for uid in unique_ids if uid not in MODELS_CONFIG and uid not in GLOBAL_MODELS_CONFIG]
+    if unknown:
+        raise ValueError(f"ID(s) de modèle inconnu(s) : {unknown}")
+
+    n_jobs, threads_per_job = compute_job_budget(len(unique_ids), n_jobs)
+    print(f"--- Orchestrateur : {len(unique_ids)} modèles, {n_jobs} en parallèle, {threads_per_job} thread(s) chacun ---")
+
+    configs = {uid: MODELS_CONFIG[uid] for uid in unique_ids if uid in MODELS_CONFIG}
+    shared_data = get_weekly_data_for_configs(configs)
+
+    # Les processus 'spawn' héritent de l'environnement du parent au démarrage
+    previous_env = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+    os.environ.update({var: str(threads_per_job) for var in THREAD_ENV_VARS})
+    report = []
+    try:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context,
+                                 initializer=init_training_worker, initargs=(threads_per_job,)) as executor:
+            futures = {
+                executor.submit(_run_training_job, uid, shared_data.get(uid), time_limit, incremental): uid
+                for uid in unique_ids
+            }
+            for future in as_completed(futures):
+                uid = futures[future]
+                try:
+                    job_report = future.result()
+                except Exception as e:
+                    # Processus enfant tué (mémoire, signal...) : on le signale sans bloquer les autres
+                    job_report = {"unique_id": uid, "status": "failed", "mae": None, "duration_s": None, "error": repr(e)}
+                print(f"[{len(report) + 1}/{len(unique_ids)}] {uid} : {job_report['status']}")
+                report.append(job_report)
+    finally:
+        for var, value in previous_env.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+    order = {uid: i for i, uid in enumerate(unique_ids)}
+    return sorted(report, key=lambda job: order[job["unique_id"]])
+
+def print_training_report(report: list):
+    print("\n--- Rapport d'entraînement ---")
+    print(f"{'Modèle':<25} {'Statut':<8} {'Mode':<10} {'MAE':>10} {'Durée (s)':>10}  Erreur")
+    for job in report:
+        mae = f"{job['mae']:.3f}" if job["mae"] is not None else "-"
+        duration = f"{job['duration_s']:.1f}" if job["duration_s"] is not None else "-"
+        print(f"{job['unique_id']:<25} {job['status']:<8} {job.get('mode') or '-':<10} {mae:>10} {duration:>10}  {job['error'] or ''}")
+    succeeded = sum(job["status"] == "success" for job in report)
+    print(f"\n{succeeded}/{len(report)} modèles entraînés avec succès.")
@@ -0,0 +1,318 @@
+# Fichier: service-ia-python/app/tuning.py
+
+import os
+import json
+import time
+import shutil
+import argparse
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from .config import (
+    MODELS_CONFIG, MODELS_ROOT, TUNING_SEARCH_SPACES, TUNING_MAX_CPUS, TUNING_MAX_PARALLEL_TRIALS,
+    TUNING_TIME_BUDGET_SECONDS, TUNING_RESULTS_ROOT
+)
+from .features import get_prepared_data, get_target_column
+from .global_models import filter_training_window
+from .workers import THREAD_ENV_VARS, init_training_worker
+
+try:
+    import optuna
+except ImportError:  # Repli sur un tirage aléatoire des configurations
+    optuna = None
+
+# Échecs propres à un essai (entraînement impossible, valeurs d'hyperparamètres invalides,
+# mémoire) : l'essai est compté comme échoué. Les autres erreurs (config, code) remontent.
+TRIAL_ERRORS = (RuntimeError, ValueError, MemoryError)
+# Halving successif : à chaque palier, seul le meilleur 1/eta des essais continue, avec eta fois
+# plus d'époques ; le dernier palier utilise le max_epochs de la config du modèle.
+DEFAULT_ETA = 3
+DEFAULT_RUNGS = 3
+
+
+def sample_params(space: dict, rng, optuna_trial=None) -> dict:
+    """Tire une configuration dans l'espace de recherche (via Optuna si un essai est fourni)."""
+    params = {}
+    for name, spec in space.items():
+        kind = spec[0]
+        if kind not in ("int", "float", "log", "choice"):
+            raise ValueError(f"Type '{kind}' inconnu pour l'hyperparamètre '{name}'.")
+        if optuna_trial is not None:
+            if kind == "int":
+                params[name] = optuna_trial.suggest_int(name, spec[1], spec[2])
+            elif kind == "choice":
+                params[name] = optuna_trial.suggest_categorical(name, spec[1])
+            else:
+                params[name] = optuna_trial.suggest_float(name, spec[1], spec[2], log=(kind == "log"))
+        elif kind == "int":
+            params[name] = int(rng.integers(spec[1], spec[2] + 1))
+        elif kind == "float":
+            params[name] = float(rng.uniform(spec[1], spec[2]))
+        elif kind == "log":
+            params[name] = float(np.exp(rng.uniform(np.log(spec[1]), np.log(spec[2]))))
+        else:
+            params[name] = spec[1][int(rng.integers(len(spec[1])))]
+    return params
+
+def get_rung_epochs(max_epochs: int, eta: int, n_rungs: int) -> list:
+    return [max(1, round(max_epochs / eta ** (n_rungs - 1 - rung))) for rung in range(n_rungs)]
+
+
+# --- Exécution d'un essai (processus enfant) ---
+
+_worker_data = None
+
+def _init_tuning_worker(threads_per_trial: int, prepared):
+    """Budget de threads de l'essai, et données préparées reçues une seule fois par processus."""
+    global _worker_data
+    init_training_worker(threads_per_trial)
+    _worker_data = prepared
+
+def _run_trial(unique_id: str, hyperparameters: dict, trial_path: str, time_limit: float) -> dict:
+    from autogluon.timeseries import TimeSeriesDataFrame, TimeSeriesPredictor
+    from .train import PREDICTION_LENGTH
+    config = MODELS_CONFIG[unique_id]
+    hyperparams = dict(hyperparameters)
+    model_type = hyperparams.pop("model")
+    start = time.perf_counter()
+    try:
+        data = TimeSeriesDataFrame.from_data_frame(_worker_data, id_column="item_id", timestamp_column="timestamp")
+        # Même découpage que train.py : les 12 dernières semaines ne sont jamais vues pendant la recherche
+        train_data = data.slice_by_timestep(end_index=-PREDICTION_LENGTH)
+        predictor = TimeSeriesPredictor(
+            prediction_length=PREDICTION_LENGTH,
+            path=trial_path,
+            target=get_target_column(config),
+            eval_metric="mean_wQuantileLoss",
+            quantile_levels=[0.1, 0.5, 0.9],
+            known_covariates_names=config.get("known_covariates", []),
+            verbosity=0
+        )
+        predictor.fit(train_data, hyperparameters={model_type: hyperparams}, time_limit=time_limit)
+        # Score de validation AutoGluon (fenêtre de fin de train_data), positif : plus petit = meilleur
+        loss = -float(predictor.leaderboard(silent=True)["score_val"].max())
+        return {"loss": loss, "error": None, "duration_s": round(time.perf_counter() - start, 1)}
+    except TRIAL_ERRORS as e:
+        print(f"🛑 Échec de l'essai {trial_path}: {e}\n{traceback.format_exc()}")
+        return {"loss": float("inf"), "error": str(e), "duration_s": round(time.perf_counter() - start, 1)}
+
+
+# --- Recherche (processus parent) ---
+
+def _tell_optuna(study, trial: dict):
+    if study is None:
+        return
+    if trial["status"] == "complete":
+        study.tell(trial["optuna_trial"], trial["losses"][-1])
+    elif trial["status"] == "pruned":
+        study.tell(trial["optuna_trial"], state=optuna.trial.TrialState.PRUNED)
+    else:
+        study.tell(trial["optuna_trial"], state=optuna.trial.TrialState.FAIL)
+
+def tune_model(unique_id: str, n_trials: int = 27, time_budget: float = None, cpus: int = None,
+               n_parallel: int = None, eta: int = DEFAULT_ETA, n_rungs: int = DEFAULT_RUNGS, seed: int = 0) -> dict:
+    """
+    Recherche d'hyperparamètres d'un modèle de MODELS_CONFIG dans l'espace de son type de modèle.
+
+    Les données sont préparées une fois (feature store) et transmises une fois à chaque processus.
+    Les essais tournent en parallèle dans `n_parallel` processus qui se partagent `cpus` cœurs,
+    par groupes de eta^(n_rungs-1) configurations élaguées par halving successif sur leur score
+    de validation intermédiaire. Optuna (TPE) propose les configurations s'il est installé, sinon
+    elles sont tirées au hasard. Aucun essai n'est lancé au-delà de `time_budget` secondes.
+
+    Retourne le rapport de recherche (meilleure config proposée, essais) ; le prédicteur du
+    meilleur essai reste dans son dossier (`best_model_path`).
+    """
+    if unique_id not in MODELS_CONFIG:
+        raise ValueError(f"ID de modèle '{unique_id}' non trouvé.")
+    config = MODELS_CONFIG[unique_id]
+    base_hyperparameters = dict(config.get("hyperparameters") or {})
+    model_type = base_hyperparameters.get("model")
+    if model_type not in TUNING_SEARCH_SPACES:
+        raise ValueError(f"Aucun espace de recherche pour le modèle '{model_type}' de '{unique_id}'.")
+    space = TUNING_SEARCH_SPACES[model_type]
+
+    prepared = filter_training_window(get_prepared_data(unique_id, config), config).reset_index(drop=True)
+
+    cpu_count = os.cpu_count() or 1
+    cpus = max(1, min(cpus or TUNING_MAX_CPUS or cpu_count, cpu_count))
+    n_parallel = max(1, min(n_parallel or TUNING_MAX_PARALLEL_TRIALS or cpus, cpus))
+    threads_per_trial = max(1, cpus // n_parallel)
+    time_budget = time_budget or TUNING_TIME_BUDGET_SECONDS
+    rung_epochs = get_rung_epochs(base_hyperparameters.get("max_epochs", 100), eta, n_rungs)
+    bracket_size = eta ** (n_rungs - 1)
+
+    study = optuna.create_study(direction="minimize", sampler=optuna.samplers.TPESampler(seed=seed)) if optuna is not None else None
+    rng = np.random.default_rng(seed)
+    work_dir = MODELS_ROOT / "tuning" / unique_id
+    shutil.rmtree(work_dir, ignore_errors=True)
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"--- Recherche d'hyperparamètres pour {unique_id} ({model_type}) : {n_trials} essais, "
+          f"{n_parallel} en parallèle x {threads_per_trial} thread(s), paliers {rung_epochs} époques, "
+          f"budget {time_budget:.0f}s, {'Optuna TPE' if study else 'tirage aléatoire'} ---")
+
+    start = time.monotonic()
+    deadline = start + time_budget
+    trials, best = [], None
+    previous_env = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+    os.environ.update({var: str(threads_per_trial) for var in THREAD_ENV_VARS})
+    try:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=n_parallel, mp_context=context,
+                                 initializer=_init_tuning_worker, initargs=(threads_per_trial, prepared)) as executor:
+            while len(trials) < n_trials and time.monotonic() < deadline:
+                bracket = []
+                for _ in range(min(bracket_size, n_trials - len(trials))):
+                    optuna_trial = study.ask() if study is not None else None
+                    trial = {"number": len(trials), "params": sample_params(space, rng, optuna_trial), "losses": [],
+                             "status": "running", "error": None, "path": None, "optuna_trial": optuna_trial}
+                    trials.append(trial)
+                    bracket.append(trial)
+
+                survivors = bracket
+                for rung, epochs in enumerate(rung_epochs):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not survivors:
+                        break
+                    futures = {}
+                    for trial in survivors:
+                        trial_path = work_dir / f"trial_{trial['number']}_rung_{rung}"
+                        hyperparameters = {**base_hyperparameters, **trial["params"], "max_epochs": epochs}
+                        futures[executor.submit(_run_trial, unique_id, hyperparameters, str(trial_path), remaining)] = (trial, trial_path)
+                    for future in as_completed(futures):
+                        trial, trial_path = futures[future]
+                        try:
+                            result = future.result()
+                        except BrokenProcessPool as e:
+                            # Processus enfant tué (mémoire, signal...) : l'essai est compté comme échoué
+                            result = {"loss": float("inf"), "error": repr(e)}
+                        if trial["path"] is not None:
+                            shutil.rmtree(trial["path"], ignore_errors=True)
+                        trial["path"], trial["error"] = trial_path, result["error"]
+                        trial["losses"].append(result["loss"])
+                        if trial["optuna_trial"] is not None and np.isfinite(result["loss"]):
+                            trial["optuna_trial"].report(result["loss"], step=epochs)
+
+                    ranked = sorted(survivors, key=lambda t: t["losses"][-1])
+                    last_rung = rung == len(rung_epochs) - 1
+                    n_keep = len(ranked) if last_rung else max(1, len(ranked) // eta)
+                    for position, trial in enumerate(ranked):
+                        if not np.isfinite(trial["losses"][-1]):
+                            trial["status"] = "failed"
+                        elif position >= n_keep:
+                            trial["status"] = "pruned"
+                        elif last_rung:
+                            trial["status"] = "complete"
+                        if trial["status"] in ("failed", "pruned"):
+                            shutil.rmtree(trial["path"], ignore_errors=True)
+                    survivors = [trial for trial in ranked[:n_keep] if trial["status"] == "running"]
+
+                for trial in bracket:
+                    if trial["status"] == "running":
+                        # Budget de temps épuisé avant le dernier palier
+                        trial["status"] = "interrupted"
+                        if trial["path"] is not None:
+                            shutil.rmtree(trial["path"], ignore_errors=True)
+                    if trial["status"] == "complete":
+                        if best is None or trial["losses"][-1] < best["losses"][-1]:
+                            if best is not None:
+                                shutil.rmtree(best["path"], ignore_errors=True)
+                            best = trial
+                        else:
+                            shutil.rmtree(trial["path"], ignore_errors=True)
+                    _tell_optuna(study, trial)
+                best_loss = f"{best['losses'][-1]:.4f}" if best else "-"
+                print(f"Groupe terminé : {len(trials)}/{n_trials} essais, meilleure perte {best_loss}")
+    finally:
+        for var, value in previous_env.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+    report = {
+        "unique_id": unique_id,
+        "model_type": model_type,
+        "sampler": "optuna-tpe" if study is not None else "random",
+        "rung_epochs": rung_epochs,
+        "cpus": cpus,
+        "parallel_trials": n_parallel,
+        "duration_s": round(time.monotonic() - start, 1),
+        "best_trial": best["number"] if best else None,
+        "best_loss": best["losses"][-1] if best else None,
+        "best_params": best["params"] if best else None,
+        "proposed_hyperparameters": {**base_hyperparameters, **best["params"]} if best else None,
+        "best_model_path": str(best["path"]) if best else None,
+        "trials": [
+            {key: trial[key] for key in ("number", "params", "losses", "status", "error")}
+            for trial in trials
+        ],
+    }
+    return report
+
+def save_tuning_report(report: dict) -> str:
+    """Écrit la config proposée et le détail des essais dans TUNING_RESULTS_ROOT/<unique_id>.json."""
+    TUNING_RESULTS_ROOT.mkdir(parents=True, exist_ok=True)
+    path = TUNING_RESULTS_ROOT / f"{report['unique_id']}.json"
+    serializable = {**report, "trials": [
+        {**trial, "losses": [loss if np.isfinite(loss) else None for loss in trial["losses"]]} for trial in report["trials"]
+    ]}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(serializable, f, indent=2, ensure_ascii=False)
+    return str(path)
+
+def upload_best_model(report: dict):
+    """Enregistre sur Comet le seul prédicteur du meilleur essai, sous le nom de modèle habituel."""
+    import comet_ml
+    from .model_store import get_model_name
+    unique_id = report["unique_id"]
+    # Même dossier que train.py : le registre retrouve le prédicteur sous temp_<unique_id>
+    local_model_path = MODELS_ROOT / f"temp_{unique_id}"
+    shutil.rmtree(local_model_path, ignore_errors=True)
+    shutil.copytree(report["best_model_path"], local_model_path)
+
+    experiment = comet_ml.Experiment(project_name=os.environ.get("COMET_PROJECT_NAME"))
+    experiment.set_name(f"Tuning_{unique_id}")
+    experiment.log_parameters({**MODELS_CONFIG[unique_id], "hyperparameters": report["proposed_hyperparameters"]})
+    experiment.log_metric("val_mean_wQuantileLoss", report["best_loss"])
+    experiment.log_other("tuning_trials", len(report["trials"]))
+    experiment.log_model(name=get_model_name(unique_id), file_or_folder=str(local_model_path))
+    experiment.end()
+
+def print_tuning_report(report: dict):
+    print(f"\n--- Rapport de recherche pour {report['unique_id']} ({report['sampler']}, {report['duration_s']} s) ---")
+    print(f"{'Essai':>5} {'Statut':<12} {'Pertes par palier':<30} Paramètres")
+    for trial in report["trials"]:
+        losses = " / ".join(f"{loss:.4f}" if np.isfinite(loss) else "échec" for loss in trial["losses"]) or "-"
+        print(f"{trial['number']:>5} {trial['status']:<12} {losses:<30} {trial['params']}")
+    if report["best_trial"] is None:
+        print("\n⚠️ Aucun essai n'a atteint le dernier palier dans le budget imparti.")
+    else:
+        print(f"\n✅ Meilleur essai : {report['best_trial']} (perte {report['best_loss']:.4f})")
+        print(f"Hyperparamètres proposés : {report['proposed_hyperparameters']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recherche parallèle d'hyperparamètres avec élagage des essais.")
+    parser.add_argument("--category", required=True, help="ID unique du modèle à optimiser")
+    parser.add_argument("--trials", type=int, default=27, help="Nombre total d'essais")
+    parser.add_argument("--time_budget", type=float, default=None, help="Durée totale maximale, en secondes")
+    parser.add_argument("--cpus", type=int, default=None, help="Nombre total de cœurs alloués à la recherche")
+    parser.add_argument("--jobs", type=int, default=None, help="Nombre d'essais simultanés")
+    parser.add_argument("--eta", type=int, default=DEFAULT_ETA, help="Facteur d'élagage entre deux paliers")
+    parser.add_argument("--rungs", type=int, default=DEFAULT_RUNGS, help="Nombre de paliers d'époques")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no_upload", action="store_true", help="N'enregistre pas le meilleur modèle sur Comet")
+    args = parser.parse_args()
+
+    report = tune_model(args.category, n_trials=args.trials, time_budget=args.time_budget, cpus=args.cpus,
+                        n_parallel=args.jobs, eta=args.eta, n_rungs=args.rungs, seed=args.seed)
+    print_tuning_report(report)
+    print(f"✅ Config proposée écrite dans {save_tuning_report(report)}.")
+    if report["best_trial"] is None:
+        raise SystemExit(1)
+    if not args.no_upload:
+        print("--- Sauvegarde du meilleur modèle sur Comet ML ---")
+        upload_best_model(report)
@@ -0,0 +1,17 @@
+# Fichier: service-ia-python/app/workers.py
+
+import os
+
+# Bibliothèques de calcul dont le nombre de threads est fixé par variable d'environnement
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS"]
+
+
+def init_training_worker(threads_per_job: int):
+    """Limite les threads de calcul du processus pour éviter la sursouscription des cœurs."""
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads_per_job)
+    try:
+        import torch
+        torch.set_num_threads(threads_per_job)
+    except ImportError:
+        pass
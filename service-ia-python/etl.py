@@ -1,122 +1,257 @@
 # Fichier: service-ia-python/etl.py 
 
+import io
+import re
 import pandas as pd
-from sqlalchemy import create_engine, text
-import os
 from dotenv import load_dotenv
 import argparse # On importe argparse pour gérer les arguments en ligne de commande
+from app.config import MODELS_CONFIG, ETL_CHUNK_SIZE, ETL_STAGING_WATERMARK_COLUMN, PRODUCT_LINE_TABLES
+from app.database import get_engine, get_statement, check_table_name
+from app.data_access import get_touched_weeks, refresh_weekly_rollup, rebuild_weekly_rollup
 
 load_dotenv()
 
-def run_etl_for_product_line(product_line_id: str, target_table: str):
+def run_etl_for_product_line(product_line_id: str, target_table: str, chunk_size: int = ETL_CHUNK_SIZE):
     """
     Extrait, transforme et charge les données pour une ligne de produit spécifique.
 
+    Les chargements ajoutent les quantités aux ventes existantes : seules les lignes de
+    'sales_staging' au-delà du watermark de la ligne produit sont traitées (voir
+    `run_incremental_etl`). Relancer l'ETL, ou alterner avec le mode --all_lines, ne compte
+    donc jamais deux fois une vente.
+
     Args:
         product_line_id (str): L'identifiant de la ligne de produit à traiter (ex: '01').
         target_table (str): Le nom de la table de destination dans Supabase (ex: 'sales').
     """
-    # Connexion à la base de données (inchangée)
-    db_password = os.environ.get("DB_PASSWORD")
-    db_host = os.environ.get("DB_HOST")
-    db_user = os.environ.get("DB_USER")
-    db_name = os.environ.get("DB_NAME")
-    db_port = os.environ.get("DB_PORT")
-    connection_str = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-    engine = create_engine(connection_str)
-
-    print(f"--- DÉBUT DU PROCESSUS ETL POUR LA LIGNE PRODUIT '{product_line_id}' ---")
-    
-    # 1. Extraction des données brutes
-    print("Extraction des données depuis 'sales_staging'...")
-    try:
-        df_raw = pd.read_sql("SELECT * FROM sales_staging", engine)
-    except Exception as e:
-        print(f"Erreur lors de la lecture de la table 'sales_staging' : {e}")
-        return
+    if PRODUCT_LINE_TABLES.get(product_line_id) != check_table_name(target_table):
+        raise ValueError(f"La ligne produit '{product_line_id}' alimente '{PRODUCT_LINE_TABLES.get(product_line_id)}', pas '{target_table}'.")
+    run_incremental_etl([product_line_id], chunk_size=chunk_size)
 
-    if df_raw.empty:
-        print("Aucune nouvelle donnée de vente à traiter.")
-        return
 
-    # 2. Transformation
-    print(f"Transformation de {len(df_raw)} lignes brutes...")
-    
-    # On filtre sur la ville de PARIS et la ligne de produit demandée
-    df_filtered = df_raw[
-        (df_raw['city'] == 'PARIS') & 
-        (df_raw['product_line'] == product_line_id)
-    ].copy()
-
-    if df_filtered.empty:
-        print(f"Aucune nouvelle donnée trouvée pour la ligne produit '{product_line_id}'.")
-        return
-
-    # Le reste de la transformation est identique
-    df_filtered['sale_date'] = pd.to_datetime(df_filtered['sale_date'], format='%Y%m%d', errors='coerce')
-    df_filtered['qty_sold'] = pd.to_numeric(df_filtered['qty_sold'], errors='coerce').fillna(0).astype(int)
-
-    df_agg = df_filtered.groupby(['sale_date', 'category1'])['qty_sold'].sum().reset_index()
-    df_agg['qty_sold'] = df_agg['qty_sold'].clip(lower=0)
-    
-    # L'item_id est construit de la même manière pour les deux lignes
+# ==============================================================================
+# --- MODE STREAMING : lecture par blocs, filtres en SQL, chargement par COPY ---
+# ==============================================================================
+
+def aggregate_staging_chunk(df_chunk: pd.DataFrame, group_keys=('sale_date', 'category1')) -> pd.Series:
+    """Agrège un bloc de 'sales_staging' en ventes par (sale_date, category1), ou selon `group_keys`."""
+    df_chunk = df_chunk.copy()
+    df_chunk['sale_date'] = pd.to_datetime(df_chunk['sale_date'], format='%Y%m%d', errors='coerce')
+    df_chunk['qty_sold'] = pd.to_numeric(df_chunk['qty_sold'], errors='coerce').fillna(0).astype(int)
+    return df_chunk.groupby(list(group_keys))['qty_sold'].sum()
+
+def merge_aggregates(accumulated, chunk_agg: pd.Series) -> pd.Series:
+    """Ajoute les sommes d'un bloc aux sommes déjà accumulées (un même jour peut chevaucher deux blocs)."""
+    if accumulated is None:
+        return chunk_agg
+    return accumulated.add(chunk_agg, fill_value=0).astype(int)
+
+def finalize_aggregates(aggregated: pd.Series) -> pd.DataFrame:
+    """Met les sommes accumulées au format des tables de ventes (item_id, timestamp, qty_sold)."""
+    df_agg = aggregated.clip(lower=0).reset_index()
     df_agg['item_id'] = 'category1_' + df_agg['category1'].astype(str)
-    
     df_final = df_agg.rename(columns={'sale_date': 'timestamp'})
-    df_sorted = df_final[['item_id', 'timestamp', 'qty_sold']].sort_values(by=['item_id', 'timestamp'])
-    
-    df_to_load = df_sorted.dropna()
-    print(f"{len(df_to_load)} lignes propres prêtes à être chargées dans la table '{target_table}'.")
-
-    # 3. Chargement
-    if not df_to_load.empty:
-        print(f"Chargement des données dans la table '{target_table}'...")
-        try:
-            # On utilise une table temporaire pour éviter les conflits
-            df_to_load.to_sql(name='sales_temp', con=engine, if_exists='replace', index=False)
-            
-            with engine.connect() as conn:
-                # La requête d'insertion est maintenant dynamique pour utiliser la bonne table cible
-                insert_query = f"""
-                    INSERT INTO {target_table} (item_id, "timestamp", qty_sold)
-                    SELECT item_id, "timestamp", qty_sold FROM sales_temp
-                    ON CONFLICT (item_id, "timestamp") 
-                    DO UPDATE SET qty_sold = {target_table}.qty_sold + EXCLUDED.qty_sold;
-                """
-                conn.execute(text(insert_query))
-                conn.execute(text("DROP TABLE sales_temp;"))
-                conn.commit()
-            
-            print("✅ Chargement réussi.")
-            
-            # Optionnel : vider la table de staging après traitement
-            # À décommenter avec prudence en production
-            # with engine.connect() as conn:
-            #     conn.execute(text("TRUNCATE TABLE sales_staging;"))
-            #     conn.commit()
-            # print("Table de staging vidée.")
-
-        except Exception as e:
-            print(f"🛑 Erreur lors du chargement des données : {e}")
-
-    print(f"--- FIN DU PROCESSUS ETL POUR LA LIGNE PRODUIT '{product_line_id}' ---")
+    return df_final[['item_id', 'timestamp', 'qty_sold']].sort_values(by=['item_id', 'timestamp']).dropna()
+
+def copy_into_temp_table(conn, df_to_load: pd.DataFrame, temp_table: str):
+    """
+    Charge un DataFrame dans une table temporaire (non journalisée, supprimée au commit)
+    via COPY, beaucoup plus rapide que les INSERT générés par `to_sql`.
+    """
+    conn.execute(get_statement(f"""
+        CREATE TEMPORARY TABLE {temp_table} (
+            item_id TEXT NOT NULL,
+            "timestamp" TIMESTAMP NOT NULL,
+            qty_sold BIGINT NOT NULL
+        ) ON COMMIT DROP;
+    """))
+    buffer = io.StringIO()
+    df_to_load.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d')
+    buffer.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY {temp_table} (item_id, "timestamp", qty_sold) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+
+def upsert_aggregates(conn, df_to_load: pd.DataFrame, target_table: str, temp_table: str = "sales_temp_stream"):
+    """
+    Ajoute les ventes agrégées à la table cible (COPY puis upsert) et met à jour le cumul
+    hebdomadaire, dans la transaction de `conn`. Retourne la première et la dernière semaine touchées.
+    """
+    target_table = check_table_name(target_table)
+    copy_into_temp_table(conn, df_to_load, temp_table)
+    conn.execute(get_statement(f"""
+        INSERT INTO {target_table} (item_id, "timestamp", qty_sold)
+        SELECT item_id, "timestamp", qty_sold FROM {temp_table}
+        ON CONFLICT (item_id, "timestamp")
+        DO UPDATE SET qty_sold = {target_table}.qty_sold + EXCLUDED.qty_sold;
+    """))
+    first_week, last_week = get_touched_weeks(df_to_load['timestamp'])
+    refresh_weekly_rollup(conn, target_table, df_to_load['item_id'].unique(), first_week, last_week)
+    return first_week, last_week
+
+def run_streaming_etl_for_product_line(product_line_id: str, target_table: str, chunk_size: int = ETL_CHUNK_SIZE):
+    """
+    Variante à mémoire constante : c'est désormais le fonctionnement de tous les modes (filtres
+    appliqués par Postgres, curseur serveur bloc par bloc, chargement par COPY, watermark).
+    Conservée pour l'option --streaming.
+    """
+    run_etl_for_product_line(product_line_id, target_table, chunk_size=chunk_size)
 
 
+# ==============================================================================
+# --- MODE INCRÉMENTAL : une seule lecture du staging pour toutes les lignes ---
+# ==============================================================================
+
+WATERMARK_TABLE = "etl_watermarks"
+
+def ensure_watermark_table(conn):
+    conn.execute(get_statement(f"""
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            source TEXT PRIMARY KEY,
+            last_value TEXT NOT NULL,
+            rows_processed BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+    """))
+
+# Watermark par ligne produit ; "sales_staging" est le watermark commun des versions précédentes
+LEGACY_WATERMARK_SOURCE = "sales_staging"
+
+def get_watermark_source(product_line_id: str) -> str:
+    return f"sales_staging:{product_line_id}"
+
+def run_incremental_etl_all_lines(chunk_size: int = ETL_CHUNK_SIZE, watermark_column: str = ETL_STAGING_WATERMARK_COLUMN):
+    """Traite en une seule passe les nouvelles lignes de 'sales_staging' pour toutes les lignes produit."""
+    run_incremental_etl(list(PRODUCT_LINE_TABLES), chunk_size=chunk_size, watermark_column=watermark_column)
+
+def run_incremental_etl(product_lines: list, chunk_size: int = ETL_CHUNK_SIZE, watermark_column: str = ETL_STAGING_WATERMARK_COLUMN):
+    """
+    Traite en une seule passe les nouvelles lignes de 'sales_staging' des lignes produit données.
+
+    Seules les lignes dont `watermark_column` dépasse le watermark enregistré pour leur ligne produit
+    sont lues (jusqu'au maximum observé au début du run), puis routées vers la table de leur ligne.
+    Lecture des watermarks, du maximum et des lignes, chargements et avancement des watermarks se
+    font dans une seule transaction REPEATABLE READ : tout est lu sur le même instantané, et un run
+    relancé après un échec repart des mêmes watermarks. Les ventes ne sont donc jamais comptées deux
+    fois, quel que soit le mode (--product_line, --streaming ou --all_lines) qui les charge.
+
+    La colonne doit être strictement croissante dans l'ordre de validation des lignes (voir
+    ETL_STAGING_WATERMARK_COLUMN) : une ligne validée après le run avec une valeur inférieure ou
+    égale au watermark serait ignorée définitivement.
+    """
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", watermark_column):
+        raise ValueError(f"Nom de colonne de watermark invalide : '{watermark_column}'.")
+    unknown = [line for line in product_lines if line not in PRODUCT_LINE_TABLES]
+    if unknown:
+        raise ValueError(f"Ligne(s) produit inconnue(s) : {unknown}. Valeurs possibles : {list(PRODUCT_LINE_TABLES)}")
+    engine = get_engine()
+    print(f"--- DÉBUT DU PROCESSUS ETL INCRÉMENTAL POUR LES LIGNES PRODUIT {product_lines} ---")
+
+    with engine.begin() as conn:
+        ensure_watermark_table(conn)
+
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="REPEATABLE READ")
+        with conn.begin():
+            stored = dict(conn.execute(
+                get_statement(f"SELECT source, last_value FROM {WATERMARK_TABLE} WHERE source = ANY(:sources);"),
+                {"sources": [LEGACY_WATERMARK_SOURCE] + [get_watermark_source(line) for line in product_lines]},
+            ).all())
+            last_values = {line: stored.get(get_watermark_source(line), stored.get(LEGACY_WATERMARK_SOURCE))
+                           for line in product_lines}
+            high_value = conn.execute(
+                get_statement(f"SELECT MAX({watermark_column}) FROM sales_staging WHERE product_line = ANY(:product_lines);"),
+                {"product_lines": product_lines},
+            ).scalar()
+
+            if high_value is None or all(last_value == str(high_value) for last_value in last_values.values()):
+                print(f"Aucune nouvelle ligne dans 'sales_staging' depuis les watermarks {last_values}.")
+                return
+            print(f"Watermark '{watermark_column}' : {last_values} -> {high_value}")
+
+            params = {"city": "PARIS", "high_value": str(high_value)}
+            line_filters = []
+            for position, line in enumerate(product_lines):
+                params[f"line_{position}"] = line
+                if last_values[line] is None:
+                    line_filters.append(f"product_line = :line_{position}")
+                else:
+                    params[f"last_{position}"] = last_values[line]
+                    line_filters.append(f"(product_line = :line_{position} AND {watermark_column} > :last_{position})")
+            query = get_statement(f"""
+                SELECT product_line, sale_date, category1, qty_sold
+                FROM sales_staging
+                WHERE city = :city AND {watermark_column} <= :high_value AND ({" OR ".join(line_filters)});
+            """).execution_options(stream_results=True, max_row_buffer=chunk_size)
+
+            aggregated, rows_by_line = None, dict.fromkeys(product_lines, 0)
+            for df_chunk in pd.read_sql(query, conn, params=params, chunksize=chunk_size):
+                chunk_agg = aggregate_staging_chunk(df_chunk, group_keys=('product_line', 'sale_date', 'category1'))
+                aggregated = merge_aggregates(aggregated, chunk_agg)
+                for line, count in df_chunk['product_line'].value_counts().items():
+                    rows_by_line[line] += int(count)
+            print(f"{sum(rows_by_line.values())} nouvelles lignes lues en une seule passe.")
+
+            for product_line_id in product_lines:
+                target_table = PRODUCT_LINE_TABLES[product_line_id]
+                if aggregated is None or product_line_id not in aggregated.index.get_level_values('product_line'):
+                    print(f"Ligne produit '{product_line_id}' : aucune nouvelle vente.")
+                    continue
+                df_to_load = finalize_aggregates(aggregated.xs(product_line_id, level='product_line'))
+                first_week, last_week = upsert_aggregates(conn, df_to_load, target_table, temp_table=f"sales_temp_{product_line_id}")
+                print(f"✅ Ligne produit '{product_line_id}' : {len(df_to_load)} lignes chargées dans '{target_table}' "
+                      f"(semaines du {first_week.date()} au {last_week.date()}).")
+            for product_line_id in product_lines:
+                conn.execute(get_statement(f"""
+                    INSERT INTO {WATERMARK_TABLE} (source, last_value, rows_processed, updated_at)
+                    VALUES (:source, :last_value, :rows_processed, NOW())
+                    ON CONFLICT (source)
+                    DO UPDATE SET last_value = EXCLUDED.last_value,
+                                  rows_processed = {WATERMARK_TABLE}.rows_processed + EXCLUDED.rows_processed,
+                                  updated_at = NOW();
+                """), {"source": get_watermark_source(product_line_id), "last_value": str(high_value),
+                       "rows_processed": rows_by_line[product_line_id]})
+
+    print(f"--- FIN DU PROCESSUS ETL INCRÉMENTAL (watermark : {high_value}) ---")
+
 if __name__ == "__main__":
     # On met en place un système pour passer des arguments au script
     parser = argparse.ArgumentParser(description="ETL pour traiter les données de ventes.")
-    parser.add_argument("--product_line", required=True, help="ID de la ligne produit à traiter (ex: '01' ou '02').")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--product_line", help="ID de la ligne produit à traiter (ex: '01' ou '02').")
+    target.add_argument("--all_lines", action="store_true", help="Mode incrémental : une seule lecture du staging (nouvelles lignes uniquement) pour toutes les lignes produit.")
+    parser.add_argument("--rebuild_weekly", action="store_true", help="Reconstruit entièrement la table de cumul hebdomadaire de la ligne.")
+    parser.add_argument("--streaming", action="store_true", help="Conservée pour compatibilité : tous les modes lisent désormais par blocs au-delà du watermark.")
+    parser.add_argument("--chunk_size", type=int, default=ETL_CHUNK_SIZE, help="Nombre de lignes de staging lues par bloc en mode streaming.")
+    parser.add_argument("--refresh_forecasts", action="store_true", help="Recalcule ensuite les prévisions précalculées des modèles alimentés par les tables mises à jour.")
     args = parser.parse_args()
     
-    # On définit ici la correspondance entre l'ID et le nom de la table
-    config = {
-        "01": "sales",
-        "02": "sales_product_line_2"
-    }
+    # La correspondance entre l'ID de ligne produit et le nom de la table est dans app/config.py
+    config = PRODUCT_LINE_TABLES
     
-    if args.product_line in config:
+    if args.all_lines:
+        run_incremental_etl_all_lines(chunk_size=args.chunk_size)
+    elif args.product_line in config:
         target_table_name = config[args.product_line]
-        run_etl_for_product_line(args.product_line, target_table_name)
+        if args.rebuild_weekly:
+            print(f"Reconstruction du cumul hebdomadaire de '{target_table_name}'...")
+            with get_engine().begin() as conn:
+                rebuild_weekly_rollup(conn, target_table_name)
+            print("✅ Cumul hebdomadaire reconstruit.")
+        elif args.streaming:
+            run_streaming_etl_for_product_line(args.product_line, target_table_name, chunk_size=args.chunk_size)
+        else:
+            run_etl_for_product_line(args.product_line, target_table_name, chunk_size=args.chunk_size)
     else:
         print(f"Erreur : Ligne produit '{args.product_line}' non reconnue. "
-              f"Valeurs possibles : {list(config.keys())}")
\ No newline at end of file
+              f"Valeurs possibles : {list(config.keys())}")
+        raise SystemExit(1)
+
+    if args.refresh_forecasts:
+        # Import différé : AutoGluon n'est nécessaire que pour ce recalcul
+        from app.batch_forecast import run_batch_forecast
+        updated_tables = set(config.values()) if args.all_lines else {config[args.product_line]}
+        run_batch_forecast([uid for uid, model_config in MODELS_CONFIG.items()
+                            if model_config.get("source_table", "sales") in updated_tables])
\ No newline at end of file
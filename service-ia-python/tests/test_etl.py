@@ -0,0 +1,43 @@
+# Fichier: service-ia-python/tests/test_etl.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from etl import aggregate_staging_chunk, merge_aggregates, finalize_aggregates
+
+GROUP_KEYS = ('product_line', 'sale_date', 'category1')
+
+
+def _staging_rows(n_rows: int = 200) -> pd.DataFrame:
+    """Lignes de 'sales_staging' telles que lues par blocs : textes, quantités invalides et retours."""
+    rng = np.random.default_rng(0)
+    days = pd.date_range("2025-01-01", periods=10, freq="D").strftime("%Y%m%d")
+    qty = rng.integers(-2, 20, n_rows).astype(str).astype(object)
+    qty[::17] = "n/a"
+    return pd.DataFrame({
+        "product_line": rng.choice(["1", "2"], n_rows),
+        "sale_date": rng.choice(days, n_rows),
+        "category1": rng.choice(["01", "08", "CA"], n_rows),
+        "qty_sold": qty,
+    })
+
+def _aggregate_in_chunks(df: pd.DataFrame, chunk_size: int) -> pd.Series:
+    aggregated = None
+    for start in range(0, len(df), chunk_size):
+        aggregated = merge_aggregates(aggregated, aggregate_staging_chunk(df.iloc[start:start + chunk_size], group_keys=GROUP_KEYS))
+    return aggregated
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 199, 1000])
+def test_chunked_aggregation_matches_single_pass(chunk_size):
+    df = _staging_rows()
+    expected = aggregate_staging_chunk(df, group_keys=GROUP_KEYS)
+    chunked = _aggregate_in_chunks(df, chunk_size)
+
+    pd.testing.assert_series_equal(chunked.sort_index(), expected.sort_index(), check_dtype=False)
+    for line in ["1", "2"]:
+        pd.testing.assert_frame_equal(
+            finalize_aggregates(chunked.xs(line, level='product_line')).reset_index(drop=True),
+            finalize_aggregates(expected.xs(line, level='product_line')).reset_index(drop=True),
+            check_dtype=False,
+        )
@@ -0,0 +1,57 @@
+# Fichier: service-ia-python/tests/test_forecast_cache.py
+
+import types
+import pandas as pd
+import pytest
+from app import forecast_cache
+from app.forecast_cache import ForecastCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge monotone contrôlée par le test."""
+    fake = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(forecast_cache, "time", types.SimpleNamespace(monotonic=lambda: fake.now))
+    return fake
+
+def _forecast(value: float) -> pd.DataFrame:
+    return pd.DataFrame({"mean": [value, value + 1]})
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = ForecastCache(max_entries=10, ttl_seconds=60)
+    cache.put(("a", "1", (5,)), _forecast(1.0))
+    clock.now += 59
+    assert cache.get(("a", "1", (5,))) is not None
+    clock.now += 2
+    assert cache.get(("a", "1", (5,))) is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["evictions"] == 1
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ForecastCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", _forecast(1.0))
+    cache.put("b", _forecast(2.0))
+    cache.get("a")  # "b" devient le moins récemment utilisé
+    cache.put("c", _forecast(3.0))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_cached_forecasts_are_copies(clock):
+    cache = ForecastCache(max_entries=10, ttl_seconds=60)
+    original = _forecast(1.0)
+    cache.put("a", original)
+    original["mean"] = 0.0  # l'appelant modifie sa prévision après l'avoir mise en cache
+
+    served = cache.get("a")
+    served["mean"] = -1.0   # un appelant modifie la prévision reçue
+    assert cache.get("a")["mean"].tolist() == [1.0, 2.0]
+
+def test_invalidate_one_model(clock):
+    cache = ForecastCache(max_entries=10, ttl_seconds=60)
+    cache.put(("a", "1", (5,)), _forecast(1.0))
+    cache.put(("b", "1", (5,)), _forecast(2.0))
+    cache.invalidate("a")
+    assert cache.get(("a", "1", (5,))) is None
+    assert cache.get(("b", "1", (5,))) is not None
@@ -0,0 +1,58 @@
+# Fichier: service-ia-python/tests/test_forecast_store.py
+
+import json
+import pytest
+from app.config import FORECAST_STORE_TABLE
+from app import forecast_store as forecast_store_module
+from app.forecast_store import ForecastStore, WatermarkCache
+
+STORED_WATERMARK = ("2025-08-04 00:00:00+00:00", "1650")
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = ForecastStore(FORECAST_STORE_TABLE)
+    # Ligne telle que relue par `read` : le watermark a fait l'aller-retour JSON
+    row = {
+        "model_version": "1.2.0",
+        "data_watermark": tuple(json.loads(json.dumps(list(STORED_WATERMARK)))),
+        "computed_at": None,
+        "records": [{"timestamp": "2025-08-11T00:00:00", "mean": 4.0}],
+    }
+    monkeypatch.setattr(store, "read", lambda unique_id: row)
+    return store
+
+
+def test_fresh_when_version_and_watermark_match(store):
+    assert store.get_fresh("ligne1_category1_01", "1.2.0", STORED_WATERMARK) is not None
+    assert store.stats()["hits"] == 1
+
+def test_stale_after_new_data(store):
+    new_watermark = ("2025-08-11 00:00:00+00:00", "1657")
+    assert store.get_fresh("ligne1_category1_01", "1.2.0", new_watermark) is None
+    assert store.stats()["stale"] == 1
+
+def test_stale_after_new_model_version(store):
+    assert store.get_fresh("ligne1_category1_01", "1.3.0", STORED_WATERMARK) is None
+    assert store.stats()["stale"] == 1
+
+def test_watermark_is_read_once_per_check_interval(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(forecast_store_module.time, "monotonic", lambda: now[0])
+    reads = []
+    compute = lambda: reads.append(1) or STORED_WATERMARK
+    cache = WatermarkCache(check_seconds=60)
+
+    assert cache.get("ligne1_category1_01", compute) == STORED_WATERMARK
+    now[0] += 59
+    assert cache.get("ligne1_category1_01", compute) == STORED_WATERMARK
+    assert len(reads) == 1
+    now[0] += 2
+    cache.get("ligne1_category1_01", compute)
+    assert len(reads) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+def test_stored_watermark_replaces_cached_one():
+    cache = WatermarkCache(check_seconds=60)
+    cache.put("ligne1_category1_01", ["2025-08-11", "1657"])
+    assert cache.get("ligne1_category1_01", lambda: pytest.fail("watermark relu")) == ("2025-08-11", "1657")
@@ -0,0 +1,92 @@
+# Fichier: service-ia-python/tests/test_global_models.py
+
+import pytest
+from app import batch_forecast, global_models, predict
+from app.global_models import get_global_members, get_static_features
+
+MODELS = {
+    "l1_a": {"source_table": "sales", "category_id_in_file": "cat_a"},
+    "l1_b": {"source_table": "sales", "category_id_in_file": "cat_b"},
+    "l1_ca": {"source_table": "sales", "category_id_in_file": "cat_CA"},
+    "l2_a": {"source_table": "sales_ligne2", "category_id_in_file": "cat_a"},
+}
+GLOBALS = {
+    "l1_global": {"source_table": "sales", "exclude": ["l1_ca"]},
+    "l2_global": {"source_table": "sales_ligne2"},
+}
+
+
+@pytest.fixture
+def global_config(monkeypatch):
+    """Deux modèles globaux sur des tables distinctes, l'un excluant une catégorie."""
+    monkeypatch.setattr(global_models, "MODELS_CONFIG", MODELS)
+    monkeypatch.setattr(global_models, "GLOBAL_MODELS_CONFIG", GLOBALS)
+    monkeypatch.setattr(global_models, "GLOBAL_MODELS_ENABLED", True)
+    for module in (batch_forecast, predict):
+        monkeypatch.setattr(module, "MODELS_CONFIG", MODELS)
+    monkeypatch.setattr(batch_forecast, "GLOBAL_MODELS_CONFIG", GLOBALS)
+
+@pytest.fixture
+def fake_forecasts(monkeypatch):
+    """Remplace le calcul des prévisions : chaque appel est enregistré, les échecs sont simulés."""
+    calls, failing = [], set()
+
+    def compute_global(global_id):
+        calls.append(global_id)
+        if global_id in failing:
+            raise RuntimeError(f"échec de {global_id}")
+        return {uid: [{"mean": 1.0}] for uid in global_models.get_global_members(global_id)}
+
+    def compute_single(unique_id, donnees_hebdo=None):
+        calls.append(unique_id)
+        return [{"mean": 2.0}]
+
+    monkeypatch.setattr(predict, "compute_and_store_global_forecast", compute_global)
+    monkeypatch.setattr(predict, "compute_and_store_forecast", compute_single)
+    monkeypatch.setattr(predict, "get_fresh_forecast", lambda unique_id: None)
+    monkeypatch.setattr(predict, "get_weekly_data_for_configs", lambda configs: {})
+    return calls, failing
+
+
+def test_static_features_only_describe_the_category():
+    static = get_static_features("ligne1_global")
+    assert list(static.columns) == ["category"]
+    assert "category1_CA" in static.index
+    assert len(static) == len(get_global_members("ligne1_global"))
+
+def test_members_share_the_source_table_minus_exclusions(global_config):
+    assert get_global_members("l1_global") == ["l1_a", "l1_b"]
+    assert get_global_members("l2_global") == ["l2_a"]
+    assert global_models.get_global_model_id("l1_ca") is None
+    assert global_models.get_serving_model_ids() == ["l1_global", "l1_ca", "l2_global"]
+
+def test_static_features_are_indexed_by_item_id(global_config):
+    static = get_static_features("l1_global")
+    assert static.index.name == "item_id"
+    assert list(static.index) == ["cat_a", "cat_b"]
+    assert static.loc["cat_b", "category"] == "cat_b"
+    assert str(static["category"].dtype) == "category"
+
+def test_batch_job_predicts_each_global_model_once(global_config, fake_forecasts):
+    calls, _ = fake_forecasts
+    report = batch_forecast.run_batch_forecast(["l1_global", "l1_ca", "l2_a"])
+    assert [job["unique_id"] for job in report] == ["l1_a", "l1_b", "l1_ca", "l2_a"]
+    assert all(job["status"] == "success" for job in report)
+    assert calls == ["l1_global", "l1_ca", "l2_global"]
+
+def test_batch_job_reports_global_error_on_every_member(global_config, fake_forecasts):
+    calls, failing = fake_forecasts
+    failing.add("l1_global")
+    report = {job["unique_id"]: job for job in batch_forecast.run_batch_forecast(["l1_a", "l1_b", "l2_a"])}
+    assert calls == ["l1_global", "l2_global"]
+    assert report["l1_a"]["status"] == report["l1_b"]["status"] == "failed"
+    assert report["l1_a"]["error"] == report["l1_b"]["error"] == "échec de l1_global"
+    assert report["l2_a"]["status"] == "success"
+
+def test_api_batch_predicts_each_global_model_once(global_config, fake_forecasts):
+    calls, failing = fake_forecasts
+    failing.add("l2_global")
+    results, errors = predict.get_future_forecast_records_batch(["l1_a", "l1_b", "l2_a", "l1_ca"])
+    assert calls == ["l1_global", "l2_global", "l1_ca"]
+    assert sorted(results) == ["l1_a", "l1_b", "l1_ca"]
+    assert errors == {"l2_a": "échec de l2_global"}
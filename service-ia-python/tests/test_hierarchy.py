@@ -0,0 +1,93 @@
+# Fichier: service-ia-python/tests/test_hierarchy.py
+
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+from app import hierarchy
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+SHIPPED_SALES = ["ventes_paris_ligne1_par_categorie.csv", "ventes_paris_par_categorie.csv"]
+
+
+def _weekly(df_daily: pd.DataFrame) -> pd.DataFrame:
+    df_daily = df_daily.assign(timestamp=pd.to_datetime(df_daily['timestamp']))
+    return (df_daily.set_index('timestamp').groupby('item_id')['qty_sold']
+            .resample("W-MON").sum().reset_index())
+
+def _synthetic_weekly(n_weeks: int = 8) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    timestamps = pd.date_range("2024-01-01", periods=n_weeks, freq="W-MON")
+    children = {item: rng.integers(0, 50, n_weeks).astype(float) for item in ["cat_a", "cat_b", "cat_c"]}
+    children["total"] = sum(children.values())
+    return pd.DataFrame([
+        {"item_id": item, "timestamp": ts, "qty_sold": value}
+        for item, values in children.items() for ts, value in zip(timestamps, values)
+    ])
+
+def _predictions(item_id: str, means, spread: float = 2.0) -> pd.DataFrame:
+    timestamps = pd.date_range("2025-01-06", periods=len(means), freq="W-MON")
+    means = np.asarray(means, dtype=float)
+    index = pd.MultiIndex.from_arrays([[item_id] * len(means), timestamps], names=["item_id", "timestamp"])
+    return pd.DataFrame({"mean": means, "0.1": means - spread, "0.5": means, "0.9": means + spread}, index=index)
+
+@pytest.fixture
+def verified(monkeypatch):
+    """Active la prévision hiérarchique avec une hiérarchie déjà vérifiée."""
+    def _set(mapping: dict, method: str):
+        monkeypatch.setattr(hierarchy, "HIERARCHICAL_FORECASTS_ENABLED", True)
+        monkeypatch.setattr(hierarchy, "HIERARCHY_RECONCILIATION", method)
+        monkeypatch.setattr(hierarchy, "_verified_hierarchy", mapping)
+    return _set
+
+
+def test_coherent_history_passes():
+    weekly = _synthetic_weekly()
+    assert hierarchy.check_hierarchy_coherence(weekly, "total", ["cat_a", "cat_b", "cat_c"]) == []
+
+def test_incomplete_child_list_is_refused():
+    weekly = _synthetic_weekly()
+    problems = hierarchy.check_hierarchy_coherence(weekly, "total", ["cat_a", "cat_b"])
+    assert problems and "cat_c" in problems[0]
+
+def test_total_that_is_not_a_sum_is_refused():
+    weekly = _synthetic_weekly()
+    weekly.loc[weekly['item_id'] == "total", 'qty_sold'] += 3
+    problems = hierarchy.check_hierarchy_coherence(weekly, "total", ["cat_a", "cat_b", "cat_c"])
+    assert len(problems) == 1 and "diffère" in problems[0]
+
+@pytest.mark.parametrize("filename", SHIPPED_SALES)
+def test_shipped_ca_series_is_not_the_sum_of_categories(filename):
+    """Les séries `_CA` livrées ne sont pas la somme des catégories : aucune hiérarchie ne doit être activée."""
+    weekly = _weekly(pd.read_csv(DATA_DIR / filename))
+    children = [item for item in weekly['item_id'].unique() if item != "category1_CA"]
+    problems = hierarchy.check_hierarchy_coherence(weekly, "category1_CA", children)
+    assert problems and "diffère" in problems[-1]
+
+def test_incoherent_total_keeps_its_own_model(monkeypatch):
+    monkeypatch.setattr(hierarchy, "HIERARCHICAL_FORECASTS_ENABLED", True)
+    monkeypatch.setattr(hierarchy, "HIERARCHY_RECONCILIATION", "bottom_up")
+    monkeypatch.setattr(hierarchy, "HIERARCHY_CONFIG", {"ligne1_category1_CA": ["ligne1_category1_01"]})
+    monkeypatch.setattr(hierarchy, "_verified_hierarchy", None)
+    monkeypatch.setattr(hierarchy, "_verify_total", lambda total_id, children: ["écart"])
+    assert hierarchy.get_verified_hierarchy() == {}
+    assert not hierarchy.is_derived_total("ligne1_category1_CA")
+    assert hierarchy.get_hierarchy_total("ligne1_category1_CA") is None
+
+@pytest.mark.parametrize("method", ["bottom_up", "mint"])
+def test_reconciled_categories_sum_exactly(verified, method):
+    total_id, children = "ligne1_category1_CA", ["ligne1_category1_01", "ligne1_category1_08"]
+    verified({total_id: children}, method)
+    base = {
+        "ligne1_category1_01": _predictions("category1_01", [10, 12, 9]),
+        "ligne1_category1_08": _predictions("category1_08", [5, 4, 6], spread=4.0),
+        total_id: _predictions("category1_CA", [18, 15, 17], spread=3.0),
+    }
+    results = hierarchy.reconcile_forecasts(total_id, base, method)
+    total = results[total_id].to_numpy()
+    if method == "mint":
+        bottom = sum(results[child].to_numpy() for child in children)
+        np.testing.assert_allclose(total, bottom)
+        assert not np.allclose(results["ligne1_category1_01"].to_numpy(), base["ligne1_category1_01"].to_numpy())
+    else:
+        np.testing.assert_allclose(total, sum(base[child].to_numpy() for child in children))
@@ -0,0 +1,63 @@
+# Fichier: service-ia-python/tests/test_history_index.py
+
+import pandas as pd
+import pytest
+from app.data_access import WEEKLY_FREQ
+from app.history_index import WeeklyHistoryIndex
+
+ITEM_ID = "category1_01"
+CONFIG = {"category_id_in_file": ITEM_ID, "source_table": "sales"}
+
+
+class FakeSalesTable:
+    """Ventes journalières en mémoire, lues par l'index comme le ferait Postgres."""
+
+    def __init__(self, sales: dict):
+        self.sales = {pd.Timestamp(day): qty for day, qty in sales.items()}
+
+    def watermark(self, source_table, item_ids) -> tuple:
+        return max(self.sales), len(self.sales), float(sum(self.sales.values()))
+
+    def fetch(self, source_table, item_ids, since=None) -> dict:
+        df = pd.DataFrame({"timestamp": list(self.sales), "qty_sold": list(self.sales.values())})
+        if since is not None:
+            df = df[df['timestamp'] >= since]
+        weekly = df.set_index('timestamp').resample(WEEKLY_FREQ)['qty_sold'].sum().reset_index()
+        return {ITEM_ID: weekly}
+
+@pytest.fixture
+def indexed(monkeypatch):
+    table = FakeSalesTable({"2025-01-01": 1, "2025-01-08": 2, "2025-01-15": 4})
+    index = WeeklyHistoryIndex(check_seconds=0)
+    monkeypatch.setattr(WeeklyHistoryIndex, "_items_by_table", staticmethod(lambda: {"sales": [ITEM_ID]}))
+    monkeypatch.setattr(WeeklyHistoryIndex, "_get_table_watermark", staticmethod(table.watermark))
+    monkeypatch.setattr(index, "_fetch", table.fetch)
+    index.refresh()
+    return table, index
+
+def _indexed_weeks(index) -> list:
+    return index.get_weekly_sales_between(CONFIG, "2024-12-30", "2025-02-03")['qty_sold'].tolist()
+
+
+def test_new_weeks_are_read_incrementally(indexed):
+    table, index = indexed
+    table.sales[pd.Timestamp("2025-01-22")] = 8
+    index.refresh()
+    assert _indexed_weeks(index) == [1, 2, 4, 8]
+    assert index.stats()["incremental_loads"] == 1 and index.stats()["full_loads"] == 1
+
+def test_quantity_added_to_existing_day_triggers_reload(indexed):
+    table, index = indexed
+    # Upsert de l'ETL : quantité ajoutée à un jour déjà chargé, nombre de lignes inchangé
+    table.sales[pd.Timestamp("2025-01-08")] += 10
+    index.refresh()
+    assert _indexed_weeks(index) == [1, 12, 4]
+    assert index.stats()["full_loads"] == 2
+
+def test_backfill_arriving_with_newer_rows_triggers_reload(indexed):
+    table, index = indexed
+    table.sales[pd.Timestamp("2025-01-01")] += 5
+    table.sales[pd.Timestamp("2025-01-22")] = 8
+    index.refresh()
+    assert _indexed_weeks(index) == [6, 2, 4, 8]
+    assert index.stats()["full_loads"] == 2
@@ -0,0 +1,45 @@
+# Fichier: service-ia-python/tests/test_incremental.py
+
+import sys
+import types
+from pathlib import Path
+import pytest
+from app import incremental
+
+
+@pytest.fixture
+def autogluon_version(monkeypatch):
+    """Remplace le module autogluon.timeseries le temps d'un test pour en fixer la version."""
+    def _set(version: str):
+        module = types.ModuleType("autogluon.timeseries")
+        module.__version__ = version
+        monkeypatch.setitem(sys.modules, "autogluon", types.ModuleType("autogluon"))
+        monkeypatch.setitem(sys.modules, "autogluon.timeseries", module)
+    return _set
+
+
+def test_fine_tune_refused_on_other_autogluon_version(autogluon_version):
+    autogluon_version("1.5.0")
+    with pytest.raises(incremental.FineTuneUnsupportedError, match="1.5.0"):
+        incremental.check_fine_tune_support()
+
+def test_fine_tune_allowed_on_pinned_version(autogluon_version):
+    autogluon_version(incremental.SUPPORTED_AUTOGLUON_VERSION)
+    incremental.check_fine_tune_support()
+
+def test_pinned_version_matches_requirements():
+    with open(Path(__file__).resolve().parent.parent / "requirements.txt", encoding="utf-8") as f:
+        assert f"autogluon.timeseries=={incremental.SUPPORTED_AUTOGLUON_VERSION}" in f.read().split()
+
+def test_model_from_older_pipeline_is_refused(tmp_path):
+    incremental.write_training_metadata(tmp_path, {"pipeline_version": incremental.PIPELINE_VERSION - 1})
+    with pytest.raises(incremental.StalePipelineError, match="réentraînement"):
+        incremental.check_pipeline_version("category1_01", tmp_path)
+
+def test_model_without_metadata_is_refused(tmp_path):
+    with pytest.raises(incremental.StalePipelineError):
+        incremental.check_pipeline_version("category1_01", tmp_path)
+
+def test_model_from_current_pipeline_is_served(tmp_path):
+    incremental.write_training_metadata(tmp_path, {"pipeline_version": incremental.PIPELINE_VERSION})
+    incremental.check_pipeline_version("category1_01", tmp_path)
@@ -0,0 +1,75 @@
+# Fichier: service-ia-python/tests/test_inference_pool.py
+
+import asyncio
+import threading
+import pytest
+from app.inference_pool import InferencePool, PoolSaturatedError
+
+
+@pytest.fixture
+def pool():
+    pool = InferencePool(max_workers=2, max_pending=2, retry_after_seconds=7)
+    yield pool
+    pool.shutdown()
+
+def _blocking_call(release: threading.Event, calls: list):
+    """Fonction de calcul qui reste en cours jusqu'à `release`."""
+    def _fn(value):
+        calls.append(value)
+        release.wait(timeout=5)
+        return value * 2
+    return _fn
+
+
+def test_identical_requests_share_one_computation(pool):
+    release, calls = threading.Event(), []
+    fn = _blocking_call(release, calls)
+    first = pool.submit(("predict", "a"), fn, 21)
+    second = pool.submit(("predict", "a"), fn, 21)
+    assert second is first
+    release.set()
+
+    assert first.result(timeout=5) == second.result(timeout=5) == 42
+    assert calls == [21]
+    assert pool.stats()["coalesced"] == 1 and pool.stats()["submitted"] == 1
+
+def test_key_is_released_once_done(pool):
+    release, calls = threading.Event(), []
+    release.set()
+    fn = _blocking_call(release, calls)
+    pool.submit("a", fn, 1).result(timeout=5)
+    pool.submit("a", fn, 1).result(timeout=5)
+    assert calls == [1, 1]
+
+def test_saturated_pool_rejects_with_retry_after(pool):
+    release, calls = threading.Event(), []
+    fn = _blocking_call(release, calls)
+    futures = [pool.submit(key, fn, 1) for key in ("a", "b")]
+    with pytest.raises(PoolSaturatedError) as excinfo:
+        pool.submit("c", fn, 1)
+    assert excinfo.value.retry_after_seconds == 7
+    # Une requête identique à un calcul en cours est encore acceptée
+    assert pool.submit("a", fn, 1) is futures[0]
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+    assert pool.stats()["rejected"] == 1 and pool.stats()["in_flight"] == 0
+
+def test_saturated_pool_answers_503(pool, monkeypatch):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("slowapi")
+    from fastapi import HTTPException
+    from app import main
+
+    release, calls = threading.Event(), []
+    fn = _blocking_call(release, calls)
+    monkeypatch.setattr(main, "inference_pool", pool)
+    futures = [pool.submit(key, fn, 1) for key in ("a", "b")]
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(main.run_in_pool("c", fn, 1))
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers == {"Retry-After": "7"}
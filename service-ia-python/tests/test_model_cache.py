@@ -0,0 +1,71 @@
+# Fichier: service-ia-python/tests/test_model_cache.py
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.model_cache import PredictorCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictorCache(max_bytes=100)
+    cache.put("a", "1", "pred_a", 40)
+    cache.put("b", "1", "pred_b", 40)
+    assert cache.get("a", "1") == "pred_a"  # "b" devient le moins récemment utilisé
+    cache.put("c", "1", "pred_c", 40)
+
+    assert cache.get("b", "1") is None
+    assert cache.get("a", "1") == "pred_a" and cache.get("c", "1") == "pred_c"
+    assert cache.current_bytes == 80
+    assert cache.stats()["evictions"] == 1
+
+def test_oversized_predictor_is_kept_alone():
+    cache = PredictorCache(max_bytes=100)
+    cache.put("a", "1", "pred_a", 40)
+    cache.put("b", "1", "pred_b", 150)
+    assert cache.get("a", "1") is None
+    assert cache.get("b", "1") == "pred_b"
+
+def test_new_version_evicts_the_previous_one():
+    cache = PredictorCache(max_bytes=1000)
+    evicted = []
+    cache.put("a", "1", "pred_a1", 40, on_evict=lambda: evicted.append("a1"))
+    cache.put("b", "1", "pred_b1", 40)
+    cache.put("a", "2", "pred_a2", 40)
+
+    assert cache.get("a", "1") is None
+    assert cache.get("a", "2") == "pred_a2"
+    assert cache.get("b", "1") == "pred_b1"
+    assert evicted == ["a1"]
+    assert cache.current_bytes == 80
+
+def test_concurrent_requests_load_the_model_once():
+    cache = PredictorCache(max_bytes=1000)
+    loads = []
+    start = threading.Barrier(8)
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.05)  # chargement lent : les autres threads attendent le verrou de la clé
+        return object(), 10, None
+
+    def request():
+        start.wait()
+        return cache.get_or_load("a", "1", loader)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        predictors = list(executor.map(lambda _: request(), range(8)))
+
+    assert len(loads) == 1
+    assert all(predictor is predictors[0] for predictor in predictors)
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 7
+
+def test_failed_load_is_retried():
+    cache = PredictorCache(max_bytes=1000)
+
+    def failing_loader():
+        raise OSError("téléchargement impossible")
+
+    with pytest.raises(OSError):
+        cache.get_or_load("a", "1", failing_loader)
+    assert cache.get_or_load("a", "1", lambda: ("pred_a", 10, None)) == "pred_a"
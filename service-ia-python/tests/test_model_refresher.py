@@ -0,0 +1,66 @@
+# Fichier: service-ia-python/tests/test_model_refresher.py
+
+import gc
+import weakref
+from app.model_cache import PredictorCache
+from app.model_refresher import ModelRefresher
+
+
+class FakePredictor:
+    pass
+
+class FakeRegistry:
+    def __init__(self, versions: dict):
+        self.versions = versions
+
+    def latest_version(self, unique_id: str) -> str:
+        return self.versions[unique_id]
+
+
+def test_evicted_predictor_is_not_kept_alive_by_refresher():
+    cache = PredictorCache(max_bytes=100)
+    loaded = {}
+
+    def warm(unique_id, version):
+        def _load():
+            loaded[unique_id] = predictor = FakePredictor()
+            return predictor, 80, None
+        return cache.get_or_load(unique_id, version, _load)
+
+    refresher = ModelRefresher(["a", "b"], FakeRegistry({"a": "1", "b": "1"}), warm, interval_seconds=60)
+    refresher.refresh_one("a")
+    first = weakref.ref(loaded.pop("a"))
+    # Le second modèle ne tient pas avec le premier : "a" est évincé du cache
+    refresher.refresh_one("b")
+    gc.collect()
+
+    assert first() is None
+    assert refresher.get_current_version("a") == "1"
+    assert refresher.status()["versions"] == {"a": "1", "b": "1"}
+
+def test_new_version_is_prefetched_through_cache():
+    cache = PredictorCache(max_bytes=1000)
+    registry = FakeRegistry({"a": "1"})
+    warm = lambda uid, version: cache.get_or_load(uid, version, lambda: (FakePredictor(), 10, None))
+    refresher = ModelRefresher(["a"], registry, warm, interval_seconds=60)
+
+    assert refresher.refresh_one("a")
+    assert not refresher.refresh_one("a")
+    registry.versions["a"] = "2"
+    assert refresher.refresh_one("a")
+    assert cache.get("a", "2") is not None
+    assert refresher.get_current_version("a") == "2"
+
+def test_model_ids_are_resolved_on_first_pass_only():
+    calls = []
+
+    def get_model_ids():
+        calls.append(1)
+        return ["a"]
+
+    refresher = ModelRefresher(get_model_ids, FakeRegistry({"a": "1"}), lambda uid, version: None, interval_seconds=60)
+    assert calls == []
+    refresher.refresh_all()
+    refresher.refresh_all()
+    assert calls == [1]
+    assert refresher.get_current_version("a") == "1"
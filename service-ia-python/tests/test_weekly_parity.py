@@ -0,0 +1,106 @@
+# Fichier: service-ia-python/tests/test_weekly_parity.py
+
+import os
+import pandas as pd
+import pytest
+from app import database
+from app.covariates import covariate_cache
+from app.data_access import WEEKLY_FREQ, aggregate_weekly, get_weekly_data
+
+# Base Postgres jetable : les tables sales, weather, ipc et household_confidence y sont recréées
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+ITEM_ID = "category1_01"
+CONFIG = {"category_id_in_file": ITEM_ID, "source_table": "sales", "known_covariates": ["temperature_mean", "rain", "ipc"]}
+COLUMNS = ['item_id', 'timestamp', 'qty_sold'] + CONFIG["known_covariates"]
+
+# Ventes proches de minuit UTC, en bordure de semaine (dimanche, lundi, mardi)
+SALES = [
+    ("2025-01-01 12:00:00+00:00", 1),   # mercredi
+    ("2025-01-05 23:59:59+00:00", 2),   # dimanche, juste avant minuit
+    ("2025-01-06 00:00:00+00:00", 4),   # lundi minuit pile : dernier jour de la semaine
+    ("2025-01-06 23:59:59+00:00", 8),   # lundi, juste avant minuit
+    ("2025-01-07 00:30:00+01:00", 16),  # mardi à Paris, encore lundi en UTC
+    ("2025-01-07 00:00:01+00:00", 32),  # mardi UTC : nouvelle semaine
+    ("2025-01-12 10:00:00+00:00", 64),  # dimanche
+    ("2025-01-13 08:00:00+00:00", 128), # lundi
+]
+
+
+def sql_week_label(timestamp: pd.Timestamp) -> pd.Timestamp:
+    """Transcription de SQL_WEEK_LABEL : DATE_TRUNC('week', ts UTC - 1 jour) + 7 jours."""
+    shifted = timestamp.tz_convert("UTC").tz_localize(None) - pd.Timedelta(days=1)
+    week_start = shifted.normalize() - pd.Timedelta(days=shifted.weekday())  # DATE_TRUNC('week') : lundi 00:00
+    return week_start + pd.Timedelta(days=7)
+
+def _daily_sales() -> pd.DataFrame:
+    return pd.DataFrame({
+        "item_id": ITEM_ID,
+        "timestamp": pd.to_datetime([ts for ts, _ in SALES], utc=True),
+        "qty_sold": [qty for _, qty in SALES],
+    })
+
+def _create_fixture_tables(conn, timestamp_type: str):
+    for table in ["sales", "weather", "ipc", "household_confidence"]:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {table};")
+    conn.exec_driver_sql(f'CREATE TABLE sales (item_id TEXT NOT NULL, "timestamp" {timestamp_type} NOT NULL, qty_sold BIGINT NOT NULL);')
+    conn.exec_driver_sql("CREATE TABLE weather (city TEXT, date DATE, temperature_mean DOUBLE PRECISION, precipitation DOUBLE PRECISION);")
+    conn.exec_driver_sql("CREATE TABLE ipc (time_period DATE, ipc_clothing_shoes DOUBLE PRECISION);")
+    conn.exec_driver_sql("CREATE TABLE household_confidence (time_period DATE, synthetic_indicator DOUBLE PRECISION);")
+
+    # Les horodatages d'une colonne TIMESTAMP sont stockés en UTC, sans fuseau
+    for ts, qty in SALES:
+        value = ts if timestamp_type == "TIMESTAMPTZ" else str(pd.Timestamp(ts).tz_convert("UTC").tz_localize(None))
+        conn.execute(database.get_statement('INSERT INTO sales VALUES (:item_id, :ts, :qty);'), {"item_id": ITEM_ID, "ts": value, "qty": qty})
+    for day_offset, day in enumerate(pd.date_range("2024-12-30", "2025-01-19", freq="D")):
+        conn.execute(database.get_statement("INSERT INTO weather VALUES ('PARIS', :day, :temp, :rain);"),
+                     {"day": day.date(), "temp": 5.0 + day_offset, "rain": float(day_offset % 3)})
+    conn.exec_driver_sql("INSERT INTO ipc VALUES ('2024-12-01', 101.0), ('2025-01-01', 102.5);")
+    conn.exec_driver_sql("INSERT INTO household_confidence VALUES ('2024-12-01', 90.0), ('2025-01-01', 91.0);")
+
+@pytest.fixture
+def postgres(monkeypatch):
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL non définie : pas de base Postgres de test.")
+    monkeypatch.setenv("DATABASE_URL", TEST_DATABASE_URL)
+    database.dispose_engine()
+    covariate_cache.invalidate()
+    yield database.get_engine()
+    covariate_cache.invalidate()
+    database.dispose_engine()
+
+
+@pytest.mark.parametrize("timestamp_type", ["TIMESTAMPTZ", "TIMESTAMP"])
+def test_sql_and_pandas_weekly_data_are_identical(postgres, timestamp_type):
+    with postgres.begin() as conn:
+        _create_fixture_tables(conn, timestamp_type)
+
+    df_pandas = get_weekly_data(CONFIG, mode="pandas")[COLUMNS]
+    df_sql = get_weekly_data(CONFIG, mode="sql")[COLUMNS]
+
+    pd.testing.assert_frame_equal(df_pandas, df_sql, check_dtype=False, check_freq=False, rtol=1e-9)
+    assert df_sql['timestamp'].dt.strftime("%Y-%m-%d").tolist() == ["2025-01-06", "2025-01-13"]
+    assert df_sql['qty_sold'].tolist() == [31, 224]
+
+def test_sessions_run_in_utc(postgres):
+    with postgres.connect() as conn:
+        assert conn.exec_driver_sql("SHOW TimeZone;").scalar() == "UTC"
+
+# --- Tests unitaires sans base : transcription Python de la règle SQL ---
+
+def test_sunday_and_monday_sales_close_the_week_on_monday():
+    labels = _daily_sales()['timestamp'].map(sql_week_label)
+    assert list(labels.dt.strftime("%Y-%m-%d")) == [
+        "2025-01-06", "2025-01-06", "2025-01-06", "2025-01-06", "2025-01-06",
+        "2025-01-13", "2025-01-13", "2025-01-13",
+    ]
+    assert all(label.weekday() == 0 for label in labels)
+
+def test_pandas_weekly_aggregation_matches_sql_rule():
+    daily_sales = _daily_sales()
+    expected = (daily_sales.assign(timestamp=daily_sales['timestamp'].map(sql_week_label))
+                .groupby('timestamp', as_index=False)['qty_sold'].sum())
+    weekly = aggregate_weekly(daily_sales, CONFIG)
+
+    pd.testing.assert_frame_equal(weekly[['timestamp', 'qty_sold']], expected, check_dtype=False)
+    assert WEEKLY_FREQ == "W-MON"
+    assert (weekly['item_id'] == ITEM_ID).all()